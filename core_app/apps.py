@@ -0,0 +1,16 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def invalidate_fragments(sender, **kwargs):
+    """Cached fragments may predate the migrated data (runs once per app)"""
+    from . import fragments
+    fragments.invalidate_all()
+
+
+class CoreAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'core_app'
+
+    def ready(self):
+        post_migrate.connect(invalidate_fragments, dispatch_uid='core_app.invalidate_fragments')
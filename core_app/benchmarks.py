@@ -0,0 +1,237 @@
+"""
+Query benchmark for the database indexes.
+
+populate() fills an empty database with a synthetic dataset sized by the
+number of stock movements; QUERIES reproduces the querysets of the list
+views, dashboards and alerts. The benchmark_indexes command runs them with
+every index in place and again with each index dropped, and reports the
+timings and query plans.
+"""
+
+import copy
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from products_app import search
+from products_app.models import Category, Product
+from sales_app import rollups
+from sales_app.models import Customer, Sale, SaleItem
+from stock_app.models import StockLevel, StockMovement
+
+BATCH_SIZE = 5000
+PAGE = 21  # a list page plus the row telling whether there is a next one
+
+INDEXED_MODELS = (Product, Customer, Sale, SaleItem, StockLevel, StockMovement)
+
+
+def _insert_fields(model, explicit_date):
+    """Fields to insert, where the auto_now_add field explicit_date keeps the value set on the objects.
+
+    A copy of the field without auto_now_add stands in for it, so the model
+    itself is never changed (other threads keep the normal behaviour).
+    """
+    fields = []
+    for model_field in model._meta.concrete_fields:
+        if model_field.primary_key:
+            continue
+        if model_field.name == explicit_date:
+            model_field = copy.copy(model_field)
+            model_field.auto_now_add = False
+        fields.append(model_field)
+    return fields
+
+
+def _batched_create(model, objects, explicit_date=None):
+    """Insert objects in batches; explicit_date names an auto_now_add field whose values are kept"""
+    if explicit_date is None:
+        def insert(batch):
+            model.objects.bulk_create(batch)
+    else:
+        fields = _insert_fields(model, explicit_date)
+        size = connection.ops.bulk_batch_size(fields, [None] * BATCH_SIZE)
+
+        def insert(batch):
+            for start in range(0, len(batch), size):
+                model.objects._insert(batch[start:start + size], fields=fields)
+
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= BATCH_SIZE:
+            insert(batch)
+            batch = []
+    if batch:
+        insert(batch)
+
+
+def populate(movements=1_000_000, seed=0, stdout=None):
+    """Create products, stock levels, customers, sales and movements.
+
+    Sales and products scale with the number of movements (1 sale and
+    1 product per 10 and 50 movements); dates are spread over five years.
+    """
+    rng = random.Random(seed)
+    log = stdout.write if stdout else (lambda message: None)
+    now = timezone.now()
+    span = timedelta(days=5 * 365).total_seconds()
+
+    def random_date():
+        return now - timedelta(seconds=rng.random() * span)
+
+    user = User.objects.create_user('benchmark')
+    categories = Category.objects.bulk_create(
+        [Category(name=f'Catégorie {i}') for i in range(50)]
+    )
+    product_count = max(movements // 50, 10)
+    log(f'  {product_count} products')
+    _batched_create(Product, (
+        Product(
+            name=f'Produit {rng.randrange(10 ** 6):06d} {i}',
+            sku=f'BENCH-{i}',
+            category=rng.choice(categories),
+            price=Decimal(rng.randrange(100, 100_000)) / 100,
+            cost_price=Decimal(rng.randrange(50, 50_000)) / 100,
+            is_active=rng.random() < 0.9,
+        )
+        for i in range(product_count)
+    ))
+    search.rebuild()
+    product_ids = list(Product.objects.values_list('id', flat=True))
+    _batched_create(StockLevel, (
+        StockLevel(
+            product_id=product_id,
+            current_stock=rng.choice([0] + [rng.randrange(1, 500)] * 9),
+            minimum_stock=rng.randrange(0, 50),
+        )
+        for product_id in product_ids
+    ))
+
+    customer_count = max(movements // 200, 10)
+    _batched_create(Customer, (
+        Customer(name=f'Client {rng.randrange(10 ** 6):06d} {i}') for i in range(customer_count)
+    ))
+    customer_ids = list(Customer.objects.values_list('id', flat=True))
+
+    sale_count = movements // 10
+    log(f'  {sale_count} sales')
+    statuses = ['COMPLETED'] * 8 + ['PENDING', 'CANCELLED']
+    _batched_create(Sale, (
+        Sale(
+            customer_id=rng.choice(customer_ids),
+            sale_date=random_date(),
+            status=rng.choice(statuses),
+            total_amount=Decimal(rng.randrange(100, 500_000)) / 100,
+            created_by=user,
+        )
+        for _ in range(sale_count)
+    ), explicit_date='sale_date')
+    sale_ids = list(Sale.objects.values_list('id', flat=True))
+    _batched_create(SaleItem, (
+        SaleItem(
+            sale_id=sale_id,
+            product_id=rng.choice(product_ids),
+            quantity=rng.randrange(1, 20),
+            unit_price=Decimal(rng.randrange(100, 10_000)) / 100,
+        )
+        for sale_id in sale_ids
+        for _ in range(rng.randrange(1, 4))
+    ))
+    rollups.rebuild()
+
+    log(f'  {movements} stock movements')
+    # Transfers are rare, so filtering on them is the selective case
+    types, weights = ['IN', 'OUT', 'ADJUSTMENT', 'TRANSFER'], [400, 500, 99, 1]
+    start = now - timedelta(seconds=span)
+    step = span / movements
+    # Movements are appended in time order, as in production
+    _batched_create(StockMovement, (
+        StockMovement(
+            product_id=rng.choice(product_ids),
+            movement_type=rng.choices(types, weights)[0],
+            quantity=rng.randrange(1, 100),
+            created_by=user,
+            created_at=start + timedelta(seconds=i * step),
+        )
+        for i in range(movements)
+    ), explicit_date='created_at')
+
+    analyze()
+
+
+def _start_of_day(days_ago):
+    day = timezone.localdate() - timedelta(days=days_ago)
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def _first_product_id():
+    return StockMovement.objects.order_by('-id').values_list('product_id', flat=True).first()
+
+
+# name -> function building the queryset, mirroring the view it comes from
+QUERIES = {
+    'revenue_this_month': lambda: Sale.objects.filter(
+        status='COMPLETED', sale_date__gte=_start_of_day(30),
+    ).order_by().values('status').annotate(count=Count('id'), revenue=Sum('total_amount')),
+    'sales_by_day_90d': lambda: Sale.objects.filter(
+        status='COMPLETED', sale_date__gte=_start_of_day(90),
+    ).annotate(day=TruncDate('sale_date')).values('day').annotate(
+        total_sales=Count('id'), total_revenue=Sum('total_amount'),
+    ).order_by('day'),
+    'sales_list': lambda: Sale.objects.select_related('customer', 'created_by').order_by('-sale_date', '-id')[:PAGE],
+    'sales_list_pending': lambda: Sale.objects.select_related('customer', 'created_by').filter(
+        status='PENDING',
+    ).order_by('-sale_date', '-id')[:PAGE],
+    'movements_list': lambda: StockMovement.objects.select_related('product', 'created_by').order_by(
+        '-created_at', '-id',
+    )[:PAGE],
+    'movements_by_product': lambda: StockMovement.objects.select_related('product', 'created_by').filter(
+        product_id=_first_product_id(),
+    ).order_by('-created_at', '-id')[:PAGE],
+    'movements_by_type': lambda: StockMovement.objects.select_related('product', 'created_by').filter(
+        movement_type='ADJUSTMENT',
+    ).order_by('-created_at', '-id')[:PAGE],
+    'movements_by_rare_type': lambda: StockMovement.objects.select_related('product', 'created_by').filter(
+        movement_type='TRANSFER',
+    ).order_by('-created_at', '-id')[:PAGE],
+    'low_stock_alerts': lambda: StockLevel.objects.filter(
+        current_stock__lte=F('minimum_stock'),
+    ).exclude(current_stock=0).select_related('product')[:5],
+    'top_sellers': lambda: SaleItem.objects.filter(sale__status='COMPLETED').values('product__name').annotate(
+        total_sold=Sum('quantity'), total_revenue=Sum(F('quantity') * F('unit_price')),
+    ).order_by('-total_sold')[:5],
+    'product_list': lambda: Product.objects.select_related('category').order_by('name', 'id')[:PAGE],
+    'active_products': lambda: Product.objects.filter(is_active=True).select_related('stock_level'),
+    'customer_list': lambda: Customer.objects.order_by('name', 'id')[:PAGE],
+}
+
+
+def measure(build, repeat=5):
+    """(median milliseconds, query plan) for the queryset returned by build()"""
+    queryset = build()
+    plan = queryset.explain()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        list(build())
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), plan
+
+
+def declared_indexes():
+    """(model, index) for every Meta.indexes entry of the benchmarked models"""
+    return [(model, index) for model in INDEXED_MODELS for index in model._meta.indexes]
+
+
+def analyze():
+    if connection.vendor in ('sqlite', 'postgresql'):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
@@ -0,0 +1,142 @@
+"""
+Two-tier read-through cache.
+
+A TieredCache keeps a bounded LRU of recently read entries in the process,
+in front of a Django cache alias shared by every process (the 'catalog'
+file-based cache in settings). Values are stored pickled in both tiers, so
+callers get their own copy and can modify it freely.
+
+Deleting a key removes it from the shared tier and from this process's LRU;
+other processes keep serving their local copy for at most local_ttl
+seconds. Hits and misses are counted per tier, see stats().
+"""
+
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe bounded mapping whose entries expire after ttl seconds"""
+
+    def __init__(self, max_entries=1024, ttl=5):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class TieredCache:
+    def __init__(self, alias, prefix, max_entries=1024, local_ttl=5, timeout=3600):
+        self.alias = alias
+        self.prefix = prefix
+        self.timeout = timeout
+        self.local = LRUCache(max_entries, local_ttl)
+        self._stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def _key(self, key):
+        return f'{self.prefix}:{key}'
+
+    def get_or_set(self, key, compute, timeout=None):
+        """Cached value of key, calling compute() on a miss; None is not cached"""
+        key = self._key(key)
+        data = self.local.get(key)
+        if data is not None:
+            self._stats['local_hits'] += 1
+            return pickle.loads(data)
+
+        data = self.shared.get(key)
+        if data is not None:
+            self._stats['shared_hits'] += 1
+            self.local.set(key, data)
+            return pickle.loads(data)
+
+        self._stats['misses'] += 1
+        value = compute()
+        if value is not None:
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            self.shared.set(key, data, self.timeout if timeout is None else timeout)
+            self.local.set(key, data)
+        return value
+
+    def delete_many(self, keys):
+        keys = [self._key(key) for key in keys]
+        for key in keys:
+            self.local.delete(key)
+        self.shared.delete_many(keys)
+
+    def counter(self, key):
+        """Current value of a counter stored in the shared tier (0 if unset)"""
+        key = self._key(key)
+        value = self.local.get(key, _MISSING)
+        if value is _MISSING:
+            value = self.shared.get(key, 0)
+            self.local.set(key, value)
+        return value
+
+    def increment(self, key):
+        """Increment a counter, e.g. a version number embedded in other keys"""
+        key = self._key(key)
+        self.shared.add(key, 0, timeout=None)
+        try:
+            value = self.shared.incr(key)
+        except ValueError:
+            # Evicted between add() and incr()
+            value = 1
+            self.shared.set(key, value, timeout=None)
+        self.local.set(key, value)
+        return value
+
+    def stats(self):
+        """Hit and miss counts of this process since the last reset_stats()"""
+        stats = dict(self._stats)
+        lookups = sum(stats.values())
+        stats['hit_ratio'] = (lookups - stats['misses']) / lookups if lookups else 0.0
+        stats['local_entries'] = len(self.local)
+        return stats
+
+    def reset_stats(self):
+        for name in self._stats:
+            self._stats[name] = 0
+
+    def clear_local(self):
+        self.local.clear()
@@ -0,0 +1,158 @@
+"""
+Fragment caching keyed on data versions.
+
+Every domain of DOMAINS has a version in the 'fragments' cache, replaced by
+bump() once a transaction writing to it commits: the model signals of each
+app and the bulk write paths (which send no signals) call it. The domains
+bumped in a transaction are collected and written once, by a single
+on_commit callback. Versions are random tokens rather than counters, so
+concurrent bumps cannot lose an update or bring back an older version.
+A fragment is cached under the current versions of the domains it reads,
+so it is served until one of them changes rather than until a TTL expires;
+entries for old versions are never read again and age out after
+FRAGMENT_TIMEOUT.
+
+Use the {% fragment_cache %} tag (core_app.templatetags.fragments) in
+templates and cached() in views. Hits and misses are counted per fragment in
+the same cache, see stats() and the fragment_cache_stats command.
+"""
+
+import hashlib
+import uuid
+
+from django.core.cache import caches
+from django.db import transaction
+
+CACHE_ALIAS = 'fragments'
+DOMAINS = ('stock', 'sales', 'catalog')
+FRAGMENT_TIMEOUT = 24 * 3600
+
+_NAMES_KEY = 'stats:names'
+_MISSING = object()
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _version_key(domain):
+    if domain not in DOMAINS:
+        raise ValueError(f'Unknown fragment domain: {domain}')
+    return f'version:{domain}'
+
+
+def _new_versions(domains):
+    _cache().set_many({_version_key(domain): uuid.uuid4().hex for domain in domains}, timeout=None)
+
+
+def _increment(key):
+    """Hit/miss counter; an update lost between processes only skews the statistics"""
+    cache = _cache()
+    cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, 1, timeout=None)
+        return 1
+
+
+def versions(domains):
+    """{domain: current version}"""
+    keys = {_version_key(domain): domain for domain in domains}
+    found = _cache().get_many(list(keys))
+    return {domain: found.get(key, 0) for key, domain in keys.items()}
+
+
+class _PendingBumps:
+    """on_commit callback writing the domains bumped in a transaction"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.domains = set()
+
+    def registered(self):
+        # Dropped along with a rolled back savepoint, or already run
+        return any(entry[1] is self for entry in self.connection.run_on_commit)
+
+    def __call__(self):
+        if getattr(self.connection, '_fragment_bumps', None) is self:
+            self.connection._fragment_bumps = None
+        _new_versions(self.domains)
+
+
+def bump(*domains):
+    """Invalidate the fragments reading domains, once the current transaction commits"""
+    for domain in domains:
+        _version_key(domain)
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        _new_versions(domains)
+        return
+    pending = getattr(connection, '_fragment_bumps', None)
+    if pending is None or not pending.registered():
+        pending = connection._fragment_bumps = _PendingBumps(connection)
+        transaction.on_commit(pending)
+    pending.domains.update(domains)
+
+
+def fragment_key(name, domains, vary=()):
+    current = versions(domains)
+    key = f'fragment:{name}:' + ':'.join(f'{domain}{current[domain]}' for domain in sorted(current))
+    if vary:
+        key += ':' + hashlib.md5(repr(tuple(vary)).encode()).hexdigest()
+    return key
+
+
+def cached(name, domains, compute, vary=()):
+    """Cached result of compute() for the current versions of domains.
+
+    name identifies the fragment in the statistics; vary holds any other
+    values the result depends on (filters, page...).
+    """
+    cache = _cache()
+    key = fragment_key(name, domains, vary)
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _increment(f'stats:{name}:hits')
+        return value
+
+    value = compute()
+    cache.set(key, value, FRAGMENT_TIMEOUT)
+    _increment(f'stats:{name}:misses')
+    names = cache.get(_NAMES_KEY, set())
+    if name not in names:
+        cache.set(_NAMES_KEY, names | {name}, timeout=None)
+    return value
+
+
+def stats():
+    """{fragment name: {'hits', 'misses', 'hit_rate'}}, across processes"""
+    cache = _cache()
+    names = sorted(cache.get(_NAMES_KEY, set()))
+    counts = cache.get_many(
+        [f'stats:{name}:{outcome}' for name in names for outcome in ('hits', 'misses')]
+    )
+    report = {}
+    for name in names:
+        hits = counts.get(f'stats:{name}:hits', 0)
+        misses = counts.get(f'stats:{name}:misses', 0)
+        report[name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+        }
+    return report
+
+
+def reset_stats():
+    cache = _cache()
+    names = cache.get(_NAMES_KEY, set())
+    cache.delete_many(
+        [f'stats:{name}:{outcome}' for name in names for outcome in ('hits', 'misses')] + [_NAMES_KEY]
+    )
+
+
+def invalidate_all():
+    """Bump every domain right away, e.g. after migrations"""
+    _new_versions(DOMAINS)
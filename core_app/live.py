@@ -0,0 +1,166 @@
+"""
+Live updates pushed to the browser as server-sent events.
+
+publish() sends a message on a channel of CHANNELS once the current
+transaction commits, to every stream() of this process subscribed to the
+channel. The model signals of each app publish their changes, and the bulk
+write paths (which send no signals) call it themselves, as for
+core_app.fragments.
+
+A stream is an async generator served by the ASGI server's event loop, and
+its subscription an asyncio.Queue: an idle connection holds a suspended
+coroutine rather than a thread, so one process keeps thousands of them
+open. Publishers run in any thread and hand their messages over with
+call_soon_threadsafe().
+
+The last REPLAY_SIZE messages are kept, and a client reconnecting with
+Last-Event-ID (EventSource does it by itself) gets the ones it missed.
+When they are gone, or its queue overflowed, it is sent a 'reset' event
+and should reload what it shows. Streams close after
+LIVE_STREAM_MAX_SECONDS, so that connections dropped without notice do not
+pile up, and the clients reconnect.
+
+The messages only reach the streams of the process that published them:
+serve the live pages from one ASGI process. Changes made by management
+commands are not pushed.
+"""
+
+import asyncio
+import json
+import threading
+import uuid
+from collections import deque
+from itertools import count
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+CHANNELS = ('stock', 'sales')
+QUEUE_SIZE = 1000
+REPLAY_SIZE = 1000
+RETRY_MILLISECONDS = 2000
+
+# Event ids are '<process>-<number>': ids of another process (or of this one
+# before a restart) cannot be replayed
+_PROCESS = uuid.uuid4().hex[:8]
+_numbers = count(1)
+_lock = threading.Lock()
+_subscribers = set()
+_recent = deque(maxlen=REPLAY_SIZE)
+
+
+class Message(NamedTuple):
+    number: int
+    channel: str
+    data: str
+
+    def __str__(self):
+        return f'id: {_PROCESS}-{self.number}\nevent: {self.channel}\ndata: {self.data}\n\n'
+
+
+class Subscriber:
+    def __init__(self, channels, loop):
+        self.channels = frozenset(channels)
+        self.loop = loop
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.overflowed = False
+
+    def put(self, message):
+        """Runs in the subscriber's event loop"""
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+def _deliver(channel, data):
+    with _lock:
+        message = Message(next(_numbers), channel, data)
+        _recent.append(message)
+        subscribers = [subscriber for subscriber in _subscribers if channel in subscriber.channels]
+    for subscriber in subscribers:
+        try:
+            subscriber.loop.call_soon_threadsafe(subscriber.put, message)
+        except RuntimeError:
+            # Its loop is closed: the stream will not read it again
+            unsubscribe(subscriber)
+
+
+def publish(channel, data):
+    """Send data (JSON-serializable) to the streams of channel once the current transaction commits"""
+    if channel not in CHANNELS:
+        raise ValueError(f'Unknown live channel: {channel}')
+    data = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
+    transaction.on_commit(lambda: _deliver(channel, data))
+
+
+def subscribe(channels):
+    """Subscriber of channels in the running event loop"""
+    subscriber = Subscriber(channels, asyncio.get_running_loop())
+    with _lock:
+        _subscribers.add(subscriber)
+    return subscriber
+
+
+def unsubscribe(subscriber):
+    with _lock:
+        _subscribers.discard(subscriber)
+
+
+def subscriber_count():
+    return len(_subscribers)
+
+
+def missed(last_event_id, channels):
+    """Messages of channels after last_event_id, or None if they are no longer all kept"""
+    process, _, number = last_event_id.partition('-')
+    if process != _PROCESS or not number.isdigit():
+        return None
+    number = int(number)
+    with _lock:
+        recent = list(_recent)
+    if number < (recent[0].number - 1 if recent else number):
+        return None
+    return [message for message in recent if message.number > number and message.channel in channels]
+
+
+async def stream(channels, last_event_id='', heartbeat=None, max_seconds=None):
+    """Server-sent events text of the messages published on channels, until max_seconds have passed"""
+    heartbeat = settings.LIVE_HEARTBEAT_SECONDS if heartbeat is None else heartbeat
+    max_seconds = settings.LIVE_STREAM_MAX_SECONDS if max_seconds is None else max_seconds
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_seconds
+    # Subscribed before reading the replay, so nothing falls in between
+    subscriber = subscribe(channels)
+    try:
+        yield f'retry: {RETRY_MILLISECONDS}\n\n'
+        last = 0
+        if last_event_id:
+            replay = missed(last_event_id, subscriber.channels)
+            if replay is None:
+                yield 'event: reset\ndata: {}\n\n'
+            else:
+                for message in replay:
+                    last = message.number
+                    yield str(message)
+
+        while (timeout := min(heartbeat, deadline - loop.time())) > 0:
+            if subscriber.overflowed:
+                while not subscriber.queue.empty():
+                    last = subscriber.queue.get_nowait().number
+                subscriber.overflowed = False
+                yield 'event: reset\ndata: {}\n\n'
+                continue
+            try:
+                message = await asyncio.wait_for(subscriber.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle connection
+                yield ': ping\n\n'
+                continue
+            if message.number > last:
+                last = message.number
+                yield str(message)
+    finally:
+        unsubscribe(subscriber)
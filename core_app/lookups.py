@@ -0,0 +1,13 @@
+def resolve_field(model, lookup):
+    """The model field at the end of a lookup path such as 'sale__customer__name'.
+
+    Foreign keys resolve to the field they point to, so 'product' and
+    'product_id' both give the product's primary key field.
+    """
+    *relations, name = lookup.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    model_field = model._meta.get_field(name)
+    if model_field.is_relation:
+        model_field = model_field.target_field
+    return model_field
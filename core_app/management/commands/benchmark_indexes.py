@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from core_app import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the view querysets against a synthetic dataset, with every '
+        'index and with each index dropped in turn (runs in the test database)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--movements',
+            type=int,
+            default=1_000_000,
+            help='Number of stock movements to generate (default: 1000000)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Runs per query; the median is reported (default: 5)'
+        )
+        parser.add_argument(
+            '--keepdb',
+            action='store_true',
+            help='Keep the benchmark database and reuse its data on the next run'
+        )
+        parser.add_argument(
+            '--output',
+            help='Write the report (timings and query plans, Markdown) to this file'
+        )
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            if not benchmarks.StockMovement.objects.exists():
+                self.stdout.write(f"Generating {options['movements']} movements...")
+                benchmarks.populate(options['movements'], stdout=self.stdout)
+            report = self.run_benchmark(options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(report)
+            self.stdout.write(self.style.SUCCESS(f"✓ Report written to {options['output']}"))
+
+    def run_benchmark(self, repeat):
+        lines = ['# Index benchmark', '', '## All indexes', '', '| Query | ms |', '|---|---|']
+        baseline = {}
+        for name, build in benchmarks.QUERIES.items():
+            baseline[name] = benchmarks.measure(build, repeat)
+            lines.append(f'| {name} | {baseline[name][0]:.2f} |')
+            self.stdout.write(f'  {name}: {baseline[name][0]:.2f} ms')
+
+        for model, index in benchmarks.declared_indexes():
+            with connection.schema_editor() as editor:
+                editor.remove_index(model, index)
+            benchmarks.analyze()
+            try:
+                without = {
+                    name: benchmarks.measure(build, repeat)
+                    for name, build in benchmarks.QUERIES.items()
+                }
+            finally:
+                with connection.schema_editor() as editor:
+                    editor.add_index(model, index)
+                benchmarks.analyze()
+
+            # Queries at least 1.5x (and 1 ms) slower without the index
+            helped = [
+                name for name, (ms, _) in without.items()
+                if ms >= 1.5 * baseline[name][0] and ms - baseline[name][0] >= 1
+            ]
+            verdict = 'pays off' if helped else 'does not pay off'
+            style = self.style.SUCCESS if helped else self.style.WARNING
+            self.stdout.write(style(f'{index.name} ({model._meta.label}): {verdict}'))
+
+            lines += ['', f'## {index.name} ({model._meta.label}): {verdict}', '']
+            for name in helped or baseline:
+                with_ms, with_plan = baseline[name]
+                without_ms, without_plan = without[name]
+                if not helped and with_plan == without_plan:
+                    continue
+                lines += [
+                    f'### {name}: {with_ms:.2f} ms with the index, {without_ms:.2f} ms without',
+                    '', 'With:', '```', with_plan, '```', 'Without:', '```', without_plan, '```', '',
+                ]
+                self.stdout.write(f'    {name}: {with_ms:.2f} ms -> {without_ms:.2f} ms without')
+        return '\n'.join(lines) + '\n'
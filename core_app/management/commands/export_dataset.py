@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from core_app import columnar
+
+
+def _datasets():
+    from sales_app.exports import SALE_LINES_EXPORT
+    from stock_app.exports import MOVEMENTS_COLUMNAR_EXPORT
+    return {
+        'sale_lines': SALE_LINES_EXPORT,
+        'movements': MOVEMENTS_COLUMNAR_EXPORT,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Export sale lines or stock movements to a Parquet or Arrow IPC file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(_datasets()), help='Dataset to export')
+        parser.add_argument('output', help='Destination file path')
+        parser.add_argument(
+            '--format',
+            choices=sorted(columnar.FORMATS),
+            default='parquet',
+            help='File format (default: parquet)'
+        )
+        parser.add_argument('--date-from', help='First day to include (YYYY-MM-DD)')
+        parser.add_argument('--date-to', help='Last day to include (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        if not columnar.is_available():
+            raise CommandError('pyarrow is required for columnar exports (pip install pyarrow)')
+        
+        export = _datasets()[options['dataset']]
+        params = {
+            'date_from': options['date_from'],
+            'date_to': options['date_to'],
+        }
+        try:
+            export.filtered(params)
+        except ValueError as e:
+            raise CommandError(str(e))
+        
+        with open(options['output'], 'wb') as out:
+            rows = export.write(out, options['format'], params)
+        
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {rows} ligne(s) exportée(s) vers {options['output']}"
+        ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from core_app import fragments
+
+
+class Command(BaseCommand):
+    help = 'Show the hit rate of every cached template fragment'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Reset the counters after showing them'
+        )
+
+    def handle(self, *args, **options):
+        report = fragments.stats()
+        if not report:
+            self.stdout.write('No fragment has been cached yet')
+        for name, counts in report.items():
+            self.stdout.write(
+                f"  {name}: {counts['hit_rate']:.0%} "
+                f"({counts['hits']} hits, {counts['misses']} misses)"
+            )
+        if options['reset']:
+            fragments.reset_stats()
+            self.stdout.write(self.style.SUCCESS('✓ Counters reset'))
@@ -0,0 +1,262 @@
+"""
+Keyset (cursor) pagination.
+
+Instead of COUNT(*) + OFFSET, each page is fetched with a WHERE clause on
+the ordering key of the row it starts after, e.g. for ('-created_at', '-id')
+
+    created_at < :t OR (created_at = :t AND id < :id)
+
+so the cost of a page does not depend on how deep it is. The last column of
+the ordering must be unique (normally the primary key).
+
+Cursors are opaque url-safe tokens; a malformed one falls back to the first
+page, like Paginator.get_page().
+
+A paginator can also be given a tail: rows kept outside the queryset (e.g.
+archived ones) that all come after its rows in the ordering. Its
+rows(key, forward, limit) returns up to limit rows after key (before it
+when not forward, nearest first; key None means from the start or the
+end), and the pages run on from the queryset into the tail.
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+from collections.abc import Sequence
+from datetime import date, datetime, time
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+from uuid import UUID
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db import models
+from django.db.models import Max, Min, Q
+
+from .lookups import resolve_field
+
+CURSOR_PARAM = 'cursor'
+LAST = 'last'
+COUNT_CACHE_TIMEOUT = 300
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _json_value(value):
+    # isoformat() rather than DjangoJSONEncoder, which truncates microseconds
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    return value
+
+
+def _direction(lookup):
+    return (lookup[1:], True) if lookup.startswith('-') else (lookup, False)
+
+
+class CursorPage(Sequence):
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self.object_list)} items>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    @property
+    def next_cursor(self):
+        if self.has_next_page and self.object_list:
+            return self.paginator.encode_cursor(self.object_list[-1], forward=True)
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous_page and self.object_list:
+            return self.paginator.encode_cursor(self.object_list[0], forward=False)
+        return None
+
+
+class CursorPaginator:
+    """Paginate queryset on ordering, a tuple of lookups ending with a unique one"""
+
+    def __init__(self, queryset, ordering, per_page=20, tail=None):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.tail = tail
+        self._fields = [
+            resolve_field(queryset.model, _direction(lookup)[0]) for lookup in self.ordering
+        ]
+
+    def _key(self, obj):
+        values = []
+        for lookup in self.ordering:
+            value = obj
+            for attr in _direction(lookup)[0].split('__'):
+                value = getattr(value, attr)
+            values.append(value)
+        return values
+
+    def encode_cursor(self, obj, forward):
+        payload = json.dumps(
+            {'d': 'n' if forward else 'p', 'k': [_json_value(value) for value in self._key(obj)]},
+            separators=(',', ':'),
+        )
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Return (forward, key values) for a cursor produced by encode_cursor()"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            direction, key = payload['d'], payload['k']
+            if direction not in ('n', 'p') or len(key) != len(self._fields):
+                raise InvalidCursor(cursor)
+            key = [model_field.to_python(value) for model_field, value in zip(self._fields, key)]
+        except (binascii.Error, ValueError, KeyError, TypeError, ValidationError):
+            raise InvalidCursor(cursor)
+        return direction == 'n', key
+
+    def _after(self, key, forward):
+        """Q selecting the rows after key in the ordering (before it if not forward)"""
+        conditions = []
+        for index, lookup in enumerate(self.ordering):
+            name, descending = _direction(lookup)
+            operator = 'lt' if descending == forward else 'gt'
+            condition = Q(**{f'{name}__{operator}': key[index]})
+            for previous, value in zip(self.ordering[:index], key):
+                condition &= Q(**{_direction(previous)[0]: value})
+            conditions.append(condition)
+        return reduce(or_, conditions)
+
+    def _reversed_ordering(self):
+        return [
+            name if descending else f'-{name}'
+            for name, descending in map(_direction, self.ordering)
+        ]
+
+    def _forward(self, key, limit):
+        """Up to limit rows after key (from the start if None), queryset then tail"""
+        queryset = self.queryset if key is None else self.queryset.filter(self._after(key, True))
+        rows = list(queryset.order_by(*self.ordering)[:limit])
+        if len(rows) < limit and self.tail is not None:
+            rows += self.tail.rows(key, True, limit - len(rows))
+        return rows
+
+    def _backward(self, key, limit):
+        """Up to limit rows before key (from the end if None), nearest first, tail then queryset"""
+        rows = self.tail.rows(key, False, limit) if self.tail is not None else []
+        if len(rows) < limit:
+            queryset = self.queryset if key is None else self.queryset.filter(self._after(key, False))
+            rows += list(queryset.order_by(*self._reversed_ordering())[:limit - len(rows)])
+        return rows
+
+    def page(self, cursor=None):
+        """The page after (or before) cursor; raises InvalidCursor"""
+        if cursor == LAST:
+            # Read the end of the ordering backwards
+            rows = self._backward(None, self.per_page + 1)
+            has_more = len(rows) > self.per_page
+            return CursorPage(rows[:self.per_page][::-1], self, False, has_more)
+        if not cursor:
+            rows = self._forward(None, self.per_page + 1)
+            return CursorPage(rows[:self.per_page], self, len(rows) > self.per_page, False)
+
+        forward, key = self.decode_cursor(cursor)
+        rows = (self._forward if forward else self._backward)(key, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if forward:
+            return CursorPage(rows, self, has_more, True)
+        return CursorPage(rows[::-1], self, True, has_more)
+
+    def get_page(self, cursor=None):
+        """Like page(), but an invalid cursor gives the first page"""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+
+def approximate_count(queryset):
+    """Row count for display, without counting the whole table on every request.
+
+    An unfiltered queryset is estimated: from the planner's statistics on
+    PostgreSQL, and on SQLite from the range of its integer primary key (two
+    lookups in the rowid B-tree; rows deleted inside the range are still
+    counted). Otherwise the exact count is cached for COUNT_CACHE_TIMEOUT
+    seconds.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] >= 0:
+            return row[0]
+    if (
+        connection.vendor == 'sqlite' and not queryset.query.where
+        and isinstance(queryset.model._meta.pk, models.AutoField)
+    ):
+        bounds = queryset.model._default_manager.using(queryset.db).aggregate(first=Min('pk'), last=Max('pk'))
+        return bounds['last'] - bounds['first'] + 1 if bounds['last'] is not None else 0
+
+    sql, params = queryset.query.sql_with_params()
+    key = 'approximate_count:' + hashlib.md5(f'{sql}{params!r}'.encode()).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def paginate(request, queryset, ordering, per_page=20, count=True, tail=None):
+    """Cursor page for the ?cursor= parameter of request.
+
+    The page gets first/previous/next/last query strings that keep the
+    other GET parameters, and an approximate_count when count is set.
+    """
+    paginator = CursorPaginator(queryset, ordering, per_page, tail)
+    page = paginator.get_page(request.GET.get(CURSOR_PARAM))
+
+    def query(cursor):
+        params = request.GET.copy()
+        params.pop(CURSOR_PARAM, None)
+        params.pop('page', None)
+        if cursor:
+            params[CURSOR_PARAM] = cursor
+        return f'?{params.urlencode()}'
+
+    page.first_query = query(None)
+    page.last_query = query(LAST)
+    page.previous_query = query(page.previous_cursor) if page.has_previous() else None
+    page.next_query = query(page.next_cursor) if page.has_next() else None
+    page.approximate_count = None
+    if count:
+        page.approximate_count = approximate_count(queryset) + (tail.count() if tail is not None else 0)
+    return page
@@ -0,0 +1,58 @@
+from django import template
+
+from core_app import fragments
+
+register = template.Library()
+
+
+class FragmentCacheNode(template.Node):
+    def __init__(self, nodelist, name, domains, vary):
+        self.nodelist = nodelist
+        self.name = name
+        self.domains = domains
+        self.vary = vary
+
+    def render(self, context):
+        return fragments.cached(
+            self.name.resolve(context),
+            [domain.resolve(context) for domain in self.domains],
+            lambda: self.nodelist.render(context),
+            vary=[value.resolve(context) for value in self.vary],
+        )
+
+
+@register.tag('fragment_cache')
+def do_fragment_cache(parser, token):
+    """
+    Cache the enclosed template fragment until the data of its domains changes.
+
+    Usage::
+
+        {% fragment_cache "recent_sales" "sales" %}...{% endfragment_cache %}
+        {% fragment_cache "low_stock" "stock" "catalog" vary request.GET.page %}
+            ...
+        {% endfragment_cache %}
+
+    The first argument names the fragment, the next ones are domains of
+    core_app.fragments.DOMAINS; values after "vary" are part of the key.
+    """
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag requires a fragment name and at least one domain"
+        )
+    args = bits[1:]
+    vary = []
+    if 'vary' in args:
+        index = args.index('vary')
+        args, vary = args[:index], args[index + 1:]
+    if len(args) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires at least one domain")
+    nodelist = parser.parse(('endfragment_cache',))
+    parser.delete_first_token()
+    return FragmentCacheNode(
+        nodelist,
+        parser.compile_filter(args[0]),
+        [parser.compile_filter(domain) for domain in args[1:]],
+        [parser.compile_filter(value) for value in vary],
+    )
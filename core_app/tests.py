@@ -0,0 +1,269 @@
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from products_app.models import Category, Product
+from sales_app.models import Customer, Sale, SaleItem
+from stock_app.models import StockMovement
+from stock_app.services import apply_movement
+from . import fragments, live
+from .cache import LRUCache, TieredCache
+from .pagination import CursorPaginator, approximate_count, paginate
+
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('staff')
+        category = Category.objects.create(name='Divers')
+        product = Product.objects.create(
+            name='Fusible', sku='FUS-1', category=category, price='1.00', cost_price='0.50',
+        )
+        StockMovement.objects.bulk_create([
+            StockMovement(product=product, movement_type='IN', quantity=i + 1, created_by=user)
+            for i in range(25)
+        ])
+        # Ties on created_at are broken by id
+        StockMovement.objects.update(created_at=StockMovement.objects.first().created_at)
+        cls.expected = list(StockMovement.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def paginator(self):
+        return CursorPaginator(StockMovement.objects.all(), ('-created_at', '-id'), per_page=10)
+
+    def ids(self, page):
+        return [movement.id for movement in page]
+
+    def test_walk_forward_and_back(self):
+        paginator = self.paginator()
+        first = paginator.get_page()
+        self.assertFalse(first.has_previous())
+
+        second = paginator.get_page(first.next_cursor)
+        third = paginator.get_page(second.next_cursor)
+        self.assertEqual(self.ids(first) + self.ids(second) + self.ids(third), self.expected)
+        self.assertFalse(third.has_next())
+
+        back = paginator.get_page(third.previous_cursor)
+        self.assertEqual(self.ids(back), self.expected[10:20])
+        self.assertEqual(self.ids(paginator.get_page(back.previous_cursor)), self.expected[:10])
+
+    def test_last_page_and_invalid_cursor(self):
+        paginator = self.paginator()
+        last = paginator.get_page('last')
+        self.assertEqual(self.ids(last), self.expected[-10:])
+        self.assertTrue(last.has_previous())
+        self.assertFalse(last.has_next())
+        self.assertEqual(self.ids(paginator.get_page('not-a-cursor')), self.expected[:10])
+
+    def test_deep_page_is_a_single_query(self):
+        paginator = self.paginator()
+        cursor = paginator.get_page(paginator.get_page().next_cursor).next_cursor
+        with self.assertNumQueries(1):
+            self.assertEqual(len(paginator.get_page(cursor)), 5)
+
+    def test_paginate_keeps_filters_in_links(self):
+        request = RequestFactory().get('/', {'type': 'IN', 'page': '3'})
+        page = paginate(request, StockMovement.objects.filter(movement_type='IN'), ('-created_at', '-id'), per_page=10)
+
+        self.assertEqual(page.approximate_count, 25)
+        self.assertIn('type=IN', page.next_query)
+        self.assertIn('cursor=', page.next_query)
+        self.assertNotIn('page=', page.next_query)
+
+    def test_unfiltered_count_is_estimated_from_the_key_range(self):
+        StockMovement.objects.filter(pk=self.expected[12]).delete()
+        with self.assertNumQueries(1):
+            self.assertEqual(approximate_count(StockMovement.objects.all()), 25)
+        self.assertEqual(approximate_count(StockMovement.objects.filter(quantity__gte=1)), 24)
+
+    def test_list_views_render_cursor_links(self):
+        self.client.force_login(User.objects.get(username='staff'))
+        names = (
+            'products_app:product_list', 'stock_app:stock_list', 'stock_app:movements',
+            'sales_app:sales_list', 'sales_app:customer_list',
+        )
+        for name in names:
+            response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200, name)
+        response = self.client.get(reverse('stock_app:movements'))
+        self.assertContains(response, '?cursor=')
+
+
+class TieredCacheTests(SimpleTestCase):
+    def test_lru_evicts_least_recently_used_and_expired_entries(self):
+        lru = LRUCache(max_entries=2, ttl=5)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+        with mock.patch('core_app.cache.time.monotonic', return_value=10 ** 9):
+            self.assertIsNone(lru.get('a'))
+
+    def test_read_through_counts_hits_per_tier(self):
+        cache = TieredCache('default', 'test-tiered')
+        cache.delete_many(['key'])
+        compute = mock.Mock(return_value={'name': 'Fusible'})
+
+        self.assertEqual(cache.get_or_set('key', compute), {'name': 'Fusible'})
+        cache.get_or_set('key', compute)
+        cache.clear_local()
+        cache.get_or_set('key', compute)
+        self.assertEqual(compute.call_count, 1)
+        stats = cache.stats()
+        self.assertEqual((stats['misses'], stats['local_hits'], stats['shared_hits']), (1, 1, 1))
+
+        cache.delete_many(['key'])
+        cache.get_or_set('key', compute)
+        self.assertEqual(compute.call_count, 2)
+
+
+class FragmentCacheTests(TestCase):
+    template = Template(
+        "{% load fragments %}"
+        "{% fragment_cache 'product_names' 'catalog' vary prefix %}"
+        "{% for product in products %}{{ prefix }}{{ product.name }};{% endfor %}"
+        "{% endfragment_cache %}"
+    )
+
+    def setUp(self):
+        fragments.invalidate_all()
+        fragments.reset_stats()
+        # Run its bump: later bumps of the test transaction would join it
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = Category.objects.create(name='Divers')
+
+    def render(self, prefix='-'):
+        return self.template.render(Context({'products': Product.objects.order_by('name'), 'prefix': prefix}))
+
+    def test_fragment_is_served_until_its_domain_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name='Fusible', sku='FUS-1', category=self.category, price='1.00', cost_price='0.50')
+        self.assertEqual(self.render(), '-Fusible;')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.render(), '-Fusible;')
+        self.assertEqual(self.render('+'), '+Fusible;')
+
+        # Other domains do not invalidate it
+        with self.captureOnCommitCallbacks(execute=True):
+            fragments.bump('sales')
+        with self.assertNumQueries(0):
+            self.render()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name='Borne', sku='BOR-1', category=self.category, price='1.00', cost_price='0.50')
+        self.assertEqual(self.render(), '-Borne;-Fusible;')
+
+        stats = fragments.stats()['product_names']
+        self.assertEqual((stats['hits'], stats['misses']), (2, 3))
+
+    def test_bumps_wait_for_the_commit(self):
+        before = fragments.versions(['stock'])
+        fragments.bump('stock')
+        self.assertEqual(fragments.versions(['stock']), before)
+
+    def test_bumps_of_a_transaction_are_written_once(self):
+        before = fragments.versions(['stock', 'sales', 'catalog'])
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            for _ in range(3):
+                fragments.bump('stock')
+            fragments.bump('sales')
+        self.assertEqual(len(callbacks), 1)
+        after = fragments.versions(['stock', 'sales', 'catalog'])
+        self.assertNotEqual(after['stock'], before['stock'])
+        self.assertNotEqual(after['sales'], before['sales'])
+        self.assertEqual(after['catalog'], before['catalog'])
+
+        # The next transaction registers its own callback
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            fragments.bump('stock')
+        self.assertEqual(len(callbacks), 1)
+        self.assertNotEqual(fragments.versions(['stock']), {'stock': after['stock']})
+
+
+# publish() registers on the database connection, a sync operation
+publish = sync_to_async(live.publish)
+
+
+class LiveBrokerTests(SimpleTestCase):
+    databases = {'default'}
+
+    async def test_messages_reach_the_streams_of_their_channel(self):
+        events = live.stream(['stock'], heartbeat=0.05, max_seconds=5)
+        self.assertEqual(await anext(events), f'retry: {live.RETRY_MILLISECONDS}\n\n')
+        await publish('sales', {'sale_id': 1})
+        await publish('stock', {'levels': [{'product_id': 7}]})
+        self.assertIn('event: stock\ndata: {"levels":[{"product_id":7}]}\n\n', await anext(events))
+        self.assertEqual(await anext(events), ': ping\n\n')
+        await events.aclose()
+        self.assertEqual(live.subscriber_count(), 0)
+
+    async def test_reconnecting_clients_get_what_they_missed(self):
+        events = live.stream(['stock'], max_seconds=5)
+        await anext(events)
+        await publish('stock', {'n': 1})
+        last_event_id = (await anext(events)).split('\n')[0].removeprefix('id: ')
+        await events.aclose()
+
+        await publish('stock', {'n': 2})
+        await publish('sales', {'n': 3})
+        events = live.stream(['stock'], last_event_id=last_event_id, max_seconds=5)
+        await anext(events)
+        self.assertIn('data: {"n":2}', await anext(events))
+        await events.aclose()
+
+        # Ids of another process cannot be replayed
+        events = live.stream(['stock'], last_event_id='0-1', max_seconds=5)
+        await anext(events)
+        self.assertEqual(await anext(events), 'event: reset\ndata: {}\n\n')
+        await events.aclose()
+
+    async def test_slow_clients_are_reset(self):
+        with mock.patch.object(live, 'QUEUE_SIZE', 2):
+            events = live.stream(['stock'], max_seconds=5)
+            await anext(events)
+        for n in range(3):
+            await publish('stock', {'n': n})
+        self.assertEqual(await anext(events), 'event: reset\ndata: {}\n\n')
+        await events.aclose()
+
+
+class LiveStreamTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('counter', password='secret')
+        self.url = reverse('core_app:live_stream')
+
+    def test_changes_are_published(self):
+        category = Category.objects.create(name='Divers')
+        product = Product.objects.create(name='Fusible', sku='FUS-1', category=category, price=Decimal('2.00'), cost_price=Decimal('1.00'))
+        with mock.patch.object(live, 'publish') as publish:
+            apply_movement(product, 'IN', 5, self.user)
+            sale = Sale.objects.create(customer=Customer.objects.create(name='Client'), created_by=self.user)
+            SaleItem.objects.create(sale=sale, product=product, quantity=5, unit_price='2.00')
+            sale.complete_sale(self.user)
+        self.assertEqual(publish.call_args_list[-2], mock.call('stock', {'levels': [
+            {'product_id': product.pk, 'current_stock': 0, 'minimum_stock': 0, 'status': 'OUT'},
+        ]}))
+        channel, data = publish.call_args_list[-1].args
+        self.assertEqual((channel, data['sale_id']), ('sales', sale.pk))
+
+    def test_stream_needs_an_asgi_server(self):
+        self.assertEqual(self.client.get(self.url, {'channels': 'stock'}).status_code, 302)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url, {'channels': 'stock,orders'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'channels': 'stock'}).status_code, 204)
+
+    @override_settings(LIVE_STREAM_MAX_SECONDS=0.1)
+    async def test_stream_over_asgi(self):
+        await sync_to_async(self.async_client.force_login)(self.user)
+        response = await self.async_client.get(self.url, {'channels': 'stock,sales'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(
+            [chunk async for chunk in response.streaming_content],
+            [f'retry: {live.RETRY_MILLISECONDS}\n\n'.encode(), b': ping\n\n'],
+        )
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+app_name = 'core_app'
+
+urlpatterns = [
+    path('stream/', views.live_stream, name='live_stream'),
+]
@@ -0,0 +1,28 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
+
+from . import live
+
+
+async def live_stream(request):
+    """Server-sent events of the live channels given in ?channels= (comma-separated)"""
+    # login_required does not wrap async views before Django 5.0
+    if not await sync_to_async(lambda: request.user.is_authenticated)():
+        return redirect_to_login(request.get_full_path())
+    channels = [channel for channel in request.GET.get('channels', '').split(',') if channel]
+    if not channels or not set(channels) <= set(live.CHANNELS):
+        return HttpResponseBadRequest(f"Canaux disponibles : {', '.join(live.CHANNELS)}")
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI a stream would hold a worker thread for good; 204 stops EventSource retrying
+        return HttpResponse(status=204)
+
+    response = StreamingHttpResponse(
+        live.stream(channels, last_event_id=request.headers.get('Last-Event-ID', '')),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Not buffered by nginx
+    response['X-Accel-Buffering'] = 'no'
+    return response
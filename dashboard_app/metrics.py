@@ -0,0 +1,95 @@
+"""
+Headline KPIs shared by the main, stock and sales dashboards.
+
+Inventory metrics come from the running totals in stock_app.counters; sales
+metrics from the daily rollups of sales_app.rollups, in a single
+conditional-aggregate query.
+"""
+
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from sales_app.models import DailySalesRollup
+from stock_app import counters
+
+
+@dataclass(frozen=True)
+class InventoryMetrics:
+    total_products: int
+    active_products: int
+    total_stock_value: Decimal
+    low_stock_count: int
+    out_of_stock_count: int
+    in_stock_count: int
+
+    @property
+    def alert_count(self):
+        """Products at or below their minimum, out-of-stock included"""
+        return self.low_stock_count + self.out_of_stock_count
+
+
+@dataclass(frozen=True)
+class SalesMetrics:
+    total_sales: int
+    total_revenue: Decimal
+    today_sales: int
+    today_revenue: Decimal
+    month_sales: int
+    month_revenue: Decimal
+
+
+@dataclass(frozen=True)
+class DashboardMetrics:
+    inventory: InventoryMetrics
+    sales: SalesMetrics
+
+
+def get_inventory_metrics():
+    """Product counts, stock value and stock status buckets.
+
+    Read from the running totals maintained by stock_app.counters, so this
+    is a single-row lookup whatever the size of the catalog.
+    """
+    totals = counters.current()
+    return InventoryMetrics(
+        total_products=totals.total_products,
+        active_products=totals.active_products,
+        total_stock_value=totals.total_stock_value,
+        low_stock_count=totals.low_stock_count,
+        out_of_stock_count=totals.out_of_stock_count,
+        in_stock_count=totals.in_stock_count,
+    )
+
+
+def get_sales_metrics(today=None):
+    """Completed-sale counts and revenue (all time, today, this month) in one query.
+
+    Summed over the DailySalesRollup rows (one per day) rather than the sales.
+    """
+    today = today or timezone.localdate()
+    is_today = Q(date=today)
+    is_this_month = Q(date__gte=today.replace(day=1), date__lte=today)
+
+    totals = DailySalesRollup.objects.order_by().aggregate(
+        total_sales=Sum('sale_count'),
+        total_revenue=Sum('revenue'),
+        today_sales=Sum('sale_count', filter=is_today),
+        today_revenue=Sum('revenue', filter=is_today),
+        month_sales=Sum('sale_count', filter=is_this_month),
+        month_revenue=Sum('revenue', filter=is_this_month),
+    )
+    for key in ('total_sales', 'today_sales', 'month_sales'):
+        totals[key] = totals[key] or 0
+    for key in ('total_revenue', 'today_revenue', 'month_revenue'):
+        totals[key] = totals[key] or Decimal('0.00')
+    return SalesMetrics(**totals)
+
+
+def get_dashboard_metrics(today=None):
+    return DashboardMetrics(
+        inventory=get_inventory_metrics(),
+        sales=get_sales_metrics(today),
+    )
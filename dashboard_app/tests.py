@@ -1,3 +1,63 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+
+from products_app.models import Category, Product
+from sales_app import rollups
+from sales_app.models import Customer, Sale, SaleItem
+from stock_app import counters
+from stock_app.models import StockLevel
+from .metrics import get_dashboard_metrics
+
+
+class DashboardMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('staff', password='secret')
+        category = Category.objects.create(name='Câbles')
+        levels = [(10, 2, '5.00'), (1, 2, '3.00'), (0, 5, '7.50')]
+        for index, (current, minimum, price) in enumerate(levels):
+            product = Product.objects.create(
+                name=f'Produit {index}', sku=f'SKU-{index}', category=category,
+                price=Decimal(price), cost_price=Decimal('1.00'),
+            )
+            StockLevel.objects.create(product=product, current_stock=current, minimum_stock=minimum)
+        Product.objects.create(
+            name='Inactif', sku='SKU-X', category=category,
+            price=Decimal('1.00'), cost_price=Decimal('1.00'), is_active=False,
+        )
+        counters.rebuild()
+        customer = Customer.objects.create(name='Client')
+        # The rollups' revenue is the sum of the lines
+        sale = Sale.objects.create(customer=customer, created_by=cls.user, status='COMPLETED', total_amount=Decimal('40.00'))
+        SaleItem.objects.create(sale=sale, product=product, quantity=8, unit_price=Decimal('5.00'))
+        Sale.objects.create(customer=customer, created_by=cls.user, status='PENDING', total_amount=Decimal('99.00'))
+        rollups.rebuild()
+
+    def test_metrics_use_two_queries(self):
+        with self.assertNumQueries(2):
+            metrics = get_dashboard_metrics()
+
+        inventory = metrics.inventory
+        self.assertEqual(inventory.total_products, 4)
+        self.assertEqual(inventory.active_products, 3)
+        self.assertEqual(inventory.total_stock_value, Decimal('53.00'))
+        self.assertEqual(inventory.low_stock_count, 1)
+        self.assertEqual(inventory.out_of_stock_count, 1)
+        self.assertEqual(inventory.alert_count, 2)
+        # The product without a stock level is in none of the buckets
+        self.assertEqual(inventory.in_stock_count, 1)
+
+        sales = metrics.sales
+        self.assertEqual(sales.total_sales, 1)
+        self.assertEqual(sales.total_revenue, Decimal('40.00'))
+        self.assertEqual(sales.today_sales, 1)
+        self.assertEqual(sales.month_revenue, Decimal('40.00'))
 
-# Create your tests here.
+    def test_dashboards_render(self):
+        self.client.force_login(self.user)
+        for name in ('dashboard_app:dashboard', 'stock_app:dashboard', 'sales_app:dashboard'):
+            response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
@@ -1,53 +1,25 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum, Count, F
-from django.utils import timezone
-from datetime import datetime, timedelta
-from products_app.models import Product
+from django.db.models import Sum, F
 from stock_app.models import StockLevel, StockMovement
-from sales_app.models import Sale, SaleItem, Customer
+from sales_app.models import Sale, SaleItem
+from .metrics import get_dashboard_metrics
 
 
 @login_required
 def main_dashboard(request):
-    today = timezone.now().date()
-    this_month = today.replace(day=1)
+    metrics = get_dashboard_metrics()
+    inventory = metrics.inventory
+    sales = metrics.sales
     
-    # Product statistics
-    total_products = Product.objects.count()
-    active_products = Product.objects.filter(is_active=True).count()
-    
-    # Stock statistics
-    total_stock_value = 0
-    low_stock_count = 0
-    out_of_stock_count = 0
-    
-    for stock in StockLevel.objects.select_related('product'):
-        total_stock_value += stock.current_stock * stock.product.price
-        if stock.is_out_of_stock:
-            out_of_stock_count += 1
-        elif stock.is_low_stock:
-            low_stock_count += 1
-    
-    # Sales statistics
-    total_sales = Sale.objects.filter(status='COMPLETED').count()
-    today_sales = Sale.objects.filter(sale_date__date=today, status='COMPLETED').count()
-    
-    total_revenue = Sale.objects.filter(status='COMPLETED').aggregate(
-        total=Sum('total_amount')
-    )['total'] or 0
-    
-    today_revenue = Sale.objects.filter(
-        sale_date__date=today, 
-        status='COMPLETED'
-    ).aggregate(total=Sum('total_amount'))['total'] or 0
+    # The querysets below are lazy: the template only runs them when its
+    # cached fragments are out of date
     
     # Recent activity
     recent_movements = StockMovement.objects.select_related('product', 'created_by')[:5]
     recent_sales = Sale.objects.filter(status='COMPLETED').select_related('customer')[:5]
     
     # Top selling products
-    from django.db.models import F
     top_products = SaleItem.objects.filter(
         sale__status='COMPLETED'
     ).values('product__name').annotate(
@@ -62,19 +34,19 @@ def main_dashboard(request):
     
     context = {
         # Product stats
-        'total_products': total_products,
-        'active_products': active_products,
+        'total_products': inventory.total_products,
+        'active_products': inventory.active_products,
         
         # Stock stats
-        'total_stock_value': total_stock_value,
-        'low_stock_count': low_stock_count,
-        'out_of_stock_count': out_of_stock_count,
+        'total_stock_value': inventory.total_stock_value,
+        'low_stock_count': inventory.low_stock_count,
+        'out_of_stock_count': inventory.out_of_stock_count,
         
         # Sales stats
-        'total_sales': total_sales,
-        'today_sales': today_sales,
-        'total_revenue': total_revenue,
-        'today_revenue': today_revenue,
+        'total_sales': sales.total_sales,
+        'today_sales': sales.today_sales,
+        'total_revenue': sales.total_revenue,
+        'today_revenue': sales.today_revenue,
         
         # Recent activity
         'recent_movements': recent_movements,
@@ -37,11 +37,13 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'core_app',
     'products_app',
     'stock_app',
     'sales_app',
     'dashboard_app',
     'accounts_app',
+    'jobs_app',
 ]
 
 MIDDLEWARE = [
@@ -82,10 +84,41 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # On-disk test database: the in-memory one uses SQLite's shared cache,
+        # which fails concurrent writers immediately instead of letting them wait
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Shared tier of the catalog cache (products_app.catalog), visible to the
+    # web and run_jobs processes alike; each process keeps an LRU in front
+    'catalog': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'catalog',
+        'TIMEOUT': 3600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100_000,
+        },
+    },
+    # Data versions and rendered fragments of core_app.fragments
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'fragments',
+        'TIMEOUT': 24 * 3600,
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -129,6 +162,44 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Stock movements older than this many whole months are moved to monthly
+# archive files under MEDIA_ROOT by the archive_movements command
+STOCK_MOVEMENT_ARCHIVE_MONTHS = 12
+
+# Replenishment policy used by the forecast_stock_levels command to derive
+# minimum (reorder point) and maximum (order-up-to) stock levels
+STOCK_LEAD_TIME_DAYS = 7
+STOCK_REVIEW_DAYS = 7
+STOCK_SERVICE_LEVEL = 0.95
+
+# Background jobs (jobs_app.runner): a running job whose worker has not
+# beaten for JOB_STALE_SECONDS is requeued, up to JOB_MAX_ATTEMPTS starts
+JOB_HEARTBEAT_SECONDS = 30
+JOB_STALE_SECONDS = 300
+JOB_MAX_ATTEMPTS = 2
+
+# Low-stock alerts (stock_app.alerts), sent by the dispatch_stock_alerts
+# command: a product is notified once its status has not changed for
+# STOCK_ALERT_DEBOUNCE_SECONDS, or at the latest STOCK_ALERT_MAX_DELAY_SECONDS
+# after its first change
+STOCK_ALERT_EMAILS = []
+STOCK_ALERT_WEBHOOK_URL = ''
+STOCK_ALERT_WEBHOOK_TIMEOUT = 10
+STOCK_ALERT_DEBOUNCE_SECONDS = 10
+STOCK_ALERT_MAX_DELAY_SECONDS = 60
+# A failed channel is tried again after STOCK_ALERT_RETRY_SECONDS, doubled at
+# every attempt, and given up after STOCK_ALERT_MAX_ATTEMPTS
+STOCK_ALERT_RETRY_SECONDS = 30
+STOCK_ALERT_MAX_ATTEMPTS = 8
+
+# Live updates (core_app.live), served by the ASGI application only:
+# a comment is sent on idle streams every LIVE_HEARTBEAT_SECONDS, and
+# streams are closed (the browser reconnects) after LIVE_STREAM_MAX_SECONDS
+LIVE_HEARTBEAT_SECONDS = 15
+LIVE_STREAM_MAX_SECONDS = 300
+
+DEFAULT_FROM_EMAIL = 'stock@localhost'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -138,3 +209,12 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_URL = '/admin/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/admin/login/'
+
+# manage.py test keeps every cache in memory
+TEST_RUNNER = 'electrical_parts_agency.test_runner.TestRunner'
+
+# Development: outgoing email goes to a local SMTP server, e.g.
+# python -m aiosmtpd -n -l localhost:1025 (manage.py test keeps it in memory)
+if DEBUG:
+    EMAIL_HOST = 'localhost'
+    EMAIL_PORT = 1025
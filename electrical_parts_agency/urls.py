@@ -31,6 +31,8 @@ urlpatterns = [
     path('stock/', include('stock_app.urls')),
     path('sales/', include('sales_app.urls')),
     path('accounts/', include('accounts_app.urls')),
+    path('jobs/', include('jobs_app.urls')),
+    path('live/', include('core_app.urls')),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,78 @@
+"""
+Job handlers, one per Job.kind.
+
+A handler receives the claimed Job and a JobProgress; it reads its input
+from job.input_file / job.params and stores export results in
+job.result_file (under MEDIA_ROOT).
+"""
+
+import io
+import tempfile
+
+from django.core.files import File
+from django.utils import timezone
+
+from core_app.columnar import FORMATS
+from products_app.exports import PRODUCTS_EXPORT
+from products_app.importer import import_products_csv
+from sales_app.exports import CUSTOMERS_EXPORT, SALE_LINES_EXPORT, SALES_EXPORT
+from sales_app.importer import import_customers_csv
+from stock_app.exports import MOVEMENTS_COLUMNAR_EXPORT, MOVEMENTS_EXPORT, STOCK_EXPORT
+
+
+def _count_data_lines(field_file):
+    """Approximate row count (lines minus header) for progress reporting"""
+    with field_file.open('rb') as f:
+        return max(sum(1 for _ in f) - 1, 0)
+
+
+def import_products(job, progress):
+    progress.update(force=True, total_rows=_count_data_lines(job.input_file))
+    with job.input_file.open('rb') as csv_file:
+        result = import_products_csv(csv_file, job.created_by, progress=progress.import_result)
+    progress.import_result(result, force=True)
+
+
+def import_customers(job, progress):
+    progress.update(force=True, total_rows=_count_data_lines(job.input_file))
+    with job.input_file.open('rb') as csv_file:
+        result = import_customers_csv(csv_file, progress=progress.import_result)
+    progress.import_result(result, force=True)
+
+
+def csv_export(export, columnar=None):
+    """Handler writing a core_app.exporters.CsvExport, filtered by job.params.
+
+    With columnar (a core_app.columnar.ColumnarExport), job.params['format']
+    may also be 'parquet' or 'arrow'.
+    """
+    def handler(job, progress):
+        fmt = job.params.get('format', 'csv')
+        if fmt != 'csv' and (columnar is None or fmt not in FORMATS):
+            raise ValueError(f'Format non pris en charge pour cet export : {fmt}')
+        with tempfile.TemporaryFile() as buffer:
+            if fmt == 'csv':
+                out = io.TextIOWrapper(buffer, encoding='utf-8', newline='')
+                rows = export.write(out, job.params)
+                out.flush()
+                out.detach()
+                extension, filename = 'csv', export.filename
+            else:
+                rows = columnar.write(buffer, fmt, job.params)
+                extension, filename = FORMATS[fmt][0], columnar.filename
+            buffer.seek(0)
+            filename = f"{filename}_{timezone.now():%Y%m%d_%H%M%S}.{extension}"
+            job.result_file.save(filename, File(buffer), save=False)
+        progress.update(force=True, total_rows=rows, processed_rows=rows)
+    return handler
+
+
+HANDLERS = {
+    'IMPORT_PRODUCTS': import_products,
+    'IMPORT_CUSTOMERS': import_customers,
+    'EXPORT_PRODUCTS': csv_export(PRODUCTS_EXPORT),
+    'EXPORT_STOCK': csv_export(STOCK_EXPORT),
+    'EXPORT_MOVEMENTS': csv_export(MOVEMENTS_EXPORT, MOVEMENTS_COLUMNAR_EXPORT),
+    'EXPORT_SALES': csv_export(SALES_EXPORT, SALE_LINES_EXPORT),
+    'EXPORT_CUSTOMERS': csv_export(CUSTOMERS_EXPORT),
+}
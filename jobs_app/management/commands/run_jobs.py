@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from jobs_app.runner import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = 'Run queued import/export jobs (background worker)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the jobs currently queued, then exit'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls when the queue is empty'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Job worker started')
+        
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                # Drop stale connections between polls of a long-running worker
+                close_old_connections()
+                time.sleep(options['poll_interval'])
+                continue
+            
+            self.stdout.write(f'  • {job}...')
+            job = run_job(job)
+            if job.status == 'COMPLETED':
+                self.stdout.write(self.style.SUCCESS(f'    ✓ {job.processed_rows} ligne(s)'))
+            else:
+                self.stdout.write(self.style.ERROR(f'    ✗ {job.message}'))
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:26
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('IMPORT_PRODUCTS', 'Import des produits'), ('IMPORT_CUSTOMERS', 'Import des clients'), ('EXPORT_PRODUCTS', 'Export des produits'), ('EXPORT_STOCK', 'Export des niveaux de stock'), ('EXPORT_MOVEMENTS', 'Export des mouvements de stock'), ('EXPORT_SALES', 'Export des ventes'), ('EXPORT_CUSTOMERS', 'Export des clients')], max_length=30, verbose_name='Type')),
+                ('status', models.CharField(choices=[('PENDING', 'En attente'), ('RUNNING', 'En cours'), ('COMPLETED', 'Terminé'), ('FAILED', 'Échoué')], default='PENDING', max_length=20, verbose_name='Statut')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='Paramètres')),
+                ('input_file', models.FileField(blank=True, upload_to='jobs/input/', verbose_name='Fichier source')),
+                ('result_file', models.FileField(blank=True, upload_to='jobs/results/', verbose_name='Fichier résultat')),
+                ('total_rows', models.IntegerField(blank=True, null=True, verbose_name='Lignes totales')),
+                ('processed_rows', models.IntegerField(default=0, verbose_name='Lignes traitées')),
+                ('created_count', models.IntegerField(default=0, verbose_name='Créés')),
+                ('updated_count', models.IntegerField(default=0, verbose_name='Mis à jour')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='Erreurs')),
+                ('error_count', models.IntegerField(default=0, verbose_name="Nombre d'erreurs")),
+                ('message', models.TextField(blank=True, verbose_name='Message')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Démarré le')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Terminé le')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Créé par')),
+            ],
+            options={
+                'verbose_name': 'Tâche',
+                'verbose_name_plural': 'Tâches',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='job_queue_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+from django.db import models
+from django.urls import reverse
+
+
+class Job(models.Model):
+    KIND_CHOICES = [
+        ('IMPORT_PRODUCTS', 'Import des produits'),
+        ('IMPORT_CUSTOMERS', 'Import des clients'),
+        ('EXPORT_PRODUCTS', 'Export des produits'),
+        ('EXPORT_STOCK', 'Export des niveaux de stock'),
+        ('EXPORT_MOVEMENTS', 'Export des mouvements de stock'),
+        ('EXPORT_SALES', 'Export des ventes'),
+        ('EXPORT_CUSTOMERS', 'Export des clients'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('PENDING', 'En attente'),
+        ('RUNNING', 'En cours'),
+        ('COMPLETED', 'Terminé'),
+        ('FAILED', 'Échoué'),
+    ]
+    
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES, verbose_name="Type")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING', verbose_name="Statut")
+    params = models.JSONField(default=dict, blank=True, verbose_name="Paramètres")
+    input_file = models.FileField(upload_to='jobs/input/', blank=True, verbose_name="Fichier source")
+    result_file = models.FileField(upload_to='jobs/results/', blank=True, verbose_name="Fichier résultat")
+    total_rows = models.IntegerField(null=True, blank=True, verbose_name="Lignes totales")
+    processed_rows = models.IntegerField(default=0, verbose_name="Lignes traitées")
+    created_count = models.IntegerField(default=0, verbose_name="Créés")
+    updated_count = models.IntegerField(default=0, verbose_name="Mis à jour")
+    errors = models.JSONField(default=list, blank=True, verbose_name="Erreurs")
+    error_count = models.IntegerField(default=0, verbose_name="Nombre d'erreurs")
+    message = models.TextField(blank=True, verbose_name="Message")
+    created_by = models.ForeignKey('auth.User', on_delete=models.CASCADE, verbose_name="Créé par")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Démarré le")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Terminé le")
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name="Dernier signe de vie")
+    attempts = models.IntegerField(default=0, verbose_name="Tentatives")
+    
+    class Meta:
+        verbose_name = "Tâche"
+        verbose_name_plural = "Tâches"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='job_queue_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.id} ({self.get_status_display()})"
+    
+    @property
+    def is_finished(self):
+        return self.status in ('COMPLETED', 'FAILED')
+    
+    @property
+    def progress(self):
+        """Completion percentage, or None while the row count is unknown"""
+        if self.status == 'COMPLETED':
+            return 100
+        if not self.total_rows:
+            return None
+        return min(99, int(self.processed_rows * 100 / self.total_rows))
+    
+    def get_download_url(self):
+        return reverse('jobs_app:job_download', args=[self.pk])
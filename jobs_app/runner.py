@@ -0,0 +1,165 @@
+"""
+Database-backed job queue.
+
+Views call enqueue() and return immediately; the run_jobs management command
+claims pending jobs one at a time and runs the handler registered for their
+kind (see jobs_app.handlers). Progress is written to the Job row so the
+status endpoint can report it while the job runs.
+
+A running job's heartbeat_at is refreshed every JOB_HEARTBEAT_SECONDS by a
+thread of its worker. A job whose heartbeat is older than JOB_STALE_SECONDS
+lost its worker: the next claim puts it back in the queue, or fails it once
+it has been started JOB_MAX_ATTEMPTS times. The uploaded input file is
+deleted once a job is finished.
+"""
+
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+MAX_STORED_ERRORS = 100
+
+
+def enqueue(kind, user, params=None, input_file=None):
+    """Create a pending job; input_file is an uploaded file to process"""
+    job = Job(kind=kind, created_by=user, params=params or {})
+    if input_file is not None:
+        job.input_file.save(input_file.name, input_file, save=False)
+    job.save()
+    return job
+
+
+# Written when a job finishes; nothing else is, so a job changed meanwhile keeps its other fields
+FINISH_FIELDS = (
+    'status', 'message', 'result_file', 'finished_at', 'total_rows', 'processed_rows', 'created_count',
+    'updated_count', 'errors', 'error_count',
+)
+
+
+def _finish(job, current='RUNNING'):
+    """Record the outcome of job unless its status is no longer current; returns whether it was recorded.
+
+    A running job reclaimed by another worker is left as the reclaim made it,
+    with its input file, and the result file of this run is removed.
+    """
+    job.finished_at = timezone.now()
+    values = {name: getattr(job, name) for name in FINISH_FIELDS}
+    if not Job.objects.filter(pk=job.pk, status=current).update(**values):
+        logger.warning('Job %s was reclaimed while running; its outcome is discarded', job.pk)
+        if job.result_file:
+            job.result_file.delete(save=False)
+        return False
+    if job.input_file:
+        job.input_file.delete(save=False)
+        Job.objects.filter(pk=job.pk).update(input_file='')
+    return True
+
+
+def reclaim_stale_jobs(now=None):
+    """Requeue (or fail, after JOB_MAX_ATTEMPTS starts) the running jobs whose worker stopped beating"""
+    limit = (now or timezone.now()) - timedelta(seconds=settings.JOB_STALE_SECONDS)
+    stale = Job.objects.filter(
+        Q(heartbeat_at__lt=limit) | Q(heartbeat_at__isnull=True, started_at__lt=limit), status='RUNNING',
+    )
+    requeued = stale.filter(attempts__lt=settings.JOB_MAX_ATTEMPTS).update(status='PENDING', started_at=None)
+    for job in stale.filter(attempts__gte=settings.JOB_MAX_ATTEMPTS):
+        # Conditional, like claiming: another worker may have failed it first
+        if Job.objects.filter(pk=job.pk, status='RUNNING').update(status='FAILED'):
+            job.status = 'FAILED'
+            job.message = 'Le traitement a été interrompu (worker arrêté)'
+            _finish(job, current='FAILED')
+    return requeued
+
+
+def claim_next_job():
+    """Atomically mark the oldest pending job as running and return it.
+
+    The conditional UPDATE makes claiming safe with several workers: only one
+    of them can move a given job out of PENDING.
+    """
+    reclaim_stale_jobs()
+    while True:
+        job_id = (
+            Job.objects.filter(status='PENDING')
+            .order_by('created_at', 'id')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+        now = timezone.now()
+        claimed = Job.objects.filter(pk=job_id, status='PENDING').update(
+            status='RUNNING', started_at=now, heartbeat_at=now, attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=job_id)
+
+
+class JobProgress:
+    """Writes progress counters to the job row, at most once per interval"""
+
+    def __init__(self, job, interval=1.0):
+        self.job = job
+        self.interval = interval
+        self._last_saved = 0
+
+    def update(self, force=False, **values):
+        for name, value in values.items():
+            setattr(self.job, name, value)
+        now = time.monotonic()
+        if force or now - self._last_saved >= self.interval:
+            self._last_saved = now
+            Job.objects.filter(pk=self.job.pk).update(**values)
+
+    def import_result(self, result, force=False):
+        self.update(
+            force=force,
+            processed_rows=result.rows,
+            created_count=result.created,
+            updated_count=result.updated,
+            error_count=result.error_count,
+            errors=result.errors[:MAX_STORED_ERRORS],
+        )
+
+
+def _beat(job_id, stopped):
+    """Heartbeat thread of a running job"""
+    try:
+        while not stopped.wait(settings.JOB_HEARTBEAT_SECONDS):
+            Job.objects.filter(pk=job_id, status='RUNNING').update(heartbeat_at=timezone.now())
+    finally:
+        connection.close()
+
+
+def run_job(job):
+    """Run a claimed job to completion, recording failures on the job"""
+    from .handlers import HANDLERS
+
+    progress = JobProgress(job)
+    stopped = threading.Event()
+    heartbeat = threading.Thread(target=_beat, args=(job.pk, stopped), daemon=True)
+    heartbeat.start()
+    try:
+        handler = HANDLERS[job.kind]
+        handler(job, progress)
+    except Exception as e:
+        logger.exception('Job %s failed', job.pk)
+        job.status = 'FAILED'
+        job.message = str(e)
+    else:
+        job.status = 'COMPLETED'
+    finally:
+        stopped.set()
+        heartbeat.join()
+    _finish(job)
+    return job
@@ -0,0 +1,110 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from tempfile import TemporaryDirectory
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from products_app.models import Category, Product
+from .models import Job
+from .runner import claim_next_job, enqueue, reclaim_stale_jobs, run_job
+
+
+class JobRunnerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('staff', password='secret')
+        self.client.force_login(self.user)
+        media_root = TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_background_export_produces_downloadable_file(self):
+        category = Category.objects.create(name='LEDs')
+        Product.objects.create(
+            name='LED Rouge', sku='LED-1', category=category,
+            price=Decimal('0.30'), cost_price=Decimal('0.15'),
+        )
+
+        response = self.client.get(reverse('products_app:export_products'), {'background': 1})
+        job = Job.objects.get()
+        self.assertRedirects(response, reverse('jobs_app:job_detail', args=[job.pk]))
+
+        call_command('run_jobs', '--once', stdout=StringIO())
+
+        status = self.client.get(reverse('jobs_app:job_status', args=[job.pk])).json()
+        self.assertEqual(status['status'], 'COMPLETED')
+        self.assertEqual(status['processed_rows'], 1)
+        self.assertEqual(status['progress'], 100)
+
+        response = self.client.get(status['download_url'])
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertIn('LED-1', content)
+
+    def test_claim_is_exclusive_and_failures_are_recorded(self):
+        job = enqueue('IMPORT_PRODUCTS', self.user)
+
+        self.assertEqual(claim_next_job(), job)
+        self.assertIsNone(claim_next_job())
+
+        Job.objects.filter(pk=job.pk).update(status='PENDING')
+        call_command('run_jobs', '--once', stdout=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'FAILED')
+        self.assertTrue(job.message)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_jobs_of_a_dead_worker_are_requeued_then_failed(self):
+        upload = SimpleUploadedFile('produits.csv', b'Name,SKU,Category,Price\n')
+        job = enqueue('IMPORT_PRODUCTS', self.user, input_file=upload)
+        self.assertEqual(claim_next_job(), job)
+        later = timezone.now() + timedelta(seconds=settings.JOB_STALE_SECONDS + 1)
+        self.assertEqual(reclaim_stale_jobs(timezone.now()), 0)
+
+        # The worker died: the job goes back to the queue once
+        self.assertEqual(reclaim_stale_jobs(later), 1)
+        self.assertEqual(claim_next_job(), job)
+        self.assertEqual(reclaim_stale_jobs(later), 0)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('FAILED', 2))
+        self.assertFalse(job.input_file)
+
+    def test_input_file_is_deleted_when_the_job_finishes(self):
+        upload = SimpleUploadedFile('produits.csv', b'Name,SKU,Category,Price\nLED,LED-1,LEDs,1\n')
+        job = enqueue('IMPORT_PRODUCTS', self.user, input_file=upload)
+        storage, name = job.input_file.storage, job.input_file.name
+        job = run_job(claim_next_job())
+        self.assertEqual(job.status, 'COMPLETED')
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(Job.objects.get(pk=job.pk).input_file)
+
+    def test_a_job_reclaimed_while_running_keeps_its_new_status(self):
+        upload = SimpleUploadedFile('produits.csv', b'Name,SKU,Category,Price\nLED,LED-1,LEDs,1\n')
+        job = enqueue('IMPORT_PRODUCTS', self.user, input_file=upload)
+        storage, name = job.input_file.storage, job.input_file.name
+        job = claim_next_job()
+        # Another worker requeues it while this one is still running
+        Job.objects.filter(pk=job.pk).update(status='PENDING', started_at=None)
+
+        with self.assertLogs('jobs_app.runner', 'WARNING'):
+            run_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.finished_at), ('PENDING', None))
+        self.assertTrue(storage.exists(name))
+
+    def test_jobs_are_private_to_their_owner(self):
+        job = enqueue('EXPORT_STOCK', self.user)
+        other = User.objects.create_user('other', password='secret')
+        self.client.force_login(other)
+
+        response = self.client.get(reverse('jobs_app:job_status', args=[job.pk]))
+
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,57 @@
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import get_object_or_404, render
+from .models import Job
+
+
+def _get_job(request, pk):
+    jobs = Job.objects.all()
+    if not request.user.is_staff:
+        jobs = jobs.filter(created_by=request.user)
+    return get_object_or_404(jobs, pk=pk)
+
+
+@login_required
+def job_list(request):
+    jobs = Job.objects.filter(created_by=request.user)[:50]
+    return render(request, 'jobs_app/job_list.html', {'jobs': jobs})
+
+
+@login_required
+def job_detail(request, pk):
+    job = _get_job(request, pk)
+    return render(request, 'jobs_app/job_detail.html', {'job': job})
+
+
+@login_required
+def job_status(request, pk):
+    """JSON progress report polled by the job detail page"""
+    job = _get_job(request, pk)
+    return JsonResponse({
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'finished': job.is_finished,
+        'progress': job.progress,
+        'total_rows': job.total_rows,
+        'processed_rows': job.processed_rows,
+        'created_count': job.created_count,
+        'updated_count': job.updated_count,
+        'error_count': job.error_count,
+        'errors': job.errors,
+        'message': job.message,
+        'download_url': job.get_download_url() if job.result_file else None,
+    })
+
+
+@login_required
+def job_download(request, pk):
+    job = _get_job(request, pk)
+    if not job.result_file:
+        raise Http404('Aucun fichier pour cette tâche')
+    return FileResponse(
+        job.result_file.open('rb'),
+        as_attachment=True,
+        filename=job.result_file.name.rsplit('/', 1)[-1],
+    )
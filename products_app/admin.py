@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Product
+from .models import Category, Product, Supplier
 
 
 @admin.register(Category)
@@ -9,10 +9,16 @@ class CategoryAdmin(admin.ModelAdmin):
     list_filter = ['created_at']
 
 
+@admin.register(Supplier)
+class SupplierAdmin(admin.ModelAdmin):
+    list_display = ['name', 'email', 'phone', 'created_at']
+    search_fields = ['name', 'email']
+
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ['name', 'sku', 'category', 'price', 'cost_price', 'is_active', 'created_at']
-    list_filter = ['category', 'is_active', 'created_at']
+    list_display = ['name', 'sku', 'category', 'supplier', 'price', 'cost_price', 'is_active', 'created_at']
+    list_filter = ['category', 'supplier', 'is_active', 'created_at']
     search_fields = ['name', 'sku', 'description']
     list_editable = ['price', 'cost_price', 'is_active']
-    raw_id_fields = ['category']
\ No newline at end of file
+    raw_id_fields = ['category', 'supplier']
\ No newline at end of file
@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ProductsAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'products_app'
\ No newline at end of file
+    name = 'products_app'
+
+    def ready(self):
+        from . import signals
+        post_migrate.connect(signals.clear_catalog_cache, sender=self)
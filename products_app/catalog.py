@@ -0,0 +1,85 @@
+"""
+Read-through cache of catalog objects.
+
+Products and categories are cached by primary key, stock levels and
+product metrics by product id, and the category list as a whole. Keys embed
+a per-model version number: invalidate() drops single objects and is called
+by the post_save/post_delete receivers, invalidate_all() bumps the version
+and is meant for bulk writes, which send no signals. Both run again once the transaction commits, so a
+read made in between cannot leave the old row in the cache.
+"""
+
+from django.db import transaction
+
+from core_app.cache import TieredCache
+from stock_app.models import ProductMetrics, StockLevel
+from .models import Category, Product
+
+CACHE = TieredCache('catalog', 'catalog', max_entries=2048, local_ttl=5)
+
+# model -> field the objects are looked up by
+KEY_FIELDS = {
+    Product: 'pk',
+    Category: 'pk',
+    StockLevel: 'product_id',
+    ProductMetrics: 'product_id',
+}
+
+
+def _version_key(model):
+    return f'{model._meta.label_lower}:version'
+
+
+def _key(model, value):
+    return f'{model._meta.label_lower}:v{CACHE.counter(_version_key(model))}:{value}'
+
+
+def get(model, value):
+    """The instance of model whose key field is value, or None"""
+    lookup = {KEY_FIELDS[model]: value}
+    return CACHE.get_or_set(_key(model, value), lambda: model._default_manager.filter(**lookup).first())
+
+
+def get_product(pk):
+    return get(Product, pk)
+
+
+def get_category(pk):
+    return get(Category, pk)
+
+
+def get_stock_level(product_id):
+    return get(StockLevel, product_id)
+
+
+def get_metrics(product_id):
+    return get(ProductMetrics, product_id)
+
+
+def categories():
+    """All categories, in their default order"""
+    return CACHE.get_or_set(_key(Category, 'all'), lambda: list(Category.objects.all()))
+
+
+def invalidate(model, values):
+    """Forget the cached instances of model with these key values"""
+    keys = [_key(model, value) for value in values]
+    if model is Category:
+        keys.append(_key(Category, 'all'))
+    CACHE.delete_many(keys)
+    transaction.on_commit(lambda: CACHE.delete_many(keys))
+
+
+def invalidate_all(model):
+    """Forget every cached instance of model"""
+    CACHE.increment(_version_key(model))
+    transaction.on_commit(lambda: CACHE.increment(_version_key(model)))
+
+
+def clear():
+    CACHE.shared.clear()
+    CACHE.clear_local()
+
+
+def stats():
+    return CACHE.stats()
@@ -0,0 +1,27 @@
+"""CSV exports, shared by the download views and the background job runner"""
+
+from django.db.models import Q
+
+from core_app.exporters import CsvExport
+from .models import Product
+
+
+def _search(products, query):
+    return products.filter(
+        Q(name__icontains=query) |
+        Q(sku__icontains=query) |
+        Q(description__icontains=query)
+    )
+
+
+PRODUCTS_EXPORT = CsvExport(
+    filename='products',
+    header=['Name', 'SKU', 'Category', 'Price', 'Cost Price', 'Status', 'Description'],
+    get_queryset=Product.objects.all,
+    fields=('name', 'sku', 'category__name', 'price', 'cost_price', 'is_active', 'description'),
+    format_row=lambda name, sku, category, price, cost_price, is_active, description: [
+        name, sku, category, price, cost_price, 'Active' if is_active else 'Inactive', description,
+    ],
+    date_field='created_at',
+    filters={'search': _search, 'category': 'category_id'},
+)
@@ -5,12 +5,13 @@ from .models import Product, Category
 class ProductForm(forms.ModelForm):
     class Meta:
         model = Product
-        fields = ['name', 'description', 'sku', 'category', 'price', 'cost_price', 'image', 'is_active']
+        fields = ['name', 'description', 'sku', 'category', 'supplier', 'price', 'cost_price', 'image', 'is_active']
         labels = {
             'name': 'Nom',
             'description': 'Description',
             'sku': 'Référence',
             'category': 'Catégorie',
+            'supplier': 'Fournisseur',
             'price': 'Prix de vente',
             'cost_price': 'Prix d\'achat',
             'image': 'Image',
@@ -23,6 +24,7 @@ class ProductForm(forms.ModelForm):
             'price': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
             'cost_price': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
             'category': forms.Select(attrs={'class': 'form-control'}),
+            'supplier': forms.Select(attrs={'class': 'form-control'}),
             'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
             'is_active': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
@@ -0,0 +1,270 @@
+"""
+Streaming CSV product import.
+
+The file is parsed row by row and applied in chunks: each chunk resolves its
+categories and existing SKUs with one IN query each, upserts the products in
+bulk and posts stock quantities through the stock mutation service, inside
+its own transaction. Used by the import view and the import_products
+management command.
+"""
+
+import codecs
+import csv
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from itertools import chain, islice
+from typing import Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from core_app import fragments
+from stock_app import alerts, counters
+from stock_app.models import StockLevel
+from stock_app.services import MovementLine, apply_movements, create_stock_levels, publish_levels
+from . import catalog, search
+from .models import Category, Product
+
+DEFAULT_CHUNK_SIZE = 1000
+
+PRODUCT_UPDATE_FIELDS = ['name', 'description', 'category', 'price', 'cost_price', 'is_active', 'updated_at']
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    updated: int = 0
+    rows: int = 0
+    errors: list = field(default_factory=list)
+
+    @property
+    def error_count(self):
+        return len(self.errors)
+
+
+@dataclass
+class _ProductRow:
+    row_num: int
+    sku: str
+    category_name: str
+    data: dict
+    current_stock: Optional[int] = None
+    minimum_stock: Optional[int] = None
+
+
+def _parse_decimal(row, column, label):
+    """Decimal value of column; 0 when the file has no such column, an error when the cell is empty"""
+    if column not in row:
+        return Decimal('0')
+    value = (row[column] or '').strip()
+    if not value:
+        raise ValueError(f'{label} manquant')
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f'{label} invalide: {value!r}')
+
+
+def _parse_stock(value, label):
+    value = (value or '').strip()
+    if not value:
+        return None
+    try:
+        quantity = int(value)
+    except ValueError:
+        raise ValueError(f'{label} invalide: {value!r}')
+    if quantity < 0:
+        raise ValueError(f'{label} négatif: {quantity}')
+    return quantity
+
+
+def parse_row(row_num, row):
+    """Validate one CSV row, raising ValueError with a user-facing message"""
+    category_name = (row.get('Category') or '').strip()
+    if not category_name:
+        raise ValueError('Catégorie manquante')
+    sku = (row.get('SKU') or '').strip()
+    if not sku:
+        raise ValueError('SKU manquante')
+
+    return _ProductRow(
+        row_num=row_num,
+        sku=sku,
+        category_name=category_name,
+        data={
+            'name': (row.get('Name') or '').strip(),
+            'description': (row.get('Description') or '').strip(),
+            'price': _parse_decimal(row, 'Price', 'Prix'),
+            'cost_price': _parse_decimal(row, 'Cost_Price', "Prix d'achat"),
+            'is_active': (row.get('Status') or 'Active').strip().lower() == 'active',
+        },
+        current_stock=_parse_stock(row.get('Stock_Actuel'), 'Stock actuel'),
+        minimum_stock=_parse_stock(row.get('Stock_Minimum'), 'Stock minimum'),
+    )
+
+
+def iter_csv_rows(fileobj, encoding='utf-8-sig'):
+    """Yield (row_num, row dict) from a binary or text file without reading it whole"""
+    lines = iter(fileobj)
+    first = next(lines, None)
+    if first is None:
+        return
+    lines = chain([first], lines)
+    if isinstance(first, bytes):
+        lines = codecs.iterdecode(lines, encoding)
+    yield from enumerate(csv.DictReader(lines), start=2)
+
+
+def _resolve_categories(names):
+    categories = {c.name: c for c in Category.objects.filter(name__in=names)}
+    missing = [Category(name=name) for name in names if name not in categories]
+    if missing:
+        Category.objects.bulk_create(missing, ignore_conflicts=True)
+        catalog.invalidate_all(Category)
+        categories.update(
+            (c.name, c) for c in Category.objects.filter(name__in=[c.name for c in missing])
+        )
+    return categories
+
+
+@transaction.atomic
+def _apply_chunk(rows, user):
+    """Upsert one chunk of parsed rows, returning (created, updated)"""
+    created = updated = 0
+    # The last row wins when a SKU appears several times in the chunk
+    by_sku = {}
+    for row in rows:
+        if row.sku in by_sku:
+            updated += 1
+        by_sku[row.sku] = row
+    rows = list(by_sku.values())
+
+    categories = _resolve_categories({row.category_name for row in rows})
+    existing = {
+        product.sku: product
+        for product in Product.objects.filter(sku__in=by_sku).select_related('stock_level')
+    }
+
+    now = timezone.now()
+    products = []
+    for row in rows:
+        product = Product(sku=row.sku, category=categories[row.category_name], **row.data)
+        product.created_at = product.updated_at = now
+        products.append(product)
+    Product.objects.bulk_create(
+        products,
+        update_conflicts=True,
+        unique_fields=['sku'],
+        update_fields=PRODUCT_UPDATE_FIELDS,
+    )
+    ids = dict(Product.objects.filter(sku__in=by_sku).values_list('sku', 'id'))
+    # bulk_create() sends no post_save, so the search index and the catalog
+    # cache are updated here
+    search.index_products(ids.values())
+    catalog.invalidate(Product, ids.values())
+    fragments.bump('catalog')
+
+    delta = counters.EMPTY
+    new_levels, changed_levels, adjustments, crossings = [], [], [], []
+    for row, product in zip(rows, products):
+        product.pk = ids[row.sku]
+        previous = existing.get(row.sku)
+        level = getattr(previous, 'stock_level', None) if previous else None
+
+        if previous is None:
+            created += 1
+            delta += counters.product_state(product.is_active)
+        else:
+            updated += 1
+            delta += counters.product_state(product.is_active) - counters.product_state(previous.is_active)
+            if level and previous.price != product.price:
+                delta += (
+                    counters.level_state(level.current_stock, level.minimum_stock, product.price)
+                    - counters.level_state(level.current_stock, level.minimum_stock, previous.price)
+                )
+
+        if row.current_stock is None and row.minimum_stock is None:
+            continue
+        if level is None:
+            new_levels.append(StockLevel(
+                product=product,
+                current_stock=row.current_stock or 0,
+                minimum_stock=row.minimum_stock or 0,
+            ))
+            continue
+        if row.minimum_stock is not None and row.minimum_stock != level.minimum_stock:
+            crossings.append((
+                product.pk, (level.current_stock, level.minimum_stock), (level.current_stock, row.minimum_stock),
+            ))
+            delta += (
+                counters.level_state(level.current_stock, row.minimum_stock, product.price)
+                - counters.level_state(level.current_stock, level.minimum_stock, product.price)
+            )
+            level.minimum_stock = row.minimum_stock
+            level.last_updated = now
+            changed_levels.append(level)
+        if row.current_stock is not None and row.current_stock != level.current_stock:
+            # Stock_Actuel is the product total: the default location takes the
+            # difference, the stock held elsewhere is left as it is
+            difference = row.current_stock - level.current_stock
+            adjustments.append(MovementLine(product, 'IN' if difference > 0 else 'OUT', abs(difference)))
+
+    StockLevel.objects.bulk_update(changed_levels, ['minimum_stock', 'last_updated'])
+    catalog.invalidate(StockLevel, [level.product_id for level in changed_levels])
+    if changed_levels:
+        fragments.bump('stock')
+        publish_levels(changed_levels)
+    counters.record(delta)
+    alerts.record(crossings)
+    create_stock_levels(new_levels, user, reference='Import CSV')
+    apply_movements(adjustments, user, reference='Import CSV')
+    return created, updated
+
+
+def _apply_rows(rows, user, result):
+    for row in rows:
+        try:
+            created, updated = _apply_chunk([row], user)
+        except Exception as e:
+            result.errors.append(f'Ligne {row.row_num}: {e}')
+        else:
+            result.created += created
+            result.updated += updated
+
+
+def import_products_csv(fileobj, user, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Import products from a CSV file object and return an ImportResult.
+
+    Each chunk of rows is committed on its own; rows that fail validation are
+    reported in result.errors and skipped. A chunk that fails as a whole is
+    applied again row by row, so the error names the failing row. progress,
+    if given, is called with the result after every chunk.
+    """
+    result = ImportResult()
+    rows = iter_csv_rows(fileobj)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        parsed = []
+        for row_num, row in chunk:
+            try:
+                parsed.append(parse_row(row_num, row))
+            except ValueError as e:
+                result.errors.append(f'Ligne {row_num}: {e}')
+
+        if parsed:
+            try:
+                created, updated = _apply_chunk(parsed, user)
+                result.created += created
+                result.updated += updated
+            except Exception:
+                # The chunk was rolled back: apply its rows one by one to
+                # report the ones that fail
+                _apply_rows(parsed, user, result)
+
+        result.rows += len(chunk)
+        if progress:
+            progress(result)
+    return result
@@ -1,6 +1,9 @@
 from django.core.management.base import BaseCommand
+from core_app import fragments
 from products_app.models import Category, Product
+from stock_app import counters
 from stock_app.models import StockLevel, StockMovement
+from sales_app import rollups
 from sales_app.models import Customer, Sale, SaleItem
 
 
@@ -21,6 +24,10 @@ class Command(BaseCommand):
         deleted_counts['Products'] = Product.objects.all().delete()[0]
         deleted_counts['Categories'] = Category.objects.all().delete()[0]
         
+        counters.rebuild()
+        rollups.rebuild()
+        fragments.invalidate_all()
+        
         self.stdout.write(self.style.SUCCESS('\n✅ Data deleted successfully!\n'))
         self.stdout.write('Deleted:')
         for model, count in deleted_counts.items():
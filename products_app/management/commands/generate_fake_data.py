@@ -6,6 +6,7 @@ from decimal import Decimal
 from datetime import timedelta
 import random
 from products_app.models import Category, Product
+from stock_app import counters
 from stock_app.models import StockLevel, StockMovement
 from sales_app.models import Customer, Sale, SaleItem
 
@@ -219,6 +220,9 @@ class Command(BaseCommand):
             else:
                 pending_count += 1
         
+        # Stock levels above were created directly, resync the running totals
+        counters.rebuild()
+        
         self.stdout.write(f'Created sales: {completed_count} completed, {pending_count} pending')
         
         self.stdout.write(
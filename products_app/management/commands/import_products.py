@@ -0,0 +1,43 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from products_app.importer import DEFAULT_CHUNK_SIZE, import_products_csv
+
+
+class Command(BaseCommand):
+    help = 'Import products from a CSV file (same format as the web import)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', help='Path to the CSV file')
+        parser.add_argument(
+            '--user',
+            default='admin',
+            help='Username recorded on the stock movements (default: admin)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help='Rows applied per transaction'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist")
+        
+        def report(result):
+            self.stdout.write(f'  • {result.rows} lignes traitées')
+        
+        with open(options['csv_path'], 'rb') as csv_file:
+            result = import_products_csv(
+                csv_file, user, chunk_size=options['chunk_size'], progress=report
+            )
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✅ Import terminé: {result.created} créé(s), {result.updated} mis à jour'
+        ))
+        if result.errors:
+            self.stdout.write(self.style.WARNING(f'{result.error_count} erreur(s):'))
+            for error in result.errors:
+                self.stdout.write(f'  • {error}')
@@ -1,7 +1,9 @@
 from django.core.management.base import BaseCommand
+from core_app import fragments
 from django.contrib.auth import get_user_model
 from django.db.models import F
 from products_app.models import Category, Product
+from stock_app import counters
 from stock_app.models import StockLevel, StockMovement
 from sales_app.models import Customer, Sale, SaleItem
 from decimal import Decimal
@@ -23,6 +25,7 @@ class Command(BaseCommand):
         StockLevel.objects.all().delete()
         Product.objects.all().delete()
         Category.objects.all().delete()
+        fragments.invalidate_all()
         
         self.stdout.write(self.style.SUCCESS('✓ Data cleared'))
         
@@ -237,6 +240,9 @@ class Command(BaseCommand):
         sale4.complete_sale(admin_user)
         self.stdout.write(f'    ✓ Vente #{sale4.id} à {sale4.customer.name} - COMPLÉTÉE')
         
+        # Stock levels above were created directly, resync the running totals
+        counters.rebuild()
+        
         self.stdout.write(self.style.SUCCESS('\n✅ Sample data created successfully!'))
         self.stdout.write('\n📊 Summary:')
         self.stdout.write(f'  • Categories: {Category.objects.count()}')
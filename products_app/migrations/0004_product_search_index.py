@@ -0,0 +1,79 @@
+from django.db import migrations
+
+SQLITE_CREATE = [
+    # rowid is the product id; prefix indexes make "tok"* queries cheap
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_app_product_fts USING fts5("
+    "name, sku, description, "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    # SKU fragments ("00123" in "EL-001234"), at least 3 characters
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_app_product_sku_trigram USING fts5("
+    "sku, tokenize='trigram')",
+]
+SQLITE_DROP = [
+    'DROP TABLE IF EXISTS products_app_product_fts',
+    'DROP TABLE IF EXISTS products_app_product_sku_trigram',
+]
+POSTGRES_CREATE = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE TABLE IF NOT EXISTS products_app_product_search ('
+    'product_id bigint PRIMARY KEY REFERENCES products_app_product(id) '
+    'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+    'document tsvector NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS products_app_product_search_document '
+    'ON products_app_product_search USING gin(document)',
+    'CREATE INDEX IF NOT EXISTS products_app_product_sku_trgm '
+    'ON products_app_product USING gin(sku gin_trgm_ops)',
+]
+# Index the existing products, with the same statements as search.rebuild()
+SQLITE_FILL = [
+    'DELETE FROM products_app_product_fts',
+    'DELETE FROM products_app_product_sku_trigram',
+    'INSERT INTO products_app_product_fts(rowid, name, sku, description) '
+    'SELECT id, name, sku, description FROM products_app_product',
+    'INSERT INTO products_app_product_sku_trigram(rowid, sku) '
+    'SELECT id, sku FROM products_app_product',
+]
+POSTGRES_FILL = [
+    'TRUNCATE products_app_product_search',
+    "INSERT INTO products_app_product_search(product_id, document) "
+    "SELECT id, setweight(to_tsvector('simple', name), 'A') "
+    "|| setweight(to_tsvector('simple', sku), 'B') "
+    "|| setweight(to_tsvector('simple', description), 'C') "
+    "FROM products_app_product",
+]
+POSTGRES_DROP = [
+    'DROP INDEX IF EXISTS products_app_product_sku_trgm',
+    'DROP TABLE IF EXISTS products_app_product_search',
+]
+
+
+def _execute(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _execute(schema_editor, SQLITE_CREATE + SQLITE_FILL)
+    elif vendor == 'postgresql':
+        _execute(schema_editor, POSTGRES_CREATE + POSTGRES_FILL)
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _execute(schema_editor, SQLITE_DROP)
+    elif vendor == 'postgresql':
+        _execute(schema_editor, POSTGRES_DROP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products_app', '0003_product_name_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products_app', '0004_product_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Supplier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True, verbose_name='Nom')),
+                ('email', models.EmailField(blank=True, max_length=254, verbose_name='Email')),
+                ('phone', models.CharField(blank=True, max_length=50, verbose_name='Téléphone')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+            ],
+            options={
+                'verbose_name': 'Fournisseur',
+                'verbose_name_plural': 'Fournisseurs',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='supplier',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='products', to='products_app.supplier', verbose_name='Fournisseur'),
+        ),
+    ]
@@ -18,11 +18,29 @@ class Category(models.Model):
         return self.name
 
 
+class Supplier(models.Model):
+    name = models.CharField(max_length=200, unique=True, verbose_name="Nom")
+    email = models.EmailField(blank=True, verbose_name="Email")
+    phone = models.CharField(max_length=50, blank=True, verbose_name="Téléphone")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
+
+    class Meta:
+        verbose_name = "Fournisseur"
+        verbose_name_plural = "Fournisseurs"
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
 class Product(models.Model):
     name = models.CharField(max_length=200, verbose_name="Nom")
     description = models.TextField(blank=True, verbose_name="Description")
     sku = models.CharField(max_length=50, unique=True, verbose_name="Référence")
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products', verbose_name="Catégorie")
+    supplier = models.ForeignKey(
+        Supplier, on_delete=models.SET_NULL, null=True, blank=True, related_name='products', verbose_name="Fournisseur",
+    )
     price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))], verbose_name="Prix de vente")
     cost_price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))], verbose_name="Prix d'achat")
     image = models.ImageField(upload_to='products/', blank=True, null=True, verbose_name="Image")
@@ -34,6 +52,11 @@ class Product(models.Model):
         verbose_name = "Produit"
         verbose_name_plural = "Produits"
         ordering = ['name']
+        indexes = [
+            # Product list (keyset-paginated on name, id) and the stock lists
+            # ordered by product name
+            models.Index(fields=['name', 'id'], name='product_name_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.sku})"
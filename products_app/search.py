@@ -0,0 +1,308 @@
+"""
+Full-text product search.
+
+The index lives in side tables created by migration 0004, keyed by product
+id, and is kept in sync by the Product signals (see products_app.signals);
+bulk writes that bypass signals call index_products() themselves.
+
+- SQLite: an FTS5 table over name, sku and description (unicode61 tokens
+  with prefix indexes) plus an FTS5 trigram table over sku for fragments.
+- PostgreSQL: a tsvector table with a GIN index plus a pg_trgm index on
+  products_app_product.sku.
+
+Other backends fall back to icontains filtering, without ranking.
+"""
+
+import re
+from dataclasses import dataclass
+
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from core_app.pagination import CURSOR_PARAM, CursorPage
+
+FTS_TABLE = 'products_app_product_fts'
+SKU_TABLE = 'products_app_product_sku_trigram'
+PG_TABLE = 'products_app_product_search'
+
+DEFAULT_LIMIT = 100
+PER_PAGE = 20
+MIN_FRAGMENT = 3
+ID_BATCH = 500
+
+# Highlight markers, replaced by <mark> once the snippet is HTML-escaped
+_START, _END = '\x02', '\x03'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    product_id: int
+    rank: float
+    snippet: str
+
+    @property
+    def snippet_html(self):
+        html = escape(self.snippet).replace(_START, '<mark>').replace(_END, '</mark>')
+        return mark_safe(html)
+
+
+def backend():
+    """'sqlite', 'postgresql' or None when full-text search is not available"""
+    return connection.vendor if connection.vendor in ('sqlite', 'postgresql') else None
+
+
+def _batches(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), ID_BATCH):
+        yield ids[start:start + ID_BATCH]
+
+
+def _placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def _limit(limit):
+    """LIMIT clause and its parameters; None means every match"""
+    return ('', []) if limit is None else (' LIMIT %s', [limit])
+
+
+# --- Index maintenance -------------------------------------------------------
+
+def index_products(product_ids):
+    """(Re)index the given products; ids of deleted products are removed"""
+    if backend() is None:
+        return
+    with connection.cursor() as cursor:
+        for ids in _batches(product_ids):
+            _delete(cursor, ids)
+            _insert(cursor, f'WHERE id IN ({_placeholders(ids)})', ids)
+
+
+def remove_products(product_ids):
+    if backend() is None:
+        return
+    with connection.cursor() as cursor:
+        for ids in _batches(product_ids):
+            _delete(cursor, ids)
+
+
+def rebuild():
+    """Recreate the whole index from products_app_product"""
+    if backend() is None:
+        return
+    with connection.cursor() as cursor:
+        if backend() == 'sqlite':
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(f'DELETE FROM {SKU_TABLE}')
+        else:
+            cursor.execute(f'TRUNCATE {PG_TABLE}')
+        _insert(cursor, '', [])
+        if backend() == 'sqlite':
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+
+def _delete(cursor, ids):
+    if backend() == 'sqlite':
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({_placeholders(ids)})', ids)
+        cursor.execute(f'DELETE FROM {SKU_TABLE} WHERE rowid IN ({_placeholders(ids)})', ids)
+    else:
+        cursor.execute(f'DELETE FROM {PG_TABLE} WHERE product_id IN ({_placeholders(ids)})', ids)
+
+
+def _insert(cursor, where, params):
+    if backend() == 'sqlite':
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}(rowid, name, sku, description) '
+            f'SELECT id, name, sku, description FROM products_app_product {where}',
+            params,
+        )
+        cursor.execute(
+            f'INSERT INTO {SKU_TABLE}(rowid, sku) SELECT id, sku FROM products_app_product {where}',
+            params,
+        )
+    else:
+        cursor.execute(
+            f"INSERT INTO {PG_TABLE}(product_id, document) "
+            f"SELECT id, setweight(to_tsvector('simple', name), 'A') "
+            f"|| setweight(to_tsvector('simple', sku), 'B') "
+            f"|| setweight(to_tsvector('simple', description), 'C') "
+            f"FROM products_app_product {where}",
+            params,
+        )
+
+
+# --- Queries -----------------------------------------------------------------
+
+def _within(column, within):
+    """SQL restricting column to the ids selected by the within queryset"""
+    if within is None:
+        return '', []
+    sql, params = within.query.sql_with_params()
+    return f' AND {column} IN ({sql})', list(params)
+
+
+def search(query, within=None, limit=DEFAULT_LIMIT):
+    """Best matching products for query, as a list of SearchHit.
+
+    Every word is matched as a prefix of a word of the name, SKU or
+    description; a query of MIN_FRAGMENT characters or more also matches
+    anywhere inside a SKU, and those hits come first. within is an optional
+    queryset of product ids (e.g. a filtered .values('pk')) to search in,
+    and limit None returns every match.
+    """
+    query = (query or '').strip()
+    tokens = _TOKEN_RE.findall(query)
+    if not query or backend() is None:
+        return []
+
+    hits = []
+    if len(query) >= MIN_FRAGMENT:
+        hits += _sku_fragment_hits(query, within, limit)
+    if tokens:
+        seen = {hit.product_id for hit in hits}
+        hits += [
+            hit for hit in _word_hits(tokens, within, limit)
+            if hit.product_id not in seen
+        ]
+    return hits if limit is None else hits[:limit]
+
+
+def _word_hits(tokens, within, limit):
+    with connection.cursor() as cursor:
+        if backend() == 'sqlite':
+            match = ' AND '.join(f'"{token}"*' for token in tokens)
+            extra, params = _within('rowid', within)
+            limit_sql, limit_params = _limit(limit)
+            # bm25() is lower for better matches; name > sku > description
+            cursor.execute(
+                f'SELECT rowid, bm25({FTS_TABLE}, 10.0, 5.0, 1.0) AS score, '
+                f'snippet({FTS_TABLE}, -1, %s, %s, %s, 12) '
+                f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s{extra} '
+                f'ORDER BY score{limit_sql}',
+                [_START, _END, '…', match, *params, *limit_params],
+            )
+        else:
+            tsquery = ' & '.join(f'{token}:*' for token in tokens)
+            extra, params = _within('s.product_id', within)
+            limit_sql, limit_params = _limit(limit)
+            cursor.execute(
+                f"SELECT s.product_id, -ts_rank_cd(s.document, q), "
+                f"ts_headline('simple', p.name || ' ' || p.description, q, %s) "
+                f"FROM {PG_TABLE} s JOIN products_app_product p ON p.id = s.product_id, "
+                f"to_tsquery('simple', %s) q "
+                f"WHERE s.document @@ q{extra} "
+                f"ORDER BY 2{limit_sql}",
+                [f'StartSel={_START}, StopSel={_END}, MaxWords=12, MinWords=4', tsquery, *params, *limit_params],
+            )
+        return [SearchHit(*row) for row in cursor.fetchall()]
+
+
+def _sku_fragment_hits(fragment, within, limit):
+    with connection.cursor() as cursor:
+        if backend() == 'sqlite':
+            match = '"{}"'.format(fragment.replace('"', '""'))
+            extra, params = _within('rowid', within)
+            limit_sql, limit_params = _limit(limit)
+            cursor.execute(
+                f'SELECT rowid, length(sku), highlight({SKU_TABLE}, 0, %s, %s) '
+                f'FROM {SKU_TABLE} WHERE {SKU_TABLE} MATCH %s{extra} '
+                f'ORDER BY length(sku), sku{limit_sql}',
+                [_START, _END, match, *params, *limit_params],
+            )
+        else:
+            pattern = '%{}%'.format(fragment.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_'))
+            extra, params = _within('id', within)
+            limit_sql, limit_params = _limit(limit)
+            cursor.execute(
+                f'SELECT id, length(sku), sku FROM products_app_product '
+                f'WHERE sku ILIKE %s{extra} ORDER BY length(sku), sku{limit_sql}',
+                [pattern, *params, *limit_params],
+            )
+        return [SearchHit(*row) for row in cursor.fetchall()]
+
+
+def _fallback(queryset, query, product_field):
+    """Objects of queryset whose product name or SKU contains query"""
+    prefix = '' if product_field == 'pk' else product_field.replace('_id', '__')
+    return queryset.filter(
+        Q(**{f'{prefix}name__icontains': query}) | Q(**{f'{prefix}sku__icontains': query})
+    )
+
+
+def _hits(queryset, query, product_field, limit):
+    # Restrict the index query to the queryset when it may exclude products
+    restricted = queryset.query.where or product_field != 'pk'
+    within = queryset.values(product_field) if restricted else None
+    return search(query, within=within, limit=limit)
+
+
+def _product_id(obj, product_field):
+    return getattr(obj, 'pk' if product_field == 'pk' else product_field)
+
+
+def _objects(queryset, hits, product_field):
+    """Objects of queryset for hits, in the same order, with their search_hit"""
+    by_product = {
+        _product_id(obj, product_field): obj
+        for obj in queryset.filter(**{f'{product_field}__in': [hit.product_id for hit in hits]})
+    }
+    results = []
+    for hit in hits:
+        obj = by_product.get(hit.product_id)
+        if obj is not None:
+            obj.search_hit = hit
+            results.append(obj)
+    return results
+
+
+def search_queryset(queryset, query, product_field='pk', limit=DEFAULT_LIMIT):
+    """The limit best objects of queryset matching query, in relevance order.
+
+    Returns a list; each object gets a search_hit attribute. product_field is
+    the lookup holding the product id ('pk' for products, 'product_id' for
+    stock levels). Without full-text support, falls back to icontains.
+    """
+    if backend() is None:
+        return list(_fallback(queryset, query, product_field)[:limit])
+    return _objects(queryset, _hits(queryset, query, product_field, limit), product_field)
+
+
+def paginate(request, queryset, query, product_field='pk', per_page=PER_PAGE):
+    """Page of every object of queryset matching query, for the ?page= parameter of request.
+
+    The ids of all the matches are read, in relevance order, but only the
+    objects of the page are loaded. The page has the same interface as a
+    core_app.pagination cursor page, with the exact match count.
+    """
+    if backend() is None:
+        matches = _fallback(queryset, query, product_field).values_list(product_field, flat=True)
+        paginator = Paginator(matches, per_page)
+        page = paginator.get_page(request.GET.get('page'))
+        order = {product_id: index for index, product_id in enumerate(page.object_list)}
+        objects = sorted(
+            queryset.filter(**{f'{product_field}__in': list(order)}),
+            key=lambda obj: order[_product_id(obj, product_field)],
+        )
+    else:
+        paginator = Paginator(_hits(queryset, query, product_field, None), per_page)
+        page = paginator.get_page(request.GET.get('page'))
+        objects = _objects(queryset, page.object_list, product_field)
+
+    def query_string(number):
+        params = request.GET.copy()
+        params.pop(CURSOR_PARAM, None)
+        params['page'] = number
+        return f'?{params.urlencode()}'
+
+    result = CursorPage(objects, None, page.has_next(), page.has_previous())
+    result.first_query = query_string(1)
+    result.last_query = query_string(paginator.num_pages)
+    result.previous_query = query_string(page.previous_page_number()) if page.has_previous() else None
+    result.next_query = query_string(page.next_page_number()) if page.has_next() else None
+    result.approximate_count = paginator.count
+    return result
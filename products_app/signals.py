@@ -0,0 +1,35 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core_app import fragments
+from . import catalog, search
+from .models import Category, Product
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    search.index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    search.remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_cached_product(sender, instance, **kwargs):
+    catalog.invalidate(Product, [instance.pk])
+    fragments.bump('catalog')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_cached_category(sender, instance, **kwargs):
+    catalog.invalidate(Category, [instance.pk])
+    fragments.bump('catalog')
+
+
+def clear_catalog_cache(sender, **kwargs):
+    """Connected to post_migrate: cached rows may not match the new schema"""
+    catalog.clear()
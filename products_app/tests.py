@@ -1,3 +1,269 @@
-from django.test import TestCase
+import json
+from decimal import Decimal
+from io import BytesIO, StringIO
+from tempfile import TemporaryDirectory
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core_app import fragments
+from jobs_app.models import Job
+from stock_app import counters
+from stock_app.exports import STOCK_EXPORT
+from stock_app.models import Location, LocationStock, StockLevel, StockMovement
+from stock_app.services import apply_movement
+from . import catalog, search
+from .importer import import_products_csv
+from .models import Category, Product
+
+HEADER = 'Name,SKU,Category,Price,Cost_Price,Status,Description,Stock_Actuel,Stock_Minimum\n'
+
+
+def csv_bytes(*lines):
+    return (HEADER + ''.join(line + '\n' for line in lines)).encode('utf-8')
+
+
+class ProductImportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('staff', password='secret')
+
+    def test_creates_updates_and_reports_errors(self):
+        category = Category.objects.create(name='LEDs')
+        Product.objects.create(
+            name='Ancienne LED', sku='LED-1', category=category,
+            price=Decimal('1.00'), cost_price=Decimal('0.50'),
+        )
+        data = csv_bytes(
+            'LED Rouge,LED-1,LEDs,0.30,0.15,Active,,100,20',
+            'Arduino Uno,ARD-UNO,Microcontrôleurs,25.00,15.00,Active,Carte,5,10',
+            'Sans catégorie,NOPE,,1,1,Active,,,',
+            'Prix faux,BAD-1,LEDs,abc,1,Active,,,',
+            'Résistance,RES-1,Résistances,0.50,0.25,Inactive,,,',
+        )
+
+        result = import_products_csv(BytesIO(data), self.user, chunk_size=2)
+
+        self.assertEqual((result.created, result.updated, result.rows), (2, 1, 5))
+        self.assertEqual(len(result.errors), 2)
+        self.assertTrue(result.errors[0].startswith('Ligne 4:'))
+
+        led = Product.objects.get(sku='LED-1')
+        self.assertEqual((led.name, led.price), ('LED Rouge', Decimal('0.30')))
+        self.assertEqual(led.stock_level.current_stock, 100)
+        self.assertEqual(led.stock_level.minimum_stock, 20)
+        self.assertEqual(StockLevel.objects.get(product__sku='ARD-UNO').current_stock, 5)
+        self.assertFalse(Product.objects.get(sku='RES-1').is_active)
+        self.assertEqual(StockMovement.objects.filter(reference='Import CSV').count(), 2)
+        self.assertEqual(counters.verify(), {})
+
+    def test_empty_price_and_failing_rows_are_reported_per_row(self):
+        data = csv_bytes(
+            'Sans prix,NOPRICE,LEDs,,1,Active,,,',
+            'LED,LED-1,LEDs,1,1,Active,,,',
+            'Trop cher,HUGE-1,LEDs,123456789012,1,Active,,,',
+            'Borne,BOR-1,Bornes,2,1,Active,,,',
+        )
+
+        result = import_products_csv(BytesIO(data), self.user, chunk_size=10)
+
+        # The chunk failed on line 4 and was applied again row by row
+        self.assertEqual(result.errors[0], 'Ligne 2: Prix manquant')
+        self.assertEqual(len(result.errors), 2)
+        self.assertTrue(result.errors[1].startswith('Ligne 4:'))
+        self.assertEqual(result.created, 2)
+        self.assertEqual(set(Product.objects.values_list('sku', flat=True)), {'LED-1', 'BOR-1'})
+        self.assertEqual(counters.verify(), {})
+
+    def test_reimport_only_posts_changed_stock(self):
+        import_products_csv(BytesIO(csv_bytes('LED,LED-1,LEDs,1,1,Active,,10,2')), self.user)
+        import_products_csv(BytesIO(csv_bytes('LED,LED-1,LEDs,2,1,Active,,10,2')), self.user)
+
+        self.assertEqual(StockMovement.objects.count(), 1)
+        self.assertEqual(counters.current().total_stock_value, Decimal('20.00'))
+        self.assertEqual(counters.verify(), {})
+
+    def test_stock_is_the_total_across_locations(self):
+        import_products_csv(BytesIO(csv_bytes('LED,LED-1,LEDs,1,1,Active,,10,2')), self.user)
+        product = Product.objects.get(sku='LED-1')
+        depot = Location.objects.create(code='NORD', name='Dépôt Nord')
+        apply_movement(product, 'TRANSFER', 4, self.user, to_location=depot)
+
+        def placed():
+            return dict(LocationStock.objects.filter(product=product).values_list('location__code', 'quantity'))
+
+        # The total did not change: nothing is posted
+        import_products_csv(BytesIO(csv_bytes('LED,LED-1,LEDs,1,1,Active,,10,2')), self.user)
+        self.assertEqual(placed(), {'PRINCIPAL': 6, 'NORD': 4})
+        import_products_csv(BytesIO(csv_bytes('LED,LED-1,LEDs,1,1,Active,,13,2')), self.user)
+        self.assertEqual(placed(), {'PRINCIPAL': 9, 'NORD': 4})
+        import_products_csv(BytesIO(csv_bytes('LED,LED-1,LEDs,1,1,Active,,5,2')), self.user)
+        self.assertEqual(placed(), {'PRINCIPAL': 1, 'NORD': 4})
+        self.assertEqual(StockLevel.objects.get(product=product).current_stock, 5)
+
+        # More than the default location holds cannot be taken from it
+        result = import_products_csv(BytesIO(csv_bytes('LED,LED-1,LEDs,1,1,Active,,2,2')), self.user)
+        self.assertIn('Stock insuffisant', result.errors[0])
+        self.assertEqual(placed(), {'PRINCIPAL': 1, 'NORD': 4})
+        self.assertEqual(counters.verify(), {})
+
+    def test_minimum_stock_changes_are_pushed_live(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            import_products_csv(BytesIO(csv_bytes('LED,LED-1,LEDs,1,1,Active,,10,2')), self.user)
+        before = fragments.versions(['stock'])
+        with mock.patch('core_app.live._deliver') as deliver, self.captureOnCommitCallbacks(execute=True):
+            import_products_csv(BytesIO(csv_bytes('LED,LED-1,LEDs,1,1,Active,,10,12')), self.user)
+        self.assertNotEqual(fragments.versions(['stock']), before)
+        levels = [json.loads(data)['levels'] for channel, data in (call.args for call in deliver.call_args_list)
+                  if channel == 'stock']
+        self.assertIn(
+            [{'product_id': Product.objects.get().pk, 'current_stock': 10, 'minimum_stock': 12, 'status': 'LOW'}],
+            levels,
+        )
+
+    def test_import_view_queues_a_job(self):
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile('produits.csv', csv_bytes('LED,LED-1,LEDs,1,1,Active,,10,2'))
+
+        with TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            response = self.client.post(reverse('products_app:import_products'), {'csv_file': upload})
+            job = Job.objects.get()
+            self.assertRedirects(response, reverse('jobs_app:job_detail', args=[job.pk]))
+            self.assertFalse(Product.objects.filter(sku='LED-1').exists())
+
+            call_command('run_jobs', '--once', stdout=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'COMPLETED')
+        self.assertEqual((job.total_rows, job.processed_rows, job.created_count), (1, 1, 1))
+        self.assertTrue(Product.objects.filter(sku='LED-1').exists())
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Câbles')
+        self.cable = self.product('Câble rigide 2.5mm', 'CB-250012', 'Cuivre, gaine <PVC>')
+        self.sheath = self.product('Gaine ICTA', 'GA-16', 'Pour câble rigide')
+        self.breaker = self.product('Disjoncteur 16A', 'DJ-16A', '')
+
+    def product(self, name, sku, description):
+        return Product.objects.create(
+            name=name, sku=sku, description=description, category=self.category,
+            price=Decimal('10.00'), cost_price=Decimal('5.00'),
+        )
+
+    def ids(self, query, **kwargs):
+        return [hit.product_id for hit in search.search(query, **kwargs)]
+
+    def test_prefix_words_ignore_accents_and_rank_name_first(self):
+        self.assertEqual(self.ids('cab rig'), [self.cable.pk, self.sheath.pk])
+        self.assertEqual(self.ids('disj'), [self.breaker.pk])
+
+    def test_sku_fragment(self):
+        self.assertEqual(self.ids('500'), [self.cable.pk])
+        self.assertCountEqual(self.ids('16'), [self.sheath.pk, self.breaker.pk])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.breaker.name = 'Interrupteur différentiel'
+        self.breaker.save()
+        self.assertEqual(self.ids('disj'), [])
+        self.assertEqual(self.ids('differentiel'), [self.breaker.pk])
+        self.cable.delete()
+        self.assertEqual(self.ids('rigide'), [self.sheath.pk])
+
+    def test_within_restricts_results(self):
+        within = Product.objects.filter(pk=self.sheath.pk).values('pk')
+        self.assertEqual(self.ids('rigide', within=within), [self.sheath.pk])
+
+    def test_snippet_is_escaped(self):
+        hit = search.search('pvc')[0]
+        self.assertIn('&lt;<mark>PVC</mark>&gt;', hit.snippet_html)
+
+    def test_imported_products_are_indexed(self):
+        user = User.objects.create_user('staff')
+        import_products_csv(BytesIO(csv_bytes('Borne WAGO,WG-221,Câbles,1.00,0.50,Active,,,')), user)
+        self.assertEqual(len(search.search('wago')), 1)
+
+    def test_list_views_use_the_index(self):
+        User.objects.create_user('staff', password='secret')
+        self.client.login(username='staff', password='secret')
+        response = self.client.get(reverse('products_app:product_list'), {'search': 'rigide'})
+        self.assertEqual(list(response.context['products']), [self.cable, self.sheath])
+        StockLevel.objects.create(product=self.sheath, current_stock=3, minimum_stock=1)
+        response = self.client.get(reverse('stock_app:stock_list'), {'search': 'rigide'})
+        self.assertEqual([level.product for level in response.context['stock_levels']], [self.sheath])
+
+    def test_stock_export_uses_the_index(self):
+        StockLevel.objects.create(product=self.cable, current_stock=3, minimum_stock=1)
+        StockLevel.objects.create(product=self.breaker, current_stock=0, minimum_stock=1)
+        rows = list(STOCK_EXPORT.iter_rows({'search': 'cab rig'}))
+        self.assertEqual([row[1] for row in rows], ['CB-250012'])
+        self.assertEqual(list(STOCK_EXPORT.iter_rows({'search': 'rigide', 'status': 'out'})), [])
+
+    def test_list_views_page_through_every_match(self):
+        for number in range(search.DEFAULT_LIMIT + 5):
+            self.product(f'Borne rigide {number}', f'BR-{number}', '')
+        User.objects.create_user('staff', password='secret')
+        self.client.login(username='staff', password='secret')
+        seen = []
+        params = {'search': 'rigide'}
+        while True:
+            page = self.client.get(reverse('products_app:product_list'), params).context['products']
+            seen += [product.pk for product in page]
+            if not page.has_next():
+                break
+            params = QueryDict(page.next_query[1:])
+        self.assertEqual(page.approximate_count, search.DEFAULT_LIMIT + 7)
+        self.assertEqual(len(set(seen)), search.DEFAULT_LIMIT + 7)
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        catalog.clear()
+        self.user = User.objects.create_user('staff')
+        self.category = Category.objects.create(name='Appareillage')
+        self.product = Product.objects.create(
+            name='Prise 16A', sku='PR-16', category=self.category,
+            price=Decimal('4.00'), cost_price=Decimal('2.00'),
+        )
+
+    def test_saves_and_deletes_invalidate_objects(self):
+        self.assertEqual(catalog.get_product(self.product.pk).name, 'Prise 16A')
+        with self.assertNumQueries(0):
+            catalog.get_product(self.product.pk)
+
+        self.product.name = 'Prise 20A'
+        self.product.save()
+        self.assertEqual(catalog.get_product(self.product.pk).name, 'Prise 20A')
+
+        self.assertEqual(catalog.categories(), [self.category])
+        Category.objects.create(name='Câbles')
+        self.assertEqual([c.name for c in catalog.categories()], ['Appareillage', 'Câbles'])
+
+        self.product.delete()
+        self.assertIsNone(catalog.get_product(self.product.pk))
+
+    def test_stock_movements_invalidate_stock_levels(self):
+        apply_movement(self.product, 'IN', 5, self.user)
+        self.assertEqual(catalog.get_stock_level(self.product.pk).current_stock, 5)
+        apply_movement(self.product, 'OUT', 2, self.user)
+        self.assertEqual(catalog.get_stock_level(self.product.pk).current_stock, 3)
+
+    def test_import_invalidates_products(self):
+        catalog.get_product(self.product.pk)
+        import_products_csv(BytesIO(csv_bytes('Prise 32A,PR-16,Appareillage,6.00,3.00,Active,,,')), self.user)
+        self.assertEqual(catalog.get_product(self.product.pk).name, 'Prise 32A')
+
+    def test_views_read_through_the_cache(self):
+        User.objects.create_user('viewer', password='secret')
+        self.client.login(username='viewer', password='secret')
+        apply_movement(self.product, 'IN', 5, self.user)
+        response = self.client.get(reverse('products_app:product_detail', args=[self.product.pk]))
+        self.assertEqual(response.context['stock_level'].current_stock, 5)
+        self.assertContains(response, 'Appareillage')
+        response = self.client.get(reverse('stock_app:movements'), {'product': self.product.pk})
+        self.assertContains(response, 'value="Prise 16A (PR-16)"')
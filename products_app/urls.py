@@ -13,4 +13,5 @@ urlpatterns = [
     path('categories/create/', views.category_create, name='category_create'),
     path('export/', views.export_products, name='export_products'),
     path('import/', views.import_products, name='import_products'),
+    path('lookup/', views.product_lookup, name='product_lookup'),
 ]
@@ -1,41 +1,50 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.paginator import Paginator
-from django.db.models import Q
-from django.http import HttpResponse
-import csv
-import io
-from decimal import Decimal
+from django.http import Http404, JsonResponse
+from django.db import transaction
+from . import catalog, search
 from .models import Product, Category
 from .forms import ProductForm, CategoryForm
-from stock_app.models import StockLevel
+from .exports import PRODUCTS_EXPORT
+from core_app.exporters import export_response
+from core_app.pagination import paginate
+from jobs_app.runner import enqueue
+
+LOOKUP_LIMIT = 10
+LOOKUP_MAX_LIMIT = 50
+
+
+def _product_summary(product):
+    """JSON-ready id, name, SKU, price and current stock of a product"""
+    level = getattr(product, 'stock_level', None)
+    return {
+        'id': product.pk,
+        'name': product.name,
+        'sku': product.sku,
+        'price': str(product.price),
+        'current_stock': level.current_stock if level else 0,
+    }
 
 
 @login_required
 def product_list(request):
     products = Product.objects.select_related('category').all()
     
-    # Search functionality
-    search_query = request.GET.get('search')
-    if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) |
-            Q(sku__icontains=search_query) |
-            Q(description__icontains=search_query)
-        )
-    
     # Category filter
     category_filter = request.GET.get('category')
     if category_filter:
         products = products.filter(category_id=category_filter)
     
-    # Pagination
-    paginator = Paginator(products, 20)
-    page_number = request.GET.get('page')
-    products = paginator.get_page(page_number)
+    search_query = request.GET.get('search')
+    if search_query:
+        # Full-text search: every match, by relevance, one page at a time
+        products = search.paginate(request, products, search_query)
+    else:
+        # Keyset pagination: the cost of a page does not depend on its depth
+        products = paginate(request, products, ordering=('name', 'id'))
     
-    categories = Category.objects.all()
+    categories = catalog.categories()
     
     context = {
         'products': products,
@@ -48,8 +57,16 @@ def product_list(request):
 
 @login_required
 def product_detail(request, pk):
-    product = get_object_or_404(Product, pk=pk)
-    return render(request, 'products_app/product_detail.html', {'product': product})
+    product = catalog.get_product(pk)
+    if product is None:
+        raise Http404('Produit introuvable')
+    product.category = catalog.get_category(product.category_id)
+    context = {
+        'product': product,
+        'stock_level': catalog.get_stock_level(product.pk),
+        'metrics': catalog.get_metrics(product.pk),
+    }
+    return render(request, 'products_app/product_detail.html', context)
 
 
 @login_required
@@ -57,7 +74,8 @@ def product_create(request):
     if request.method == 'POST':
         form = ProductForm(request.POST, request.FILES)
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                form.save()
             messages.success(request, 'Product created successfully!')
             return redirect('products_app:product_list')
     else:
@@ -72,7 +90,8 @@ def product_update(request, pk):
     if request.method == 'POST':
         form = ProductForm(request.POST, request.FILES, instance=product)
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                form.save()
             messages.success(request, 'Product updated successfully!')
             return redirect('products_app:product_detail', pk=product.pk)
     else:
@@ -85,7 +104,8 @@ def product_update(request, pk):
 def product_delete(request, pk):
     product = get_object_or_404(Product, pk=pk)
     if request.method == 'POST':
-        product.delete()
+        with transaction.atomic():
+            product.delete()
         messages.success(request, 'Product deleted successfully!')
         return redirect('products_app:product_list')
     
@@ -94,7 +114,7 @@ def product_delete(request, pk):
 
 @login_required
 def category_list(request):
-    categories = Category.objects.all()
+    categories = catalog.categories()
     return render(request, 'products_app/category_list.html', {'categories': categories})
 
 
@@ -115,25 +135,13 @@ def category_create(request):
 @login_required
 def export_products(request):
     """Export products to CSV"""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="products.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Name', 'SKU', 'Category', 'Price', 'Cost Price', 'Status', 'Description'])
-    
-    products = Product.objects.select_related('category').all()
-    for product in products:
-        writer.writerow([
-            product.name,
-            product.sku,
-            product.category.name,
-            product.price,
-            product.cost_price,
-            'Active' if product.is_active else 'Inactive',
-            product.description
-        ])
+    params = PRODUCTS_EXPORT.params(request.GET)
+    if request.GET.get('background'):
+        job = enqueue('EXPORT_PRODUCTS', request.user, params=params)
+        messages.info(request, 'Export lancé en arrière-plan')
+        return redirect('jobs_app:job_detail', pk=job.pk)
     
-    return response
+    return export_response(PRODUCTS_EXPORT, params)
 
 
 @login_required
@@ -150,97 +158,30 @@ def import_products(request):
             messages.error(request, 'Le fichier doit être au format CSV')
             return redirect('products_app:import_products')
         
-        try:
-            # Read the CSV file
-            decoded_file = csv_file.read().decode('utf-8')
-            io_string = io.StringIO(decoded_file)
-            reader = csv.DictReader(io_string)
-            
-            created_count = 0
-            updated_count = 0
-            error_count = 0
-            errors = []
-            
-            for row_num, row in enumerate(reader, start=2):
-                try:
-                    # Get or create category
-                    category_name = row.get('Category', '').strip()
-                    if not category_name:
-                        errors.append(f"Ligne {row_num}: Catégorie manquante")
-                        error_count += 1
-                        continue
-                    
-                    category, _ = Category.objects.get_or_create(
-                        name=category_name,
-                        defaults={'description': ''}
-                    )
-                    
-                    # Check if product exists
-                    sku = row.get('SKU', '').strip()
-                    if not sku:
-                        errors.append(f"Ligne {row_num}: SKU manquante")
-                        error_count += 1
-                        continue
-                    
-                    # Prepare product data
-                    product_data = {
-                        'name': row.get('Name', '').strip(),
-                        'description': row.get('Description', '').strip(),
-                        'category': category,
-                        'price': Decimal(row.get('Price', 0)),
-                        'cost_price': Decimal(row.get('Cost_Price', 0)),
-                        'is_active': row.get('Status', 'Active').strip().lower() == 'active'
-                    }
-                    
-                    # Get stock data if present
-                    stock_actuel = row.get('Stock_Actuel', '').strip()
-                    stock_minimum = row.get('Stock_Minimum', '').strip()
-                    
-                    # Create or update product
-                    product, created = Product.objects.update_or_create(
-                        sku=sku,
-                        defaults=product_data
-                    )
-                    
-                    # Create or update stock level if stock data is provided
-                    if stock_actuel or stock_minimum:
-                        stock_level, _ = StockLevel.objects.get_or_create(
-                            product=product,
-                            defaults={
-                                'current_stock': int(stock_actuel) if stock_actuel else 0,
-                                'minimum_stock': int(stock_minimum) if stock_minimum else 0,
-                            }
-                        )
-                        if not created:
-                            if stock_actuel:
-                                stock_level.current_stock = int(stock_actuel)
-                            if stock_minimum:
-                                stock_level.minimum_stock = int(stock_minimum)
-                            stock_level.save()
-                    
-                    if created:
-                        created_count += 1
-                    else:
-                        updated_count += 1
-                        
-                except Exception as e:
-                    errors.append(f"Ligne {row_num}: {str(e)}")
-                    error_count += 1
-            
-            # Show results
-            if created_count > 0:
-                messages.success(request, f'{created_count} produit(s) créé(s)')
-            if updated_count > 0:
-                messages.success(request, f'{updated_count} produit(s) mis à jour')
-            if error_count > 0:
-                messages.warning(request, f'{error_count} erreur(s) rencontrée(s)')
-                for error in errors[:5]:  # Show first 5 errors
-                    messages.error(request, error)
-            
-            return redirect('products_app:product_list')
-            
-        except Exception as e:
-            messages.error(request, f'Erreur lors de l\'importation: {str(e)}')
-            return redirect('products_app:import_products')
+        # The file is processed by the run_jobs worker; the job page polls its progress
+        job = enqueue('IMPORT_PRODUCTS', request.user, input_file=csv_file)
+        messages.info(request, 'Importation en cours de traitement')
+        return redirect('jobs_app:job_detail', pk=job.pk)
+    
+    return render(request, 'products_app/import_products.html')
+
+
+@login_required
+def product_lookup(request):
+    """Typeahead API: best active products matching ?q=, with price and stock"""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', LOOKUP_LIMIT)), 1), LOOKUP_MAX_LIMIT)
+    except ValueError:
+        limit = LOOKUP_LIMIT
+    
+    products = []
+    if query:
+        products = search.search_queryset(
+            Product.objects.filter(is_active=True).select_related('stock_level'),
+            query,
+            limit=limit,
+        )
     
-    return render(request, 'products_app/import_products.html')
\ No newline at end of file
+    results = [_product_summary(product) for product in products]
+    return JsonResponse({'results': results})
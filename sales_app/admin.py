@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Customer, Sale, SaleItem
+from .models import Customer, DailySalesRollup, Sale, SaleItem
 
 
 class SaleItemInline(admin.TabularInline):
@@ -31,4 +31,11 @@ class SaleItemAdmin(admin.ModelAdmin):
     list_display = ['sale', 'product', 'quantity', 'unit_price', 'line_total']
     list_filter = ['sale__sale_date']
     search_fields = ['sale__customer__name', 'product__name']
-    raw_id_fields = ['sale', 'product']
\ No newline at end of file
+    raw_id_fields = ['sale', 'product']
+
+
+@admin.register(DailySalesRollup)
+class DailySalesRollupAdmin(admin.ModelAdmin):
+    list_display = ['date', 'sale_count', 'units', 'revenue', 'cost', 'margin']
+    date_hierarchy = 'date'
+    readonly_fields = ['date', 'sale_count', 'units', 'revenue', 'cost', 'margin']
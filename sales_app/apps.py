@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class SalesAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'sales_app'
\ No newline at end of file
+    name = 'sales_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
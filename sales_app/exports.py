@@ -0,0 +1,101 @@
+"""CSV exports, shared by the download views and the background job runner"""
+
+from django.db.models import DecimalField, ExpressionWrapper, F, Q
+
+from core_app.columnar import ColumnarExport
+from core_app.exporters import CsvExport, user_display, user_fields
+from .models import Customer, Sale, SaleItem
+
+
+def _search_sales(sales, query):
+    return sales.filter(
+        Q(customer__name__icontains=query) |
+        Q(notes__icontains=query)
+    )
+
+
+def _search_customers(customers, query):
+    return customers.filter(
+        Q(name__icontains=query) |
+        Q(email__icontains=query) |
+        Q(phone__icontains=query)
+    )
+
+
+SALE_STATUSES = dict(Sale.STATUS_CHOICES)
+
+
+def _sale_row(sale_id, customer, sale_date, status, total_amount, first_name, last_name, username):
+    return [
+        sale_id,
+        customer,
+        sale_date.strftime('%Y-%m-%d %H:%M'),
+        SALE_STATUSES.get(status, status),
+        total_amount,
+        user_display(first_name, last_name, username),
+    ]
+
+
+SALES_EXPORT = CsvExport(
+    filename='sales',
+    header=['Sale ID', 'Customer', 'Date', 'Status', 'Total Amount', 'Created By'],
+    get_queryset=Sale.objects.all,
+    fields=('id', 'customer__name', 'sale_date', 'status', 'total_amount', *user_fields('created_by')),
+    format_row=_sale_row,
+    date_field='sale_date',
+    filters={'search': _search_sales, 'status': 'status'},
+)
+
+CUSTOMERS_EXPORT = CsvExport(
+    filename='customers',
+    header=['Name', 'Email', 'Phone', 'Address', 'Created Date'],
+    get_queryset=Customer.objects.all,
+    fields=('name', 'email', 'phone', 'address', 'created_at'),
+    format_row=lambda name, email, phone, address, created_at: [
+        name, email or '', phone or '', address or '', created_at.strftime('%Y-%m-%d'),
+    ],
+    date_field='created_at',
+    filters={'search': _search_customers},
+)
+
+
+def _search_sale_lines(lines, query):
+    return lines.filter(
+        Q(sale__customer__name__icontains=query) |
+        Q(sale__notes__icontains=query)
+    )
+
+
+def _sale_lines():
+    return SaleItem.objects.annotate(
+        line_total=ExpressionWrapper(
+            F('quantity') * F('unit_price'),
+            output_field=DecimalField(max_digits=14, decimal_places=2),
+        )
+    ).order_by('sale_id', 'id')
+
+
+# One row per sale line, joined with its sale, product and category
+SALE_LINES_EXPORT = ColumnarExport(
+    filename='sale_lines',
+    get_queryset=_sale_lines,
+    columns=(
+        ('sale_id', 'sale_id'),
+        ('sale_date', 'sale__sale_date'),
+        ('status', 'sale__status'),
+        ('customer_id', 'sale__customer_id'),
+        ('customer', 'sale__customer__name'),
+        ('line_id', 'id'),
+        ('product_id', 'product_id'),
+        ('sku', 'product__sku'),
+        ('product', 'product__name'),
+        ('category_id', 'product__category_id'),
+        ('category', 'product__category__name'),
+        ('quantity', 'quantity'),
+        ('unit_price', 'unit_price'),
+        ('cost_price', 'product__cost_price'),
+        ('line_total', 'line_total'),
+    ),
+    date_field='sale__sale_date',
+    filters={'search': _search_sale_lines, 'status': 'sale__status'},
+)
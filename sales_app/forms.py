@@ -1,5 +1,6 @@
 from django import forms
 from .models import Customer, Sale, SaleItem
+from products_app import catalog
 from products_app.models import Product
 
 
@@ -47,11 +48,8 @@ class SaleItemForm(forms.ModelForm):
             'unit_price': 'Prix unitaire',
         }
         widgets = {
-            'product': forms.Select(attrs={
-                'class': 'form-control',
-                'id': 'id_product',
-                'onchange': 'updatePrice()'
-            }),
+            # Filled in by the typeahead (products_app:product_lookup)
+            'product': forms.HiddenInput(attrs={'id': 'id_product'}),
             'quantity': forms.NumberInput(attrs={
                 'class': 'form-control',
                 'min': '1',
@@ -67,18 +65,24 @@ class SaleItemForm(forms.ModelForm):
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Show only active products
+        # Only active products; validation looks up the submitted id alone,
+        # the choices are never rendered
         products = Product.objects.filter(is_active=True).select_related('stock_level')
         self.fields['product'].queryset = products
         
         # Add help text
-        self.fields['product'].help_text = 'Sélectionnez un produit actif'
+        self.fields['product'].help_text = 'Tapez un nom ou une référence de produit actif'
         self.fields['quantity'].help_text = 'Quantité à vendre'
         self.fields['unit_price'].help_text = 'Prix sera rempli automatiquement'
-        
-        # Custom label to show stock
-        self.fields['product'].label_from_instance = lambda obj: (
-            f"{obj.name} ({obj.sku}) - "
-            f"Stock: {obj.stock_level.current_stock if hasattr(obj, 'stock_level') else '0'} - "
-            f"Prix: ${obj.price}"
-        )
+    
+    @property
+    def selected_product(self):
+        """The product currently chosen, to redisplay it when the form is re-rendered"""
+        value = self['product'].value()
+        if not value:
+            return None
+        try:
+            product = catalog.get_product(value)
+        except (TypeError, ValueError):
+            return None
+        return product if product and product.is_active else None
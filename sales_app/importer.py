@@ -0,0 +1,61 @@
+"""
+Streaming CSV customer import, shared by the import view and the background
+job runner. Customers are matched on name or email.
+"""
+
+from django.db import transaction
+from django.db.models import Q
+
+from products_app.importer import ImportResult, iter_csv_rows
+from .models import Customer
+
+PROGRESS_EVERY = 500
+
+
+def import_customers_csv(fileobj, progress=None):
+    """Import customers from a CSV file object and return an ImportResult"""
+    result = ImportResult()
+    for row_num, row in iter_csv_rows(fileobj):
+        result.rows += 1
+        try:
+            name = (row.get('Name') or '').strip()
+            if not name:
+                result.errors.append(f"Ligne {row_num}: Nom manquant")
+                continue
+            
+            email = (row.get('Email') or '').strip()
+            
+            # Check if customer exists by name or email
+            customer_filter = Q(name=name)
+            if email:
+                customer_filter |= Q(email=email)
+            
+            customer_data = {
+                'name': name,
+                'email': email,
+                'phone': (row.get('Phone') or '').strip(),
+                'address': (row.get('Address') or '').strip(),
+            }
+            
+            with transaction.atomic():
+                existing_customer = Customer.objects.filter(customer_filter).first()
+                if existing_customer:
+                    # Update existing customer
+                    for key, value in customer_data.items():
+                        setattr(existing_customer, key, value)
+                    existing_customer.save()
+                    result.updated += 1
+                else:
+                    # Create new customer
+                    Customer.objects.create(**customer_data)
+                    result.created += 1
+        
+        except Exception as e:
+            result.errors.append(f"Ligne {row_num}: {str(e)}")
+        
+        if progress and result.rows % PROGRESS_EVERY == 0:
+            progress(result)
+    
+    if progress:
+        progress(result)
+    return result
@@ -0,0 +1,24 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from sales_app import rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily sales rollups from the completed sales (backfill or repair)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date-from',
+            type=date.fromisoformat,
+            help='First day to recompute (YYYY-MM-DD, default: the first sale)',
+        )
+        parser.add_argument(
+            '--date-to',
+            type=date.fromisoformat,
+            help='Last day to recompute (YYYY-MM-DD, default: the last sale)',
+        )
+
+    def handle(self, *args, **options):
+        days = rollups.rebuild(options['date_from'], options['date_to'])
+        self.stdout.write(self.style.SUCCESS(f'✓ Sales rollups rebuilt ({days} day(s) with sales)'))
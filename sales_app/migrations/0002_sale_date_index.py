@@ -0,0 +1,115 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:43
+
+from decimal import Decimal
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('products_app', '0003_product_name_idx'),
+        ('sales_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='customer',
+            options={'ordering': ['name'], 'verbose_name': 'Client', 'verbose_name_plural': 'Clients'},
+        ),
+        migrations.AlterModelOptions(
+            name='sale',
+            options={'ordering': ['-sale_date'], 'verbose_name': 'Vente', 'verbose_name_plural': 'Ventes'},
+        ),
+        migrations.AlterModelOptions(
+            name='saleitem',
+            options={'ordering': ['id'], 'verbose_name': 'Article de vente', 'verbose_name_plural': 'Articles de vente'},
+        ),
+        migrations.AlterField(
+            model_name='customer',
+            name='address',
+            field=models.TextField(blank=True, verbose_name='Adresse'),
+        ),
+        migrations.AlterField(
+            model_name='customer',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Date de création'),
+        ),
+        migrations.AlterField(
+            model_name='customer',
+            name='email',
+            field=models.EmailField(blank=True, max_length=254, verbose_name='Email'),
+        ),
+        migrations.AlterField(
+            model_name='customer',
+            name='name',
+            field=models.CharField(max_length=200, verbose_name='Nom'),
+        ),
+        migrations.AlterField(
+            model_name='customer',
+            name='phone',
+            field=models.CharField(blank=True, max_length=20, verbose_name='Téléphone'),
+        ),
+        migrations.AlterField(
+            model_name='customer',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Date de modification'),
+        ),
+        migrations.AlterField(
+            model_name='sale',
+            name='created_by',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Créé par'),
+        ),
+        migrations.AlterField(
+            model_name='sale',
+            name='customer',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales', to='sales_app.customer', verbose_name='Client'),
+        ),
+        migrations.AlterField(
+            model_name='sale',
+            name='notes',
+            field=models.TextField(blank=True, verbose_name='Notes'),
+        ),
+        migrations.AlterField(
+            model_name='sale',
+            name='sale_date',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Date de vente'),
+        ),
+        migrations.AlterField(
+            model_name='sale',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'En attente'), ('COMPLETED', 'Terminée'), ('CANCELLED', 'Annulée')], default='PENDING', max_length=20, verbose_name='Statut'),
+        ),
+        migrations.AlterField(
+            model_name='sale',
+            name='total_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Montant total'),
+        ),
+        migrations.AlterField(
+            model_name='saleitem',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='products_app.product', verbose_name='Produit'),
+        ),
+        migrations.AlterField(
+            model_name='saleitem',
+            name='quantity',
+            field=models.IntegerField(validators=[django.core.validators.MinValueValidator(1)], verbose_name='Quantité'),
+        ),
+        migrations.AlterField(
+            model_name='saleitem',
+            name='sale',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sale_items', to='sales_app.sale', verbose_name='Vente'),
+        ),
+        migrations.AlterField(
+            model_name='saleitem',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))], verbose_name='Prix unitaire'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['sale_date', 'id'], name='sale_date_id_idx'),
+        ),
+    ]
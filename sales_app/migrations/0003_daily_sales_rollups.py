@@ -0,0 +1,80 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill(apps, schema_editor):
+    from sales_app import rollups
+    rollups.rebuild(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products_app', '0004_product_search_index'),
+        ('sales_app', '0002_sale_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='Date')),
+                ('sale_count', models.IntegerField(default=0, verbose_name='Nombre de ventes')),
+                ('units', models.IntegerField(default=0, verbose_name='Unités vendues')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name="Chiffre d'affaires")),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Coût')),
+                ('margin', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Marge')),
+            ],
+            options={
+                'verbose_name': 'Ventes du jour',
+                'verbose_name_plural': 'Ventes par jour',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductDailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('units', models.IntegerField(default=0, verbose_name='Unités vendues')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name="Chiffre d'affaires")),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Coût')),
+                ('margin', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Marge')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='products_app.product', verbose_name='Produit')),
+            ],
+            options={
+                'verbose_name': 'Ventes du jour par produit',
+                'verbose_name_plural': 'Ventes par jour et par produit',
+                'ordering': ['date', 'product'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CategoryDailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('units', models.IntegerField(default=0, verbose_name='Unités vendues')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name="Chiffre d'affaires")),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Coût')),
+                ('margin', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Marge')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='products_app.category', verbose_name='Catégorie')),
+            ],
+            options={
+                'verbose_name': 'Ventes du jour par catégorie',
+                'verbose_name_plural': 'Ventes par jour et par catégorie',
+                'ordering': ['date', 'category'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='productdailysalesrollup',
+            constraint=models.UniqueConstraint(fields=('date', 'product'), name='product_daily_sales_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='categorydailysalesrollup',
+            constraint=models.UniqueConstraint(fields=('date', 'category'), name='category_daily_sales_unique'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -40,6 +40,12 @@ class Sale(models.Model):
         verbose_name = "Vente"
         verbose_name_plural = "Ventes"
         ordering = ['-sale_date']
+        indexes = [
+            # Sales list (keyset-paginated on -sale_date, -id) and the revenue
+            # aggregates, which filter on a sale_date range. A (status,
+            # sale_date) index did not beat it: most sales are COMPLETED.
+            models.Index(fields=['sale_date', 'id'], name='sale_date_id_idx'),
+        ]
     
     def __str__(self):
         return f"Vente #{self.id} - {self.customer.name} ({self.sale_date.strftime('%Y-%m-%d')})"
@@ -51,66 +57,53 @@ class Sale(models.Model):
         return total
     
     def complete_sale(self, user):
-        """Complete the sale and reduce stock"""
-        from stock_app.models import StockLevel, StockMovement
+        """Complete the sale and reduce stock.
+
+        All lines are validated and applied in one batch, so the number of
+        queries does not grow with the number of lines.
+        """
+        from stock_app.services import MovementLine, apply_movements
+        from . import rollups
         
         if self.status == 'COMPLETED':
             return  # Already completed
         
+        items = list(self.sale_items.select_related('product'))
         with transaction.atomic():
-            for item in self.sale_items.all():
-                stock_level = StockLevel.objects.filter(product=item.product).first()
-                if not stock_level or stock_level.current_stock < item.quantity:
-                    raise ValueError(
-                        f'Stock insuffisant pour {item.product.name}'
-                    )
-                
-                # Reduce stock
-                stock_level.current_stock -= item.quantity
-                stock_level.save()
-                
-                # Create stock movement
-                StockMovement.objects.create(
-                    product=item.product,
-                    movement_type='OUT',
-                    quantity=item.quantity,
-                    reference=f'Vente #{self.id}',
-                    notes=f'Vente à {self.customer.name}',
-                    created_by=user
-                )
+            # Raises InsufficientStock (a ValueError) and rolls back every line
+            apply_movements(
+                [MovementLine(item.product, 'OUT', item.quantity) for item in items],
+                user,
+                reference=f'Vente #{self.id}',
+                notes=f'Vente à {self.customer.name}',
+            )
             
             self.status = 'COMPLETED'
-            self.save()
+            self.save(update_fields=['status'])
+            rollups.record(self, items)
     
     def cancel_sale(self, user):
         """Cancel the sale and restore stock"""
-        from stock_app.models import StockLevel, StockMovement
+        from stock_app.services import MovementLine, apply_movements
+        from . import rollups
         
         if self.status != 'COMPLETED':
             self.status = 'CANCELLED'
             self.save()
             return
         
+        items = list(self.sale_items.select_related('product'))
         with transaction.atomic():
-            for item in self.sale_items.all():
-                stock_level = StockLevel.objects.filter(product=item.product).first()
-                if stock_level:
-                    # Restore stock
-                    stock_level.current_stock += item.quantity
-                    stock_level.save()
-                    
-                    # Create stock movement
-                    StockMovement.objects.create(
-                        product=item.product,
-                        movement_type='IN',
-                        quantity=item.quantity,
-                        reference=f'Annulation Vente #{self.id}',
-                        notes=f'Annulation vente à {self.customer.name}',
-                        created_by=user
-                    )
+            apply_movements(
+                [MovementLine(item.product, 'IN', item.quantity) for item in items],
+                user,
+                reference=f'Annulation Vente #{self.id}',
+                notes=f'Annulation vente à {self.customer.name}',
+            )
             
             self.status = 'CANCELLED'
-            self.save()
+            self.save(update_fields=['status'])
+            rollups.record(self, items, sign=-1)
 
 
 class SaleItem(models.Model):
@@ -131,4 +124,68 @@ class SaleItem(models.Model):
     def line_total(self):
         if self.quantity is not None and self.unit_price is not None:
             return self.quantity * self.unit_price
-        return Decimal('0.00')
\ No newline at end of file
+        return Decimal('0.00')
+
+
+class DailySalesRollup(models.Model):
+    """Completed sales of one day, kept up to date by sales_app.rollups.
+
+    cost is valued at the products' cost price when the sale was completed;
+    margin is revenue - cost.
+    """
+    date = models.DateField(unique=True, verbose_name="Date")
+    sale_count = models.IntegerField(default=0, verbose_name="Nombre de ventes")
+    units = models.IntegerField(default=0, verbose_name="Unités vendues")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Chiffre d'affaires")
+    cost = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Coût")
+    margin = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Marge")
+
+    class Meta:
+        verbose_name = "Ventes du jour"
+        verbose_name_plural = "Ventes par jour"
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.date} - {self.sale_count} ventes ({self.revenue})"
+
+
+class ProductDailySalesRollup(models.Model):
+    """Completed sale lines of one product on one day"""
+    date = models.DateField(verbose_name="Date")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales', verbose_name="Produit")
+    units = models.IntegerField(default=0, verbose_name="Unités vendues")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Chiffre d'affaires")
+    cost = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Coût")
+    margin = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Marge")
+
+    class Meta:
+        verbose_name = "Ventes du jour par produit"
+        verbose_name_plural = "Ventes par jour et par produit"
+        ordering = ['date', 'product']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='product_daily_sales_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.product_id}: {self.units}"
+
+
+class CategoryDailySalesRollup(models.Model):
+    """Completed sale lines of one category on one day"""
+    date = models.DateField(verbose_name="Date")
+    category = models.ForeignKey('products_app.Category', on_delete=models.CASCADE, related_name='daily_sales', verbose_name="Catégorie")
+    units = models.IntegerField(default=0, verbose_name="Unités vendues")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Chiffre d'affaires")
+    cost = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Coût")
+    margin = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Marge")
+
+    class Meta:
+        verbose_name = "Ventes du jour par catégorie"
+        verbose_name_plural = "Ventes par jour et par catégorie"
+        ordering = ['date', 'category']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'category'], name='category_daily_sales_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.category_id}: {self.units}"
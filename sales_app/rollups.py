@@ -0,0 +1,180 @@
+"""
+Pre-aggregated daily sales.
+
+DailySalesRollup, ProductDailySalesRollup and CategoryDailySalesRollup hold
+the completed sales of each day (by the local date of sale_date). record()
+adds a sale to them when it is completed and subtracts it when a completed
+sale is cancelled, in the same transaction, with a constant number of
+queries. rebuild() recomputes them from the sales, for backfills and to
+repair drift (see the rebuild_sales_rollups command).
+
+Revenue is the sum of the line totals (quantity * unit_price) at every
+level, so the daily rows always add up to the product and category rows.
+Costs use the products' cost price at the time of the update; a later cost
+price change is only reflected by a rebuild.
+"""
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+ROLLUP_FIELDS = ('sale_count', 'units', 'revenue', 'cost')
+ZERO = Decimal('0.00')
+
+
+def _models(apps):
+    return (
+        apps.get_model('sales_app', 'Sale'),
+        apps.get_model('sales_app', 'SaleItem'),
+        apps.get_model('sales_app', 'DailySalesRollup'),
+        apps.get_model('sales_app', 'ProductDailySalesRollup'),
+        apps.get_model('sales_app', 'CategoryDailySalesRollup'),
+    )
+
+
+def _add(model, key_field, deltas):
+    """Add deltas ({(date, key): {field: value}}) to the rollup rows of model.
+
+    key is the value of key_field, or the date again when key_field is None.
+
+    Missing rows are inserted empty first, then every row is locked, updated
+    in Python and written back: three queries whatever the number of rows.
+    """
+    if not deltas:
+        return
+    keys = list(deltas)
+    model.objects.bulk_create(
+        [model(date=date, **({} if key_field is None else {key_field: key})) for date, key in keys],
+        ignore_conflicts=True,
+    )
+    lookup = {'date__in': {date for date, _ in keys}}
+    if key_field is not None:
+        lookup[f'{key_field}__in'] = {key for _, key in keys}
+    rows = []
+    for row in model.objects.select_for_update().filter(**lookup):
+        delta = deltas.get((row.date, row.date if key_field is None else getattr(row, key_field)))
+        if delta is None:
+            continue
+        for name, value in delta.items():
+            setattr(row, name, getattr(row, name) + value)
+        row.margin = row.revenue - row.cost
+        rows.append(row)
+    fields = [name for name in ROLLUP_FIELDS if hasattr(model, name)] + ['margin']
+    model.objects.bulk_update(rows, fields)
+
+
+def record(sale, items, sign=1):
+    """Add a completed sale to the rollups (sign=-1 takes it out again).
+
+    items are the sale's lines with their product loaded.
+    """
+    _, _, DailySalesRollup, ProductDailySalesRollup, CategoryDailySalesRollup = _models(global_apps)
+    day = timezone.localtime(sale.sale_date).date()
+    daily = {'sale_count': sign, 'units': 0, 'revenue': ZERO, 'cost': ZERO}
+    by_product = defaultdict(lambda: {'units': 0, 'revenue': ZERO, 'cost': ZERO})
+    by_category = defaultdict(lambda: {'units': 0, 'revenue': ZERO, 'cost': ZERO})
+    for item in items:
+        units = sign * item.quantity
+        revenue = units * item.unit_price
+        cost = units * item.product.cost_price
+        daily['units'] += units
+        daily['revenue'] += revenue
+        daily['cost'] += cost
+        for totals in (by_product[(day, item.product_id)], by_category[(day, item.product.category_id)]):
+            totals['units'] += units
+            totals['revenue'] += revenue
+            totals['cost'] += cost
+
+    with transaction.atomic():
+        _add(DailySalesRollup, None, {(day, day): daily})
+        _add(ProductDailySalesRollup, 'product_id', dict(by_product))
+        _add(CategoryDailySalesRollup, 'category_id', dict(by_category))
+
+
+def _line_totals(SaleItem, group_by, start, end):
+    cost = ExpressionWrapper(
+        F('quantity') * F('product__cost_price'),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+    revenue = ExpressionWrapper(
+        F('quantity') * F('unit_price'),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+    items = SaleItem.objects.filter(sale__status='COMPLETED')
+    if start:
+        items = items.filter(sale__sale_date__gte=start)
+    if end:
+        items = items.filter(sale__sale_date__lt=end)
+    return items.annotate(day=TruncDate('sale__sale_date')).order_by().values('day', *group_by).annotate(
+        units=Sum('quantity'), revenue=Sum(revenue), cost=Sum(cost),
+    )
+
+
+def _rollup(model, **values):
+    values = {name: value or ZERO if name in ('revenue', 'cost') else value or 0 for name, value in values.items()}
+    return model(margin=values['revenue'] - values['cost'], **values)
+
+
+@transaction.atomic
+def rebuild(date_from=None, date_to=None, apps=global_apps):
+    """Recompute the rollups of the days from date_from to date_to (inclusive, default all).
+
+    apps lets migrations run it with their historical models.
+    """
+    Sale, SaleItem, DailySalesRollup, ProductDailySalesRollup, CategoryDailySalesRollup = _models(apps)
+    start = timezone.make_aware(datetime.combine(date_from, time.min)) if date_from else None
+    end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min)) if date_to else None
+
+    rollups = (DailySalesRollup, ProductDailySalesRollup, CategoryDailySalesRollup)
+    for model in rollups:
+        stale = model.objects.all()
+        if date_from:
+            stale = stale.filter(date__gte=date_from)
+        if date_to:
+            stale = stale.filter(date__lte=date_to)
+        stale.delete()
+
+    sales = Sale.objects.filter(status='COMPLETED')
+    if start:
+        sales = sales.filter(sale_date__gte=start)
+    if end:
+        sales = sales.filter(sale_date__lt=end)
+    daily = {
+        row['day']: row
+        for row in sales.annotate(day=TruncDate('sale_date')).order_by().values('day').annotate(
+            sale_count=Count('id'),
+        )
+    }
+    lines = {row['day']: row for row in _line_totals(SaleItem, (), start, end)}
+    DailySalesRollup.objects.bulk_create([
+        _rollup(
+            DailySalesRollup,
+            date=day,
+            sale_count=row['sale_count'],
+            revenue=lines.get(day, {}).get('revenue'),
+            units=lines.get(day, {}).get('units'),
+            cost=lines.get(day, {}).get('cost'),
+        )
+        for day, row in daily.items()
+    ])
+    ProductDailySalesRollup.objects.bulk_create([
+        _rollup(
+            ProductDailySalesRollup, date=row['day'], product_id=row['product_id'],
+            units=row['units'], revenue=row['revenue'], cost=row['cost'],
+        )
+        for row in _line_totals(SaleItem, ('product_id',), start, end)
+    ], batch_size=1000)
+    CategoryDailySalesRollup.objects.bulk_create([
+        _rollup(
+            CategoryDailySalesRollup, date=row['day'], category_id=row['product__category_id'],
+            units=row['units'], revenue=row['revenue'], cost=row['cost'],
+        )
+        for row in _line_totals(SaleItem, ('product__category_id',), start, end)
+    ], batch_size=1000)
+    return len(daily)
@@ -0,0 +1,27 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core_app import fragments, live
+from .models import Customer, Sale, SaleItem
+
+
+@receiver(post_save, sender=Sale)
+@receiver(post_delete, sender=Sale)
+@receiver(post_save, sender=SaleItem)
+@receiver(post_delete, sender=SaleItem)
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def invalidate_sales_fragments(sender, instance, **kwargs):
+    fragments.bump('sales')
+
+
+@receiver(post_save, sender=Sale)
+def publish_completed_sale(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """Push the sales completed to the live pages (see core_app.live)"""
+    if raw or instance.status != 'COMPLETED' or not (created or 'status' in (update_fields or ())):
+        return
+    live.publish('sales', {
+        'sale_id': instance.pk,
+        'total_amount': instance.total_amount,
+        'sale_date': instance.sale_date,
+    })
@@ -1,3 +1,267 @@
-from django.test import TestCase
+import io
+import os
+from decimal import Decimal
+from tempfile import TemporaryDirectory
+from unittest import skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core_app import columnar
+
+from products_app.models import Category, Product
+from stock_app import counters
+from stock_app.models import StockLevel, StockMovement
+from stock_app.services import apply_movements, MovementLine
+from .exports import SALE_LINES_EXPORT
+from .models import CategoryDailySalesRollup, Customer, DailySalesRollup, ProductDailySalesRollup, Sale, SaleItem
+
+
+class SaleCompletionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('staff')
+        cls.customer = Customer.objects.create(name='Grossiste')
+        category = Category.objects.create(name='Câbles')
+        cls.products = [
+            Product.objects.create(
+                name=f'Produit {i}', sku=f'SALE-{i}', category=category,
+                price=Decimal('2.00'), cost_price=Decimal('1.00'),
+            )
+            for i in range(40)
+        ]
+        apply_movements([MovementLine(p, 'IN', 10) for p in cls.products], cls.user)
+
+    def make_sale(self, line_count, quantity=1):
+        sale = Sale.objects.create(customer=self.customer, created_by=self.user)
+        SaleItem.objects.bulk_create([
+            SaleItem(sale=sale, product=product, quantity=quantity, unit_price=product.price)
+            for product in self.products[:line_count]
+        ])
+        return Sale.objects.get(pk=sale.pk)
+
+    def count_queries(self, func):
+        with CaptureQueriesContext(connection) as context:
+            func()
+        return len(context.captured_queries)
+
+    def test_query_count_does_not_depend_on_line_count(self):
+        small, large = self.make_sale(2), self.make_sale(40)
+
+        small_queries = self.count_queries(lambda: small.complete_sale(self.user))
+        large_queries = self.count_queries(lambda: large.complete_sale(self.user))
+        self.assertEqual(small_queries, large_queries)
+
+        small_queries = self.count_queries(lambda: small.cancel_sale(self.user))
+        large_queries = self.count_queries(lambda: large.cancel_sale(self.user))
+        self.assertEqual(small_queries, large_queries)
+
+    def test_insufficient_line_rolls_back_the_whole_sale(self):
+        sale = self.make_sale(3)
+        SaleItem.objects.create(sale=sale, product=self.products[5], quantity=50, unit_price=Decimal('2.00'))
+
+        with self.assertRaises(ValueError):
+            sale.complete_sale(self.user)
+
+        sale.refresh_from_db()
+        self.assertEqual(sale.status, 'PENDING')
+        self.assertFalse(StockMovement.objects.filter(reference=f'Vente #{sale.pk}').exists())
+        self.assertEqual(
+            set(StockLevel.objects.values_list('current_stock', flat=True)), {10}
+        )
+        self.assertEqual(counters.verify(), {})
+
+
+class SalesRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('staff', password='secret')
+        cls.customer = Customer.objects.create(name='Installateur')
+        cls.category = Category.objects.create(name='Prises')
+        cls.products = [
+            Product.objects.create(
+                name=f'Prise {i}', sku=f'ROLL-{i}', category=cls.category,
+                price=Decimal('5.00'), cost_price=Decimal('3.00'),
+            )
+            for i in range(3)
+        ]
+        apply_movements([MovementLine(p, 'IN', 20) for p in cls.products], cls.user)
+
+    def make_sale(self, *quantities):
+        sale = Sale.objects.create(customer=self.customer, created_by=self.user)
+        for product, quantity in zip(self.products, quantities):
+            SaleItem.objects.create(sale=sale, product=product, quantity=quantity, unit_price=product.price)
+        sale.calculate_total()
+        return Sale.objects.get(pk=sale.pk)
+
+    def snapshot(self):
+        return (
+            list(DailySalesRollup.objects.values_list('date', 'sale_count', 'units', 'revenue', 'cost', 'margin')),
+            list(ProductDailySalesRollup.objects.values_list('date', 'product_id', 'units', 'revenue', 'cost', 'margin')),
+            list(CategoryDailySalesRollup.objects.values_list('date', 'category_id', 'units', 'revenue', 'cost', 'margin')),
+        )
+
+    def test_complete_and_cancel_update_the_rollups(self):
+        first, second = self.make_sale(2, 1), self.make_sale(3)
+        first.complete_sale(self.user)
+        second.complete_sale(self.user)
+
+        day = DailySalesRollup.objects.get()
+        self.assertEqual(day.sale_count, 2)
+        self.assertEqual(day.units, 6)
+        self.assertEqual(day.revenue, Decimal('30.00'))
+        self.assertEqual(day.cost, Decimal('18.00'))
+        self.assertEqual(day.margin, Decimal('12.00'))
+        self.assertEqual(ProductDailySalesRollup.objects.get(product=self.products[0]).units, 5)
+        self.assertEqual(CategoryDailySalesRollup.objects.get(category=self.category).revenue, Decimal('30.00'))
+
+        second.cancel_sale(self.user)
+        day.refresh_from_db()
+        self.assertEqual((day.sale_count, day.units, day.revenue), (1, 3, Decimal('15.00')))
+        self.assertEqual(ProductDailySalesRollup.objects.get(product=self.products[0]).units, 2)
+
+    def test_rebuild_matches_incremental_updates(self):
+        for quantities in ((1, 2, 3), (4,), (2, 2)):
+            self.make_sale(*quantities).complete_sale(self.user)
+        self.make_sale(1).complete_sale(self.user)
+        Sale.objects.order_by('-id').first().cancel_sale(self.user)
+        self.make_sale(5)  # Pending sales are not counted
+        incremental = self.snapshot()
+
+        out = io.StringIO()
+        call_command('rebuild_sales_rollups', stdout=out)
+        self.assertIn('1 day(s)', out.getvalue())
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_daily_revenue_is_the_sum_of_the_lines(self):
+        sale = self.make_sale(2, 1)
+        Sale.objects.filter(pk=sale.pk).update(total_amount=Decimal('99.00'))
+        Sale.objects.get(pk=sale.pk).complete_sale(self.user)
+        incremental = self.snapshot()
+        self.assertEqual(DailySalesRollup.objects.get().revenue, Decimal('15.00'))
+
+        call_command('rebuild_sales_rollups', stdout=io.StringIO())
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_analytics_read_the_rollups(self):
+        self.make_sale(2).complete_sale(self.user)
+        self.client.force_login(self.user)
+
+        with self.assertNumQueries(3):  # Session, user, rollups
+            response = self.client.get(reverse('sales_app:sales_api'))
+        self.assertEqual(response.json()['daily_sales'][0]['total_revenue'], 10.0)
+
+
+class SaleItemLookupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('staff', password='secret')
+        category = Category.objects.create(name='Disjoncteurs')
+        cls.products = [
+            Product.objects.create(
+                name=f'Disjoncteur {amps}A', sku=f'DJ-{amps:03d}', category=category,
+                price=Decimal('12.50'), cost_price=Decimal('8.00'),
+            )
+            for amps in (10, 16, 20, 32)
+        ]
+        cls.products[-1].is_active = False
+        cls.products[-1].save()
+        apply_movements([MovementLine(cls.products[1], 'IN', 7)], cls.user)
+        cls.sale = Sale.objects.create(customer=Customer.objects.create(name='Artisan'), created_by=cls.user)
+
+    def setUp(self):
+        self.client.login(username='staff', password='secret')
+
+    def test_lookup_returns_active_matches_with_price_and_stock(self):
+        response = self.client.get(reverse('products_app:product_lookup'), {'q': 'DJ-01', 'limit': 5})
+        self.assertEqual(response.json()['results'], [
+            {'id': self.products[0].pk, 'name': 'Disjoncteur 10A', 'sku': 'DJ-010', 'price': '12.50', 'current_stock': 0},
+            {'id': self.products[1].pk, 'name': 'Disjoncteur 16A', 'sku': 'DJ-016', 'price': '12.50', 'current_stock': 7},
+        ])
+        response = self.client.get(reverse('products_app:product_lookup'), {'q': 'disj'})
+        self.assertNotIn(self.products[-1].pk, [result['id'] for result in response.json()['results']])
+
+    def test_item_form_posts_the_looked_up_product(self):
+        url = reverse('sales_app:add_sale_item', args=[self.sale.pk])
+        response = self.client.get(url)
+        self.assertNotContains(response, 'DJ-016')
+
+        response = self.client.post(url, {'product': self.products[1].pk, 'quantity': 2, 'unit_price': '12.50'})
+        self.assertRedirects(response, reverse('sales_app:sale_detail', args=[self.sale.pk]))
+        self.assertEqual(self.sale.sale_items.get().product, self.products[1])
+
+        response = self.client.post(url, {'product': self.products[-1].pk, 'quantity': 1, 'unit_price': '12.50'})
+        self.assertContains(response, 'id="product_search"')
+        self.assertFalse(response.context['form'].is_valid())
+
+
+@skipUnless(columnar.is_available(), 'pyarrow is not installed')
+class ColumnarExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('staff')
+        customer = Customer.objects.create(name='Grossiste')
+        category = Category.objects.create(name='Câbles')
+        product = Product.objects.create(
+            name='Câble 2.5mm', sku='CAB-25', category=category,
+            price=Decimal('2.50'), cost_price=Decimal('1.10'),
+        )
+        sale = Sale.objects.create(customer=customer, created_by=cls.user, status='COMPLETED')
+        SaleItem.objects.create(sale=sale, product=product, quantity=3, unit_price=Decimal('2.50'))
+
+    def test_sale_lines_are_typed_and_joined(self):
+        from pyarrow import parquet
+
+        buffer = io.BytesIO()
+        rows = SALE_LINES_EXPORT.write(buffer, 'parquet')
+        table = parquet.read_table(io.BytesIO(buffer.getvalue()))
+
+        self.assertEqual(rows, 1)
+        self.assertEqual(str(table.schema.field('unit_price').type), 'decimal128(10, 2)')
+        self.assertEqual(str(table.schema.field('sale_date').type), 'timestamp[us, tz=UTC]')
+        line = table.to_pylist()[0]
+        self.assertEqual(line['category'], 'Câbles')
+        self.assertEqual(line['line_total'], Decimal('7.50'))
+
+    def test_export_view_streams_arrow_file(self):
+        import pyarrow
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('sales_app:export_sales'), {'format': 'arrow', 'status': 'COMPLETED'})
+        content = b''.join(response.streaming_content)
+
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="sale_lines.arrow"')
+        self.assertEqual(pyarrow.ipc.open_file(content).read_all().num_rows, 1)
+
+        response = self.client.get(reverse('sales_app:export_sales'), {'format': 'xlsx'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_background_export_keeps_the_format(self):
+        from pyarrow import parquet
+        from jobs_app.models import Job
+        from jobs_app.runner import claim_next_job, run_job
+
+        self.client.force_login(self.user)
+        url = reverse('sales_app:export_sales')
+        self.assertEqual(self.client.get(url, {'format': 'xlsx', 'background': 1}).status_code, 400)
+        self.assertFalse(Job.objects.exists())
+
+        with TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            self.client.get(url, {'format': 'parquet', 'background': 1})
+            job = run_job(claim_next_job())
+            self.assertEqual(job.status, 'COMPLETED')
+            self.assertTrue(job.result_file.name.endswith('.parquet'))
+            with job.result_file.open('rb') as f:
+                self.assertEqual(parquet.read_table(io.BytesIO(f.read())).num_rows, 1)
+
+    def test_export_dataset_command(self):
+        from pyarrow import parquet
+
+        with TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'movements.parquet')
+            call_command('export_dataset', 'movements', path, stdout=io.StringIO())
+            self.assertEqual(parquet.read_table(path).num_rows, 0)
@@ -1,44 +1,27 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.paginator import Paginator
-from django.db.models import Q, Sum, Count
-from django.http import JsonResponse, HttpResponse
+from django.db.models import Q, Sum
+from django.http import HttpResponseBadRequest, JsonResponse
 from django.utils import timezone
 from django.db import transaction
-from datetime import datetime, timedelta
-import csv
-import io
-from .models import Customer, Sale, SaleItem
+from datetime import timedelta
+from .models import Customer, DailySalesRollup, Sale, SaleItem
+from .exports import CUSTOMERS_EXPORT, SALE_LINES_EXPORT, SALES_EXPORT
 from .forms import CustomerForm, SaleForm, SaleItemForm
 from products_app.models import Product
 from stock_app.models import StockLevel, StockMovement
+from dashboard_app.metrics import get_sales_metrics
+from core_app.columnar import columnar_response, validate_format
+from core_app.exporters import export_response
+from core_app.pagination import paginate
+from jobs_app.runner import enqueue
 
 
 @login_required
 def sales_dashboard(request):
     # Get sales statistics
-    today = timezone.now().date()
-    this_month = today.replace(day=1)
-    
-    total_sales = Sale.objects.filter(status='COMPLETED').count()
-    today_sales = Sale.objects.filter(sale_date__date=today, status='COMPLETED').count()
-    month_sales = Sale.objects.filter(sale_date__date__gte=this_month, status='COMPLETED').count()
-    
-    # Revenue statistics
-    total_revenue = Sale.objects.filter(status='COMPLETED').aggregate(
-        total=Sum('total_amount')
-    )['total'] or 0
-    
-    today_revenue = Sale.objects.filter(
-        sale_date__date=today, 
-        status='COMPLETED'
-    ).aggregate(total=Sum('total_amount'))['total'] or 0
-    
-    month_revenue = Sale.objects.filter(
-        sale_date__date__gte=this_month, 
-        status='COMPLETED'
-    ).aggregate(total=Sum('total_amount'))['total'] or 0
+    sales = get_sales_metrics()
     
     # Top selling products
     from django.db.models import F
@@ -53,12 +36,12 @@ def sales_dashboard(request):
     recent_sales = Sale.objects.filter(status='COMPLETED').select_related('customer')[:10]
     
     context = {
-        'total_sales': total_sales,
-        'today_sales': today_sales,
-        'month_sales': month_sales,
-        'total_revenue': total_revenue,
-        'today_revenue': today_revenue,
-        'month_revenue': month_revenue,
+        'total_sales': sales.total_sales,
+        'today_sales': sales.today_sales,
+        'month_sales': sales.month_sales,
+        'total_revenue': sales.total_revenue,
+        'today_revenue': sales.today_revenue,
+        'month_revenue': sales.month_revenue,
         'top_products': top_products,
         'recent_sales': recent_sales,
     }
@@ -90,10 +73,8 @@ def sales_list(request):
     if date_to:
         sales = sales.filter(sale_date__date__lte=date_to)
     
-    # Pagination
-    paginator = Paginator(sales, 20)
-    page_number = request.GET.get('page')
-    sales = paginator.get_page(page_number)
+    # Keyset pagination: the cost of a page does not depend on its depth
+    sales = paginate(request, sales, ordering=('-sale_date', '-id'))
     
     context = {
         'sales': sales,
@@ -212,10 +193,8 @@ def customer_list(request):
             Q(phone__icontains=search_query)
         )
     
-    # Pagination
-    paginator = Paginator(customers, 20)
-    page_number = request.GET.get('page')
-    customers = paginator.get_page(page_number)
+    # Keyset pagination: the cost of a page does not depend on its depth
+    customers = paginate(request, customers, ordering=('name', 'id'))
     
     context = {
         'customers': customers,
@@ -240,35 +219,34 @@ def customer_create(request):
 
 @login_required
 def sales_analytics(request):
-    from django.db.models.functions import TruncDate, TruncMonth
+    from django.db.models import F
+    from django.db.models.functions import TruncMonth
     
-    # Sales data for charts
+    # Sales data for charts, read from the daily rollups (one row per day)
     end_date = timezone.now().date()
     start_date_daily = end_date - timedelta(days=90)  # Last 90 days
     start_date_monthly = end_date - timedelta(days=365)  # Last year
     
     # Daily sales for the last 90 days
-    daily_sales = Sale.objects.filter(
-        sale_date__date__gte=start_date_daily,
-        sale_date__date__lte=end_date,
-        status='COMPLETED'
-    ).annotate(
-        day=TruncDate('sale_date')
-    ).values('day').annotate(
-        total_sales=Count('id'),
-        total_revenue=Sum('total_amount')
-    ).order_by('day')
+    daily_sales = DailySalesRollup.objects.filter(
+        date__gte=start_date_daily,
+        date__lte=end_date,
+        sale_count__gt=0,
+    ).values(
+        day=F('date'),
+        total_sales=F('sale_count'),
+        total_revenue=F('revenue'),
+    ).order_by('date')
     
     # Monthly sales for the last 12 months
-    monthly_sales = Sale.objects.filter(
-        sale_date__date__gte=start_date_monthly,
-        status='COMPLETED'
+    monthly_sales = DailySalesRollup.objects.filter(
+        date__gte=start_date_monthly,
     ).annotate(
-        month=TruncMonth('sale_date')
+        month=TruncMonth('date')
     ).values('month').annotate(
-        total_sales=Count('id'),
-        total_revenue=Sum('total_amount')
-    ).order_by('month')
+        total_sales=Sum('sale_count'),
+        total_revenue=Sum('revenue')
+    ).filter(total_sales__gt=0).order_by('month')
     
     context = {
         'daily_sales': list(daily_sales),
@@ -280,21 +258,20 @@ def sales_analytics(request):
 @login_required
 def sales_api(request):
     """API endpoint for sales data"""
-    from django.db.models.functions import TruncDate
+    from django.db.models import F
     
     end_date = timezone.now().date()
     start_date = end_date - timedelta(days=90)  # Last 90 days
     
-    daily_sales = Sale.objects.filter(
-        sale_date__date__gte=start_date,
-        sale_date__date__lte=end_date,
-        status='COMPLETED'
-    ).annotate(
-        day=TruncDate('sale_date')
-    ).values('day').annotate(
-        total_sales=Count('id'),
-        total_revenue=Sum('total_amount')
-    ).order_by('day')
+    daily_sales = DailySalesRollup.objects.filter(
+        date__gte=start_date,
+        date__lte=end_date,
+        sale_count__gt=0,
+    ).values(
+        day=F('date'),
+        total_sales=F('sale_count'),
+        total_revenue=F('revenue'),
+    ).order_by('date')
     
     # Convert to list and format dates as strings
     sales_data = []
@@ -314,47 +291,37 @@ def sales_api(request):
 
 @login_required
 def export_sales(request):
-    """Export sales to CSV"""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="sales.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Sale ID', 'Customer', 'Date', 'Status', 'Total Amount', 'Created By'])
-    
-    sales = Sale.objects.select_related('customer', 'created_by').all()
-    for sale in sales:
-        writer.writerow([
-            sale.id,
-            sale.customer.name,
-            sale.sale_date.strftime('%Y-%m-%d %H:%M'),
-            sale.get_status_display(),
-            sale.total_amount,
-            sale.created_by.get_full_name() or sale.created_by.username
-        ])
-    
-    return response
+    """Export sales to CSV, or sale lines to Parquet / Arrow (?format=parquet|arrow)"""
+    params = SALES_EXPORT.params(request.GET)
+    fmt = request.GET.get('format', 'csv')
+    if fmt != 'csv':
+        params = SALE_LINES_EXPORT.params(request.GET)
+    if request.GET.get('background'):
+        if fmt != 'csv':
+            try:
+                validate_format(SALE_LINES_EXPORT, fmt, params)
+            except ValueError as e:
+                return HttpResponseBadRequest(str(e))
+            params['format'] = fmt
+        job = enqueue('EXPORT_SALES', request.user, params=params)
+        messages.info(request, 'Export lancé en arrière-plan')
+        return redirect('jobs_app:job_detail', pk=job.pk)
+    
+    if fmt != 'csv':
+        return columnar_response(SALE_LINES_EXPORT, fmt, params)
+    return export_response(SALES_EXPORT, params)
 
 
 @login_required
 def export_customers(request):
     """Export customers to CSV"""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="customers.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Name', 'Email', 'Phone', 'Address', 'Created Date'])
-    
-    customers = Customer.objects.all()
-    for customer in customers:
-        writer.writerow([
-            customer.name,
-            customer.email or '',
-            customer.phone or '',
-            customer.address or '',
-            customer.created_at.strftime('%Y-%m-%d')
-        ])
+    params = CUSTOMERS_EXPORT.params(request.GET)
+    if request.GET.get('background'):
+        job = enqueue('EXPORT_CUSTOMERS', request.user, params=params)
+        messages.info(request, 'Export lancé en arrière-plan')
+        return redirect('jobs_app:job_detail', pk=job.pk)
     
-    return response
+    return export_response(CUSTOMERS_EXPORT, params)
 
 
 @login_required
@@ -371,70 +338,9 @@ def import_customers(request):
             messages.error(request, 'Le fichier doit être au format CSV')
             return redirect('sales_app:import_customers')
         
-        try:
-            # Read the CSV file
-            decoded_file = csv_file.read().decode('utf-8')
-            io_string = io.StringIO(decoded_file)
-            reader = csv.DictReader(io_string)
-            
-            created_count = 0
-            updated_count = 0
-            error_count = 0
-            errors = []
-            
-            for row_num, row in enumerate(reader, start=2):
-                try:
-                    name = row.get('Name', '').strip()
-                    if not name:
-                        errors.append(f"Ligne {row_num}: Nom manquant")
-                        error_count += 1
-                        continue
-                    
-                    email = row.get('Email', '').strip()
-                    
-                    # Check if customer exists by name or email
-                    customer_filter = Q(name=name)
-                    if email:
-                        customer_filter |= Q(email=email)
-                    
-                    existing_customer = Customer.objects.filter(customer_filter).first()
-                    
-                    customer_data = {
-                        'name': name,
-                        'email': email,
-                        'phone': row.get('Phone', '').strip(),
-                        'address': row.get('Address', '').strip(),
-                    }
-                    
-                    if existing_customer:
-                        # Update existing customer
-                        for key, value in customer_data.items():
-                            setattr(existing_customer, key, value)
-                        existing_customer.save()
-                        updated_count += 1
-                    else:
-                        # Create new customer
-                        Customer.objects.create(**customer_data)
-                        created_count += 1
-                        
-                except Exception as e:
-                    errors.append(f"Ligne {row_num}: {str(e)}")
-                    error_count += 1
-            
-            # Show results
-            if created_count > 0:
-                messages.success(request, f'{created_count} client(s) créé(s)')
-            if updated_count > 0:
-                messages.success(request, f'{updated_count} client(s) mis à jour')
-            if error_count > 0:
-                messages.warning(request, f'{error_count} erreur(s) rencontrée(s)')
-                for error in errors[:5]:  # Show first 5 errors
-                    messages.error(request, error)
-            
-            return redirect('sales_app:customer_list')
-            
-        except Exception as e:
-            messages.error(request, f'Erreur lors de l\'importation: {str(e)}')
-            return redirect('sales_app:import_customers')
+        # The file is processed by the run_jobs worker; the job page polls its progress
+        job = enqueue('IMPORT_CUSTOMERS', request.user, input_file=csv_file)
+        messages.info(request, 'Importation en cours de traitement')
+        return redirect('jobs_app:job_detail', pk=job.pk)
     
     return render(request, 'sales_app/import_customers.html')
\ No newline at end of file
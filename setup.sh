@@ -17,7 +17,7 @@ if ! command -v pip3 &> /dev/null; then
 fi
 
 echo "Installing required packages..."
-pip3 install django pillow faker python-docx django-plotly-dash black
+pip3 install django pillow faker python-docx django-plotly-dash black pyarrow uvicorn
 
 echo "Running database migrations..."
 python3 manage.py makemigrations --skip-checks
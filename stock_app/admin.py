@@ -1,11 +1,32 @@
 from django.contrib import admin
-from .models import StockMovement, StockLevel
+from . import counters
+from .models import (
+    ArchivedMovementMonth, Location, LocationStock, ProductMetrics, PurchaseOrder, PurchaseOrderLine,
+    StockAlertEvent, StockCount, StockMovement, StockLevel, StockSnapshot,
+)
+
+
+@admin.register(Location)
+class LocationAdmin(admin.ModelAdmin):
+    list_display = ['name', 'code', 'is_default', 'is_active', 'created_at']
+    list_filter = ['is_active']
+    search_fields = ['name', 'code']
+
+
+@admin.register(LocationStock)
+class LocationStockAdmin(admin.ModelAdmin):
+    list_display = ['product', 'location', 'quantity', 'last_updated']
+    list_filter = ['location']
+    search_fields = ['product__name', 'product__sku']
+    raw_id_fields = ['product']
+    # Changed through stock movements only (stock_app.services)
+    readonly_fields = ['product', 'location', 'quantity', 'last_updated']
 
 
 @admin.register(StockMovement)
 class StockMovementAdmin(admin.ModelAdmin):
-    list_display = ['product', 'movement_type', 'quantity', 'reference', 'created_by', 'created_at']
-    list_filter = ['movement_type', 'created_at', 'product__category']
+    list_display = ['product', 'movement_type', 'quantity', 'location', 'to_location', 'reference', 'created_by', 'created_at']
+    list_filter = ['movement_type', 'location', 'created_at', 'product__category']
     search_fields = ['product__name', 'product__sku', 'reference', 'notes']
     raw_id_fields = ['product', 'created_by']
     readonly_fields = ['created_at']
@@ -17,4 +38,83 @@ class StockLevelAdmin(admin.ModelAdmin):
     list_filter = ['last_updated']
     search_fields = ['product__name', 'product__sku']
     raw_id_fields = ['product']
-    readonly_fields = ['last_updated', 'stock_status']
\ No newline at end of file
+    # current_stock only changes through stock movements (stock_app.services)
+    readonly_fields = ['current_stock', 'last_updated', 'stock_status']
+
+    def save_model(self, request, obj, form, change):
+        before = counters.EMPTY
+        if change:
+            stored = StockLevel.objects.select_related('product').get(pk=obj.pk)
+            before = counters.level_state(stored.current_stock, stored.minimum_stock, stored.product.price)
+        super().save_model(request, obj, form, change)
+        counters.record(
+            counters.level_state(obj.current_stock, obj.minimum_stock, obj.product.price) - before
+        )
+
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['product', 'location', 'taken_at', 'quantity']
+    list_filter = ['taken_at']
+    search_fields = ['product__name', 'product__sku']
+    raw_id_fields = ['product']
+    readonly_fields = ['product', 'location', 'taken_at', 'quantity']
+
+
+@admin.register(ArchivedMovementMonth)
+class ArchivedMovementMonthAdmin(admin.ModelAdmin):
+    list_display = ['month', 'row_count', 'file', 'archived_at']
+    readonly_fields = ['month', 'row_count', 'file', 'archived_at']
+
+
+@admin.register(StockCount)
+class StockCountAdmin(admin.ModelAdmin):
+    list_display = ['reference', 'location', 'category', 'status', 'line_count', 'movement_count', 'opened_by', 'opened_at', 'closed_at']
+    list_filter = ['status', 'opened_at']
+    search_fields = ['reference', 'notes']
+    # Opened, counted and closed through stock_app.counting
+    readonly_fields = [
+        'reference', 'location', 'category', 'status', 'line_count', 'movement_count',
+        'opened_by', 'opened_at', 'last_count_at', 'closed_by', 'closed_at',
+    ]
+
+
+@admin.register(ProductMetrics)
+class ProductMetricsAdmin(admin.ModelAdmin):
+    list_display = ['product', 'abc_class', 'units_sold', 'revenue', 'turnover', 'days_of_cover', 'is_dead_stock', 'computed_at']
+    list_filter = ['abc_class', 'is_dead_stock']
+    search_fields = ['product__name', 'product__sku']
+    # Recomputed as a whole by the compute_inventory_metrics command
+    readonly_fields = [
+        'product', 'abc_class', 'units_sold', 'revenue', 'average_stock', 'turnover', 'days_of_cover',
+        'last_out_at', 'is_dead_stock', 'period_days', 'computed_at',
+    ]
+
+
+class PurchaseOrderLineInline(admin.TabularInline):
+    model = PurchaseOrderLine
+    raw_id_fields = ['product']
+    extra = 0
+
+
+@admin.register(PurchaseOrder)
+class PurchaseOrderAdmin(admin.ModelAdmin):
+    list_display = ['reference', 'supplier', 'category', 'status', 'line_count', 'total_cost', 'created_by', 'created_at', 'received_at']
+    list_filter = ['status', 'supplier', 'created_at']
+    search_fields = ['reference', 'notes']
+    # Received through stock_app.purchasing, which posts the stock movements
+    readonly_fields = ['status', 'line_count', 'total_cost', 'created_by', 'created_at', 'received_by', 'received_at']
+    inlines = [PurchaseOrderLineInline]
+
+
+
+@admin.register(StockAlertEvent)
+class StockAlertEventAdmin(admin.ModelAdmin):
+    list_display = ['product', 'previous_status', 'status', 'current_stock', 'minimum_stock', 'created_at', 'dispatched_at', 'attempts']
+    list_filter = ['status', 'created_at']
+    search_fields = ['product__name', 'product__sku']
+    # Written by the stock changes, sent by the dispatch_stock_alerts command
+    readonly_fields = [
+        'product', 'previous_status', 'status', 'current_stock', 'minimum_stock', 'created_at',
+        'dispatch_id', 'dispatched_at', 'attempts', 'last_error',
+    ]
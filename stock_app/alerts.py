@@ -0,0 +1,246 @@
+"""
+Low-stock alerts, pushed rather than polled.
+
+Every write that changes a stock level or its minimum calls record() with the
+levels before and after, in its own transaction: a product whose status
+(in stock / low / out of stock, as shown by StockLevel.stock_status) changes
+gets a StockAlertEvent row, committed or rolled back with the change itself
+(a transactional outbox). Levels created by the write have no previous status
+and record nothing.
+
+dispatch() delivers the pending events. Events are debounced per product: a
+product is sent once it has had no new event for STOCK_ALERT_DEBOUNCE_SECONDS
+(or its oldest pending event is STOCK_ALERT_MAX_DELAY_SECONDS old), and its
+pending events collapse into one notification from the status before the
+first to the status after the last; a product back to where it started is
+not sent at all. All the products ready at once go out together, as one email
+to STOCK_ALERT_EMAILS and one POST to STOCK_ALERT_WEBHOOK_URL.
+
+Events are claimed with a conditional UPDATE before being sent, so several
+dispatchers can run. The channels are tried independently: when one fails,
+the events record the channels that succeeded (which are not sent them
+again) and go back to pending after STOCK_ALERT_RETRY_SECONDS, doubled at
+every attempt. After STOCK_ALERT_MAX_ATTEMPTS they are given up: marked as
+dispatched with their last_error, without every channel in delivered_channels.
+"""
+
+import json
+import logging
+import urllib.request
+import uuid
+from datetime import timedelta
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from products_app.models import Product
+from .models import StockAlertEvent
+
+logger = logging.getLogger(__name__)
+
+STATUS_LABELS = dict(StockAlertEvent.STATUS_CHOICES)
+CLAIM_BATCH = 500
+
+
+def status(current_stock, minimum_stock):
+    """Same states as StockLevel.stock_status"""
+    if current_stock == 0:
+        return 'OUT'
+    if current_stock <= minimum_stock:
+        return 'LOW'
+    return 'OK'
+
+
+def record(changes):
+    """Queue an event for every (product_id, (stock, minimum) before, (stock, minimum) after)
+    whose status changed; call it in the transaction that made the change"""
+    events = []
+    for product_id, before, after in changes:
+        previous, current = status(*before), status(*after)
+        if previous != current:
+            events.append(StockAlertEvent(
+                product_id=product_id, previous_status=previous, status=current,
+                current_stock=after[0], minimum_stock=after[1],
+            ))
+    if events:
+        StockAlertEvent.objects.bulk_create(events)
+    return events
+
+
+# --- Delivery ----------------------------------------------------------------
+
+class Notification(NamedTuple):
+    product: object
+    previous_status: str
+    status: str
+    current_stock: int
+    minimum_stock: int
+    at: object
+
+    def as_dict(self):
+        return {
+            'sku': self.product.sku,
+            'name': self.product.name,
+            'previous_status': self.previous_status,
+            'status': self.status,
+            'current_stock': self.current_stock,
+            'minimum_stock': self.minimum_stock,
+            'at': self.at.isoformat(),
+        }
+
+    def __str__(self):
+        return (
+            f'{self.product.sku} {self.product.name}: {STATUS_LABELS[self.status]} '
+            f'(stock {self.current_stock}, minimum {self.minimum_stock}, '
+            f'auparavant {STATUS_LABELS[self.previous_status].lower()})'
+        )
+
+
+def send_email(notifications):
+    if not settings.STOCK_ALERT_EMAILS:
+        return
+    send_mail(
+        f'Alertes de stock : {len(notifications)} produit(s)',
+        '\n'.join(str(notification) for notification in notifications),
+        None,
+        settings.STOCK_ALERT_EMAILS,
+    )
+
+
+def send_webhook(notifications):
+    if not settings.STOCK_ALERT_WEBHOOK_URL:
+        return
+    request = urllib.request.Request(
+        settings.STOCK_ALERT_WEBHOOK_URL,
+        data=json.dumps({'alerts': [n.as_dict() for n in notifications]}).encode(),
+        headers={'Content-Type': 'application/json'},
+        method='POST',
+    )
+    with urllib.request.urlopen(request, timeout=settings.STOCK_ALERT_WEBHOOK_TIMEOUT):
+        pass
+
+
+CHANNELS = (send_email, send_webhook)
+
+
+def channel_name(channel):
+    return getattr(channel, '__name__', repr(channel))
+
+
+def retry_delay(attempts):
+    """Seconds before the next try of events that failed attempts times"""
+    return settings.STOCK_ALERT_RETRY_SECONDS * 2 ** (attempts - 1)
+
+
+def ready_products(now=None, debounce=None, max_delay=None):
+    """Ids of the products whose pending events are due, with one grouped query"""
+    now = now or timezone.now()
+    debounce = settings.STOCK_ALERT_DEBOUNCE_SECONDS if debounce is None else debounce
+    max_delay = settings.STOCK_ALERT_MAX_DELAY_SECONDS if max_delay is None else max_delay
+    return list(
+        StockAlertEvent.objects.filter(dispatched_at__isnull=True)
+        .filter(Q(retry_at__isnull=True) | Q(retry_at__lte=now))
+        .order_by().values('product_id').annotate(first=Min('created_at'), last=Max('created_at'))
+        .filter(Q(last__lte=now - timedelta(seconds=debounce)) | Q(first__lte=now - timedelta(seconds=max_delay)))
+        .values_list('product_id', flat=True)
+    )
+
+
+def _claim(product_ids, now):
+    """Mark the pending events of product_ids as being sent; returns the claim token"""
+    token = uuid.uuid4().hex
+    for start in range(0, len(product_ids), CLAIM_BATCH):
+        StockAlertEvent.objects.filter(
+            Q(retry_at__isnull=True) | Q(retry_at__lte=now),
+            product_id__in=product_ids[start:start + CLAIM_BATCH], dispatched_at__isnull=True, created_at__lte=now,
+        ).update(dispatch_id=token, dispatched_at=now)
+    return token
+
+
+def _collapse(token):
+    """One Notification per product from the claimed events, with the claimed events by product.
+
+    Products back to their first status are left out of the notifications.
+    """
+    first, last, events = {}, {}, {}
+    for event in StockAlertEvent.objects.filter(dispatch_id=token).order_by('created_at', 'id').iterator():
+        first.setdefault(event.product_id, event)
+        last[event.product_id] = event
+        events.setdefault(event.product_id, []).append(event)
+    products = Product.objects.in_bulk(list(last))
+    notifications = [
+        Notification(
+            products[product_id], first[product_id].previous_status, event.status,
+            event.current_stock, event.minimum_stock, event.created_at,
+        )
+        for product_id, event in last.items()
+        if first[product_id].previous_status != event.status
+    ]
+    return notifications, events
+
+
+def _delivered(events, name):
+    """Whether every event was already sent on the channel called name"""
+    return all(name in event.delivered_channels for event in events)
+
+
+def _release(events, error, now):
+    """Back to pending after the retry delay, or given up after STOCK_ALERT_MAX_ATTEMPTS"""
+    for event in events:
+        event.attempts += 1
+        event.last_error = error
+        event.dispatch_id = ''
+        if event.attempts >= settings.STOCK_ALERT_MAX_ATTEMPTS:
+            event.retry_at = None
+        else:
+            event.dispatched_at = None
+            event.retry_at = now + timedelta(seconds=retry_delay(event.attempts))
+    given_up = sum(1 for event in events if event.dispatched_at is not None)
+    if given_up:
+        logger.error('Stock alerts given up after %s attempts: %s event(s)', settings.STOCK_ALERT_MAX_ATTEMPTS, given_up)
+    StockAlertEvent.objects.bulk_update(
+        events, ['attempts', 'last_error', 'dispatch_id', 'dispatched_at', 'retry_at', 'delivered_channels'],
+        batch_size=CLAIM_BATCH,
+    )
+
+
+def dispatch(now=None, debounce=None, max_delay=None, channels=CHANNELS):
+    """Send the due events; returns the notifications sent, raises the first channel error"""
+    now = now or timezone.now()
+    product_ids = ready_products(now, debounce, max_delay)
+    if not product_ids:
+        return []
+    token = _claim(product_ids, now)
+    notifications, events = _collapse(token)
+    notifications.sort(key=lambda n: (n.status != 'OUT', n.status != 'LOW', n.product.sku))
+    if not notifications:
+        return []
+
+    errors = []
+    for channel in channels:
+        name = channel_name(channel)
+        pending = [n for n in notifications if not _delivered(events[n.product.pk], name)]
+        if not pending:
+            continue
+        try:
+            channel(pending)
+        except Exception as e:
+            logger.exception('Stock alert delivery failed (%s)', name)
+            errors.append(e)
+            continue
+        for notification in pending:
+            for event in events[notification.product.pk]:
+                event.delivered_channels = [*event.delivered_channels, name]
+    if errors:
+        _release([event for n in notifications for event in events[n.product.pk]], str(errors[0]), now)
+        raise errors[0]
+    return notifications
+
+
+def prune(keep_days=30, now=None):
+    """Delete the events sent more than keep_days days ago"""
+    limit = (now or timezone.now()) - timedelta(days=keep_days)
+    return StockAlertEvent.objects.filter(dispatched_at__lt=limit).delete()[0]
@@ -0,0 +1,159 @@
+"""
+Inventory analytics: ABC classes, turnover, days of cover and dead stock.
+
+compute() reads its inputs with a handful of grouped queries (current stock
+per product, sales per product from the daily rollups, last outgoing
+movement per product, and the stock at the start of the period replayed by
+the ledger) into Arrow tables, joins them on product_id and computes each
+metric for every product at once with pyarrow.compute; nothing is read or
+computed product by product. The results replace the ProductMetrics table,
+which the product page, the stock list filters and the metrics export read.
+
+Over the last `days` days:
+
+- ABC: products ranked by revenue; A until 80% of the total revenue is
+  reached, B until 95%, C for the rest and for products without sales
+- turnover: units sold / average stock (mean of the stock at the start and
+  at the end of the period)
+- days of cover: current stock / units sold per day (None without sales)
+- dead stock: stock on hand, but no outgoing movement in the last
+  dead_days days, for a product older than that
+
+pyarrow is a required dependency (see the README).
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from products_app import catalog
+from products_app.models import Product
+from sales_app.models import ProductDailySalesRollup
+from . import ledger
+from .models import ProductMetrics, StockMovement
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+DEFAULT_DAYS = 365
+DEAD_STOCK_DAYS = 180
+A_SHARE = 0.80
+B_SHARE = 0.95
+# Stock list filter: products that will run out within this many days
+LOW_COVER_DAYS = 30
+
+TIMESTAMP = None if pa is None else pa.timestamp('us', tz='UTC')
+
+
+def _table(schema, rows):
+    """Arrow table from values_list() rows"""
+    columns = list(zip(*rows)) or [[] for _ in schema]
+    return pa.table({name: pa.array(column, type=type_) for (name, type_), column in zip(schema, columns)})
+
+
+def _inputs(start, now):
+    """One Arrow table with a row per product and every input column"""
+    products = _table(
+        [('product_id', pa.int64()), ('stock', pa.int64()), ('created_at', TIMESTAMP)],
+        Product.objects.values_list('id', 'stock_level__current_stock', 'created_at').iterator(chunk_size=5000),
+    )
+    sales = _table(
+        [('product_id', pa.int64()), ('units', pa.int64()), ('revenue', pa.float64())],
+        (
+            (product_id, units, float(revenue))
+            for product_id, units, revenue in ProductDailySalesRollup.objects
+            .filter(date__gt=timezone.localdate(start), date__lte=timezone.localdate(now))
+            .order_by().values('product_id').annotate(units=Sum('units'), revenue=Sum('revenue'))
+            .values_list('product_id', 'units', 'revenue')
+        ),
+    )
+    last_out = _table(
+        [('product_id', pa.int64()), ('last_out_at', TIMESTAMP)],
+        StockMovement.objects.filter(movement_type='OUT', created_at__lte=now)
+        .order_by().values('product_id').annotate(last=Max('created_at')).values_list('product_id', 'last'),
+    )
+    opening = _table(
+        [('product_id', pa.int64()), ('opening_stock', pa.int64())],
+        ledger.stock_levels_at(start).items(),
+    )
+    table = products
+    for other in (sales, last_out, opening):
+        table = table.join(other, 'product_id', join_type='left outer')
+    return table
+
+
+def _abc(revenue):
+    """ABC class of each product from its revenue (a float64 array)"""
+    order = pc.array_sort_indices(revenue, order='descending')
+    ranked = pc.take(revenue, order)
+    total = pc.sum(ranked).as_py() or 0.0
+    # Share of the revenue made by the better-ranked products: the product
+    # crossing a threshold still belongs to the class below it
+    before = pc.subtract(pc.cumulative_sum(ranked), ranked)
+    share = pc.divide(before, total) if total else pc.multiply(before, 0.0)
+    classes = pc.if_else(
+        pc.equal(ranked, 0.0), 'C',
+        pc.if_else(pc.less(share, A_SHARE), 'A', pc.if_else(pc.less(share, B_SHARE), 'B', 'C')),
+    )
+    # Back to the original row order
+    return pc.take(classes, pc.array_sort_indices(order))
+
+
+def compute_table(days=DEFAULT_DAYS, dead_days=DEAD_STOCK_DAYS, now=None):
+    """Arrow table of the metrics of every product, see the module docstring"""
+    now = now or timezone.now()
+    table = _inputs(now - timedelta(days=days), now)
+
+    stock = pc.fill_null(table['stock'], 0)
+    units = pc.fill_null(table['units'], 0)
+    revenue = pc.fill_null(table['revenue'], 0.0)
+    opening = pc.fill_null(table['opening_stock'], 0)
+
+    average_stock = pc.divide(pc.cast(pc.add(opening, stock), pa.float64()), 2.0)
+    turnover = pc.if_else(
+        pc.greater(average_stock, 0.0),
+        pc.divide(pc.cast(units, pa.float64()), average_stock),
+        pa.scalar(None, pa.float64()),
+    )
+    daily_units = pc.divide(pc.cast(units, pa.float64()), float(days))
+    days_of_cover = pc.if_else(
+        pc.greater(units, 0),
+        pc.divide(pc.cast(stock, pa.float64()), daily_units),
+        pa.scalar(None, pa.float64()),
+    )
+    dead_since = pa.scalar(now - timedelta(days=dead_days), TIMESTAMP)
+    is_dead = pc.and_(
+        pc.and_(pc.greater(stock, 0), pc.less(table['created_at'], dead_since)),
+        pc.fill_null(pc.less(table['last_out_at'], dead_since), True),
+    )
+
+    return pa.table({
+        'product_id': table['product_id'],
+        'abc_class': _abc(revenue),
+        'units_sold': units,
+        'revenue': revenue,
+        'average_stock': average_stock,
+        'turnover': turnover,
+        'days_of_cover': days_of_cover,
+        'last_out_at': table['last_out_at'],
+        'is_dead_stock': is_dead,
+    })
+
+
+def compute(days=DEFAULT_DAYS, dead_days=DEAD_STOCK_DAYS, now=None):
+    """Recompute and store the metrics of every product; returns the number of products"""
+    now = now or timezone.now()
+    rows = compute_table(days, dead_days, now).to_pylist()
+    for row in rows:
+        row['revenue'] = Decimal(str(round(row['revenue'], 2)))
+    with transaction.atomic():
+        ProductMetrics.objects.all().delete()
+        ProductMetrics.objects.bulk_create(
+            (ProductMetrics(**row, period_days=days, computed_at=now) for row in rows),
+            batch_size=1000,
+        )
+        catalog.invalidate_all(ProductMetrics)
+    return len(rows)
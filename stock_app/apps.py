@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class StockAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'stock_app'
\ No newline at end of file
+    name = 'stock_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,328 @@
+"""
+Archival of old stock movements.
+
+archive_movements() moves the movements older than
+settings.STOCK_MOVEMENT_ARCHIVE_MONTHS whole months out of StockMovement,
+one calendar month at a time, oldest first: the month is written to a
+gzipped JSON-lines file (newest first, with the product and user names
+copied in), recorded as an ArchivedMovementMonth with its row counts, then
+the rows written are deleted (the file is removed if that fails). A stock
+snapshot is taken at the end of each month before it leaves the table, so
+current stock and later point-in-time queries never need the archive.
+
+Archived rows are older than every movement left in the table. Reads that
+ask for a date range reaching into archived months get them after the
+table's rows: MovementArchive continues the movements list past its last
+page, export_rows() feeds the exports and ledger_rows() the ledger replay.
+"""
+
+import gzip
+import json
+import tempfile
+from collections import Counter, deque
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from core_app import fragments
+from core_app.exporters import user_fields
+from . import ledger
+from .models import ArchivedMovementMonth, StockMovement
+
+# Columns kept for each movement, by their lookup from StockMovement
+FIELDS = (
+    'id', 'created_at', 'product_id', 'product__name', 'product__sku',
+    'product__category_id', 'product__category__name', 'movement_type',
+    'quantity', 'reference', 'notes', 'created_by_id', *user_fields('created_by'),
+    'location_id', 'location__code', 'to_location_id', 'to_location__code',
+)
+DELETE_BATCH = 1000
+_ID, _PRODUCT, _TYPE = (FIELDS.index(name) for name in ('id', 'product_id', 'movement_type'))
+
+
+def _month_start(day):
+    return timezone.make_aware(datetime.combine(day.replace(day=1), time.min))
+
+
+def _next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def cutoff(months=None, now=None):
+    """Start of the oldest month kept in StockMovement"""
+    months = settings.STOCK_MOVEMENT_ARCHIVE_MONTHS if months is None else months
+    day = timezone.localdate(now or timezone.now()).replace(day=1)
+    for _ in range(months):
+        day = (day - timedelta(days=1)).replace(day=1)
+    return _month_start(day)
+
+
+def boundary():
+    """End of the newest archived month (None if nothing is archived)"""
+    newest = ArchivedMovementMonth.objects.order_by('-month').values_list('month', flat=True).first()
+    return _month_start(_next_month(newest)) if newest else None
+
+
+# --- Writing -----------------------------------------------------------------
+
+def archive_movements(months=None, now=None):
+    """Archive every whole month older than cutoff(months); returns the new ArchivedMovementMonths"""
+    end = cutoff(months, now)
+    archived = []
+    while True:
+        oldest = StockMovement.objects.filter(created_at__lt=end).order_by('created_at', 'id').first()
+        if oldest is None:
+            return archived
+        archived.append(archive_month(timezone.localdate(oldest.created_at).replace(day=1)))
+
+
+def _encode(row):
+    row = dict(zip(FIELDS, row))
+    row['created_at'] = row['created_at'].isoformat()
+    return (json.dumps(row, ensure_ascii=False, separators=(',', ':')) + '\n').encode()
+
+
+def _count_key(product_id, movement_type):
+    return f'{product_id}:{movement_type}'
+
+
+def archive_month(month):
+    """Move the movements of month (its first day) to an archive file"""
+    start, end = _month_start(month), _month_start(_next_month(month))
+    if ArchivedMovementMonth.objects.filter(month=month).exists():
+        raise ValueError(f'Le mois {month:%Y-%m} est déjà archivé')
+
+    # Balances at the end of the month, while its movements are still here
+    ledger.take_snapshots(end)
+
+    movements = StockMovement.objects.filter(created_at__gte=start, created_at__lt=end)
+    written, counts = [], Counter()
+    with tempfile.TemporaryFile() as buffer:
+        with gzip.GzipFile(fileobj=buffer, mode='wb') as out:
+            for row in movements.order_by('-created_at', '-id').values_list(*FIELDS).iterator(chunk_size=2000):
+                out.write(_encode(row))
+                written.append(row[_ID])
+                counts[_count_key(row[_PRODUCT], row[_TYPE])] += 1
+        buffer.seek(0)
+        archived = ArchivedMovementMonth(month=month, row_count=len(written), counts=dict(counts))
+        try:
+            with transaction.atomic():
+                archived.file.save(f'movements_{month:%Y_%m}.jsonl.gz', File(buffer), save=False)
+                archived.save()
+                # Only the rows in the file: movements added meanwhile stay.
+                # StockMovement has no delete signal and nothing refers to
+                # it, so each batch is a single DELETE
+                for batch_start in range(0, len(written), DELETE_BATCH):
+                    StockMovement.objects.filter(pk__in=written[batch_start:batch_start + DELETE_BATCH]).delete()
+                fragments.bump('stock')
+        except Exception:
+            if archived.file:
+                archived.file.delete(save=False)
+            raise
+    return archived
+
+
+# --- Reading -----------------------------------------------------------------
+
+def _stream(archived):
+    """Rows of an archived month, parsed one line at a time, newest first"""
+    with archived.file.open('rb') as raw, gzip.open(raw, 'rt', encoding='utf-8') as lines:
+        for line in lines:
+            row = json.loads(line)
+            row['created_at'] = datetime.fromisoformat(row['created_at'])
+            yield row
+
+
+def _month_rows(archived, start, end, product_id, movement_type):
+    """Rows of one archived month created in [start, end), newest first"""
+    for row in _stream(archived):
+        if end is not None and row['created_at'] >= end:
+            continue
+        if start is not None and row['created_at'] < start:
+            break  # the rest of the file is older still
+        if product_id is not None and row['product_id'] != product_id:
+            continue
+        if movement_type and row['movement_type'] != movement_type:
+            continue
+        yield row
+
+
+def _months(start, end, descending):
+    months = ArchivedMovementMonth.objects.order_by('-month' if descending else 'month')
+    if start is not None:
+        months = months.filter(month__gte=timezone.localdate(start).replace(day=1))
+    if end is not None:
+        months = months.filter(month__lte=timezone.localdate(end).replace(day=1))
+    return months
+
+
+def archived_rows(start=None, end=None, product_id=None, movement_type=None, descending=True):
+    """Archived movements (dicts keyed by FIELDS) created in [start, end), newest first by default.
+
+    The files are read as they are iterated. Oldest first, only the matching
+    rows of the month being read are held, since a file is written newest first.
+    """
+    product_id = int(product_id) if product_id not in (None, '') else None
+    for archived in _months(start, end, descending):
+        rows = _month_rows(archived, start, end, product_id, movement_type)
+        yield from (rows if descending else reversed(list(rows)))
+
+
+def needed(start=None, end=None):
+    """Whether a date range [start, end) reaches archived months; an open range does not"""
+    if start is None and end is None:
+        return False
+    limit = boundary()
+    return limit is not None and (start is None or start < limit)
+
+
+def export_rows(params, lookups, start=None, end=None, descending=True):
+    """Archive hook of the movements exports (see core_app.exporters)"""
+    if not needed(start, end):
+        return
+    for row in archived_rows(start, end, params.get('product'), params.get('type'), descending):
+        # Months archived before locations existed have no location columns
+        yield tuple(row.get(lookup) for lookup in lookups)
+
+
+def ledger_rows(after, at, product_ids=None):
+    """ledger.FIELDS tuples of the archived movements in (after, at], oldest first.
+
+    Empty when the range lies after the archive, which is always the case
+    for ranges starting at a snapshot taken since the last archival.
+    """
+    if product_ids is not None and not product_ids:
+        return []
+    limit = boundary()
+    if limit is None or (after is not None and after >= limit):
+        return []
+    product_ids = set(product_ids) if product_ids is not None else None
+    return [
+        (row['product_id'], row.get('location_id'), row.get('to_location_id'), row['movement_type'], row['quantity'])
+        for row in archived_rows(after, at + timedelta(microseconds=1), descending=False)
+        if row['created_at'] <= at and (after is None or row['created_at'] > after)
+        and (product_ids is None or row['product_id'] in product_ids)
+    ]
+
+
+class _ArchivedUser:
+    def __init__(self, username, first_name, last_name):
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+
+    def get_full_name(self):
+        return f'{self.first_name} {self.last_name}'.strip()
+
+
+class _ArchivedLocation:
+    def __init__(self, pk, code):
+        self.pk = self.id = pk
+        self.code = code
+
+    def __str__(self):
+        return self.code
+
+
+class _ArchivedProduct:
+    def __init__(self, pk, name, sku):
+        self.pk = self.id = pk
+        self.name = name
+        self.sku = sku
+
+
+class ArchivedMovement:
+    """An archived movement with the attributes the movement templates use"""
+
+    archived = True
+
+    def __init__(self, row):
+        self.pk = self.id = row['id']
+        self.created_at = row['created_at']
+        self.product_id = row['product_id']
+        self.product = _ArchivedProduct(row['product_id'], row['product__name'], row['product__sku'])
+        self.movement_type = row['movement_type']
+        self.quantity = row['quantity']
+        self.reference = row['reference']
+        self.notes = row['notes']
+        self.location = _ArchivedLocation(row['location_id'], row['location__code']) if row.get('location_id') else None
+        self.to_location = (
+            _ArchivedLocation(row['to_location_id'], row['to_location__code']) if row.get('to_location_id') else None
+        )
+        self.created_by = _ArchivedUser(
+            row['created_by__username'], row['created_by__first_name'], row['created_by__last_name'],
+        )
+
+    def get_movement_type_display(self):
+        return dict(StockMovement.MOVEMENT_TYPES).get(self.movement_type, self.movement_type)
+
+
+class MovementArchive:
+    """Archived rows continuing a ('-created_at', '-id') movements list.
+
+    Passed as the tail of core_app.pagination.CursorPaginator.
+    """
+
+    def __init__(self, start=None, end=None, product_id=None, movement_type=None):
+        self.filters = (start, end, product_id, movement_type)
+        self.limit = boundary()
+
+    def rows(self, key, forward, limit):
+        """Up to limit rows after key (before it if not forward), nearest first"""
+        start, end, product_id, movement_type = self.filters
+        key = tuple(key) if key is not None else None
+        if forward:
+            rows = archived_rows(start, end, product_id, movement_type)
+            if key is not None:
+                rows = (row for row in rows if (row['created_at'], row['id']) < key)
+            result = []
+            for row in rows:
+                result.append(ArchivedMovement(row))
+                if len(result) >= limit:
+                    break
+            return result
+
+        if key is not None and self.limit is not None and key[0] >= self.limit:
+            return []  # key is in the table, after every archived row
+        # Oldest first from key: each month is read newest first down to key,
+        # keeping only the rows nearest to it that can still fit
+        if key is not None:
+            start = key[0] if start is None else max(start, key[0])
+        product_id = int(product_id) if product_id not in (None, '') else None
+        result = []
+        for archived in _months(start, end, descending=False):
+            nearest = deque(maxlen=limit - len(result))
+            for row in _month_rows(archived, start, end, product_id, movement_type):
+                if key is not None and (row['created_at'], row['id']) <= key:
+                    break
+                nearest.append(row)
+            result.extend(ArchivedMovement(row) for row in reversed(nearest))
+            if len(result) >= limit:
+                break
+        return result
+
+    def count(self):
+        """Number of rows, from the manifests' counts for the months wholly in range"""
+        start, end, product_id, movement_type = self.filters
+        product_id = str(int(product_id)) if product_id not in (None, '') else None
+        total = 0
+        for archived in _months(start, end, descending=False).only('month', 'row_count', 'counts'):
+            month_start, month_end = _month_start(archived.month), _month_start(_next_month(archived.month))
+            whole = (start is None or start <= month_start) and (end is None or end >= month_end)
+            # Months archived before counts were kept have none
+            if whole and (archived.counts or not archived.row_count):
+                total += sum(
+                    number for key, number in archived.counts.items()
+                    if (product_id is None or key.split(':')[0] == product_id)
+                    and (not movement_type or key.split(':')[1] == movement_type)
+                )
+            else:
+                total += sum(1 for _ in archived_rows(
+                    max(start, month_start) if start is not None else month_start,
+                    min(end, month_end) if end is not None else month_end,
+                    product_id, movement_type,
+                ))
+        return total
@@ -0,0 +1,174 @@
+"""
+Bulk stock movement entry.
+
+Lines come from pasted text, a CSV upload or a JSON body and are parsed
+into BulkLine tuples. apply_bulk() resolves every SKU with one query, checks
+all lines against the current stock levels with one more (reporting every
+line that would go negative, not just the first), then posts them through
+apply_movements(): one transaction, one bulk_create of the movements, all
+sharing the same reference.
+"""
+
+import codecs
+import csv
+import re
+from dataclasses import dataclass, field
+from typing import NamedTuple
+
+from django.utils import timezone
+
+from products_app.models import Product
+from .models import Location, LocationStock, StockMovement
+from .services import InsufficientStock, MovementLine, apply_movements, resulting_stock
+
+MAX_LINES = 5000
+MOVEMENT_TYPES = dict(StockMovement.MOVEMENT_TYPES)
+
+_SEPARATORS = re.compile(r'[;,\t]|\s+')
+
+
+class BulkLine(NamedTuple):
+    line_num: int
+    sku: str
+    movement_type: str
+    quantity: int
+
+
+@dataclass
+class BulkResult:
+    reference: str = ''
+    movements: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+
+    @property
+    def ok(self):
+        return not self.errors
+
+
+def _line(line_num, sku, quantity, movement_type, default_type):
+    """Validated BulkLine, raising ValueError with a user-facing message"""
+    # JSON bodies may hold numbers (or anything else) where text is expected
+    if sku is not None and not isinstance(sku, str):
+        raise ValueError(f'SKU invalide: {sku!r}')
+    sku = (sku or '').strip()
+    if not sku:
+        raise ValueError('SKU manquant')
+    movement_type = movement_type or default_type or ''
+    if not isinstance(movement_type, str):
+        raise ValueError(f'Type de mouvement invalide: {movement_type!r}')
+    movement_type = movement_type.strip().upper()
+    if movement_type not in MOVEMENT_TYPES:
+        raise ValueError(f'Type de mouvement invalide: {movement_type!r}')
+    try:
+        quantity = int(str(quantity).strip())
+    except (TypeError, ValueError):
+        raise ValueError(f'Quantité invalide: {quantity!r}')
+    if quantity < 1:
+        raise ValueError(f'La quantité doit être positive: {quantity}')
+    return BulkLine(line_num, sku, movement_type, quantity)
+
+
+def _collect(rows, default_type):
+    """Parse (line_num, sku, quantity, type) tuples into (lines, errors)"""
+    lines, errors = [], []
+    for line_num, sku, quantity, movement_type in rows:
+        if len(lines) + len(errors) >= MAX_LINES:
+            errors.append(f'Trop de lignes (maximum {MAX_LINES})')
+            break
+        try:
+            lines.append(_line(line_num, sku, quantity, movement_type, default_type))
+        except ValueError as e:
+            errors.append(f'Ligne {line_num}: {e}')
+    return lines, errors
+
+
+def parse_text(text, default_type='IN'):
+    """Pasted lines of "SKU quantity [type]", separated by spaces, tabs, commas or semicolons"""
+    def rows():
+        for line_num, line in enumerate(text.splitlines(), start=1):
+            parts = [part for part in _SEPARATORS.split(line.strip()) if part]
+            if not parts:
+                continue
+            yield line_num, parts[0], parts[1] if len(parts) > 1 else None, parts[2] if len(parts) > 2 else None
+    return _collect(rows(), default_type)
+
+
+def parse_csv(csv_file, default_type='IN'):
+    """CSV upload with SKU and Quantity columns, and an optional Type column"""
+    reader = csv.DictReader(codecs.iterdecode(csv_file, 'utf-8-sig'))
+    if not reader.fieldnames or not {'SKU', 'Quantity'} <= set(reader.fieldnames):
+        return [], ['Colonnes SKU et Quantity requises']
+    return _collect(
+        ((row_num, row.get('SKU'), row.get('Quantity'), row.get('Type')) for row_num, row in enumerate(reader, start=2)),
+        default_type,
+    )
+
+
+def parse_json(data, default_type='IN'):
+    """{"lines": [{"sku", "quantity", "movement_type"?}, ...]} as decoded JSON"""
+    items = data.get('lines') if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        return [], ['Le corps doit contenir une liste "lines"']
+    return _collect(
+        (
+            (index, item.get('sku'), item.get('quantity'), item.get('movement_type'))
+            if isinstance(item, dict) else (index, None, None, None)
+            for index, item in enumerate(items, start=1)
+        ),
+        data.get('movement_type') or default_type,
+    )
+
+
+def _check_stock(lines, products, location):
+    """Errors for every line that would take the stock at location below zero, in one query"""
+    stock = dict(
+        LocationStock.objects.filter(product_id__in=[product.pk for product in products.values()], location=location)
+        .values_list('product_id', 'quantity')
+    )
+    errors = []
+    for line in lines:
+        product = products[line.sku]
+        available = stock.get(product.pk, 0)
+        new_stock = resulting_stock(available, line.movement_type, line.quantity)
+        if new_stock < 0:
+            errors.append(
+                f'Ligne {line.line_num}: stock insuffisant pour {product.name}. '
+                f'Disponible: {available}, Demandé: {line.quantity}'
+            )
+            continue
+        stock[product.pk] = new_stock
+    return errors
+
+
+def apply_bulk(lines, user, reference='', notes='', location=None):
+    """Post lines as one receipt at location (default: the default location);
+    nothing is written if any line is invalid"""
+    reference = reference or f'LOT-{timezone.localtime():%Y%m%d-%H%M%S}'
+    result = BulkResult(reference=reference)
+    if not lines:
+        result.errors.append('Aucune ligne à enregistrer')
+        return result
+
+    products = Product.objects.in_bulk({line.sku for line in lines}, field_name='sku')
+    result.errors = [
+        f'Ligne {line.line_num}: SKU inconnu: {line.sku}' for line in lines if line.sku not in products
+    ]
+    if any(line.movement_type == 'TRANSFER' for line in lines):
+        result.errors.append('Les transferts se saisissent un par un')
+    location = location or Location.default()
+    if not result.errors:
+        result.errors = _check_stock(lines, products, location)
+    if result.errors:
+        return result
+
+    try:
+        result.movements = apply_movements(
+            [MovementLine(products[line.sku], line.movement_type, line.quantity, location) for line in lines],
+            user,
+            reference=reference,
+            notes=notes,
+        )
+    except InsufficientStock as e:
+        # Stock changed between the check and the locked update
+        result.errors.append(str(e))
+    return result
@@ -0,0 +1,130 @@
+"""
+Incrementally maintained inventory totals.
+
+Code that changes stock captures the StockState of the rows it touches before
+and after the change and passes the difference to record(), inside the same
+transaction. rebuild() recomputes everything from scratch and is used to seed
+the row and to repair drift (see the rebuild_stock_counters command).
+"""
+
+from dataclasses import asdict, dataclass, fields
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.utils import timezone
+
+from products_app.models import Product
+from .models import InventoryTotals
+
+TOTALS_PK = 1
+
+
+@dataclass(frozen=True)
+class StockState:
+    total_products: int = 0
+    active_products: int = 0
+    total_units: int = 0
+    total_stock_value: Decimal = Decimal('0.00')
+    low_stock_count: int = 0
+    out_of_stock_count: int = 0
+    in_stock_count: int = 0
+
+    def __add__(self, other):
+        return StockState(*(getattr(self, f.name) + getattr(other, f.name) for f in fields(self)))
+
+    def __sub__(self, other):
+        return StockState(*(getattr(self, f.name) - getattr(other, f.name) for f in fields(self)))
+
+    def __neg__(self):
+        return StockState() - self
+
+    def __bool__(self):
+        return any(getattr(self, f.name) for f in fields(self))
+
+
+EMPTY = StockState()
+
+
+def level_state(current_stock, minimum_stock, price):
+    """Contribution of one StockLevel row to the totals"""
+    return StockState(
+        total_units=current_stock,
+        total_stock_value=current_stock * price,
+        low_stock_count=int(0 < current_stock <= minimum_stock),
+        out_of_stock_count=int(current_stock == 0),
+        in_stock_count=int(current_stock > minimum_stock),
+    )
+
+
+def product_state(is_active):
+    """Contribution of one Product row to the totals"""
+    return StockState(total_products=1, active_products=int(is_active))
+
+
+def record(delta):
+    """Apply a StockState difference to the stored totals.
+
+    Must be called after the change has been written: if the totals row does
+    not exist yet it is rebuilt from the current data instead.
+    """
+    if not delta:
+        return
+    changes = {
+        name: F(name) + value
+        for name, value in asdict(delta).items() if value
+    }
+    updated = InventoryTotals.objects.filter(pk=TOTALS_PK).update(
+        updated_at=timezone.now(), **changes
+    )
+    if not updated:
+        rebuild()
+
+
+def compute():
+    """Full recompute of the totals with one aggregate query"""
+    stock = F('stock_level__current_stock')
+    totals = Product.objects.order_by().aggregate(
+        total_products=Count('id'),
+        active_products=Count('id', filter=Q(is_active=True)),
+        total_units=Sum(stock),
+        total_stock_value=Sum(ExpressionWrapper(
+            stock * F('price'),
+            output_field=DecimalField(max_digits=20, decimal_places=2),
+        )),
+        low_stock_count=Count('id', filter=Q(
+            stock_level__current_stock__gt=0,
+            stock_level__current_stock__lte=F('stock_level__minimum_stock'),
+        )),
+        out_of_stock_count=Count('id', filter=Q(stock_level__current_stock=0)),
+        in_stock_count=Count('id', filter=Q(stock_level__current_stock__gt=F('stock_level__minimum_stock'))),
+    )
+    totals['total_units'] = totals['total_units'] or 0
+    totals['total_stock_value'] = totals['total_stock_value'] or Decimal('0.00')
+    return StockState(**totals)
+
+
+def rebuild():
+    totals, _ = InventoryTotals.objects.update_or_create(
+        pk=TOTALS_PK, defaults=asdict(compute())
+    )
+    return totals
+
+
+def current():
+    """Stored totals, seeded from a full recompute on first use"""
+    totals = InventoryTotals.objects.filter(pk=TOTALS_PK).first()
+    return totals or rebuild()
+
+
+def stored_state(totals):
+    return StockState(**{f.name: getattr(totals, f.name) for f in fields(StockState)})
+
+
+def verify():
+    """Return {field: (stored, expected)} for every counter that has drifted"""
+    stored = asdict(stored_state(current()))
+    expected = asdict(compute())
+    return {
+        name: (stored[name], expected[name])
+        for name in expected if stored[name] != expected[name]
+    }
@@ -0,0 +1,232 @@
+"""
+Physical stock counts (cycle counts).
+
+open_count() freezes the stock of the products in scope at one location
+into StockCountLine rows. Counters then send what they find to record_counts(): each call only
+appends StockCountEntry rows with one bulk insert, so any number of scanners
+can count at once, and counts of the same product add up (a reference found
+on several shelves, or scanned one unit at a time).
+
+close_count() totals the entries per product, compares them with the frozen
+stock and posts only the differences, as IN / OUT movements through
+apply_movements(), in one transaction, at the count's location. The
+difference is applied to the stock at closing time, so sales and receipts made while the count ran are
+kept, and the ledger records the actual gain or loss rather than an
+ADJUSTMENT to an absolute quantity.
+"""
+
+import re
+from typing import NamedTuple
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from products_app.models import Product
+from .models import Location, LocationStock, StockCount, StockCountEntry, StockCountLine
+from .services import MovementLine, apply_movements
+
+ID_BATCH = 500
+# Lines per apply_movements() call, all within the closing transaction
+APPLY_BATCH = 5000
+MAX_LINES = 50000
+
+_SEPARATORS = re.compile(r'[;,\t]|\s+')
+
+
+class CountClosed(ValueError):
+    pass
+
+
+class CountLine(NamedTuple):
+    line_num: int
+    sku: str
+    quantity: int
+
+
+def _batches(items, size=ID_BATCH):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _collect(rows):
+    """Parse (line_num, sku, quantity) tuples into (lines, errors); no quantity counts one unit"""
+    lines, errors = [], []
+    for line_num, sku, quantity in rows:
+        if len(lines) + len(errors) >= MAX_LINES:
+            errors.append(f'Trop de lignes (maximum {MAX_LINES})')
+            break
+        sku = (sku or '').strip() if isinstance(sku, str) else ''
+        if not sku:
+            errors.append(f'Ligne {line_num}: SKU manquant')
+            continue
+        try:
+            quantity = 1 if quantity in (None, '') else int(str(quantity).strip())
+        except ValueError:
+            errors.append(f'Ligne {line_num}: Quantité invalide: {quantity!r}')
+            continue
+        if quantity < 0:
+            errors.append(f'Ligne {line_num}: La quantité ne peut pas être négative: {quantity}')
+            continue
+        lines.append(CountLine(line_num, sku, quantity))
+    return lines, errors
+
+
+def parse_text(text):
+    """Pasted or scanned lines of "SKU [quantity]" """
+    def rows():
+        for line_num, line in enumerate(text.splitlines(), start=1):
+            parts = [part for part in _SEPARATORS.split(line.strip()) if part]
+            if parts:
+                yield line_num, parts[0], parts[1] if len(parts) > 1 else None
+    return _collect(rows())
+
+
+def parse_json(data):
+    """{"counts": [{"sku", "quantity"?}, ...]} as decoded JSON"""
+    items = data.get('counts') if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        return [], ['Le corps doit contenir une liste "counts"']
+    return _collect(
+        (index, item.get('sku'), item.get('quantity')) if isinstance(item, dict) else (index, None, None)
+        for index, item in enumerate(items, start=1)
+    )
+
+
+@transaction.atomic
+def open_count(user, category=None, reference='', notes='', location=None):
+    """Open a count of the active products (of category, if given) at location
+    (default: the default location), freezing their stock there"""
+    count = StockCount.objects.create(
+        reference=reference or f'INV-{timezone.localtime():%Y%m%d-%H%M%S}',
+        category=category,
+        location=location or Location.default(),
+        notes=notes,
+        opened_by=user,
+    )
+    products = Product.objects.filter(is_active=True)
+    if category is not None:
+        products = products.filter(category=category)
+    products = products.annotate(stock=Subquery(
+        LocationStock.objects.filter(product=OuterRef('pk'), location=count.location).values('quantity')[:1]
+    ))
+    lines = StockCountLine.objects.bulk_create(
+        [
+            StockCountLine(count=count, product_id=product_id, expected_stock=stock or 0)
+            for product_id, stock in products.values_list('id', 'stock').iterator(chunk_size=2000)
+        ],
+        batch_size=1000,
+    )
+    count.line_count = len(lines)
+    count.save(update_fields=['line_count'])
+    return count
+
+
+def record_counts(count, lines, user):
+    """Add counted quantities (CountLines) to an open count; returns the errors, nothing is saved if any"""
+    if not lines:
+        return ['Aucune ligne à enregistrer']
+    in_scope = {}
+    for batch in _batches({line.sku for line in lines}):
+        in_scope.update(count.lines.filter(product__sku__in=batch).values_list('product__sku', 'product_id'))
+    errors = [
+        f'Ligne {line.line_num}: SKU inconnu ou hors inventaire: {line.sku}'
+        for line in lines if line.sku not in in_scope
+    ]
+    if errors:
+        return errors
+
+    with transaction.atomic():
+        # The UPDATE fails once the count is closed, and takes the write lock
+        # before the insert (see services._lock_stock_levels)
+        if not StockCount.objects.filter(pk=count.pk, status='OPEN').update(last_count_at=timezone.now()):
+            return ["L'inventaire n'est plus ouvert"]
+        StockCountEntry.objects.bulk_create(
+            [
+                StockCountEntry(count=count, product_id=in_scope[line.sku], quantity=line.quantity, counted_by=user)
+                for line in lines
+            ],
+            batch_size=1000,
+        )
+    return []
+
+
+def counted_totals(count):
+    """{product_id: total counted} over the entries of count"""
+    return dict(
+        count.entries.order_by().values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total')
+    )
+
+
+def differences(count, uncounted_as_zero=False, counted=None):
+    """{product_id: counted - frozen stock} for the products where they differ.
+
+    Products without any entry are left out, or counted as zero with
+    uncounted_as_zero. counted defaults to counted_totals(count).
+    """
+    counted = counted_totals(count) if counted is None else counted
+    result = {}
+    for product_id, expected in count.lines.values_list('product_id', 'expected_stock').iterator(chunk_size=2000):
+        total = counted.get(product_id)
+        if total is None:
+            if not uncounted_as_zero:
+                continue
+            total = 0
+        if total != expected:
+            result[product_id] = total - expected
+    return result
+
+
+def _finish(count, user, status):
+    """Move count out of OPEN; raises CountClosed if it already was"""
+    now = timezone.now()
+    finished = StockCount.objects.filter(pk=count.pk, status='OPEN').update(
+        status=status, closed_by=user, closed_at=now,
+    )
+    if not finished:
+        raise CountClosed("L'inventaire n'est plus ouvert")
+    count.status, count.closed_by, count.closed_at = status, user, now
+
+
+@transaction.atomic
+def close_count(count, user, uncounted_as_zero=False):
+    """Close count and post the differences as movements; returns the movements.
+
+    A loss larger than the stock left at closing time (sold while the count
+    ran) is capped at that stock.
+    """
+    # First, so that no count can be added while the differences are computed
+    _finish(count, user, 'CLOSED')
+    diffs = differences(count, uncounted_as_zero)
+
+    location = count.location or Location.default()
+    products = Product.objects.in_bulk(list(diffs))
+    current = {}
+    for batch in _batches(diffs):
+        current.update(
+            LocationStock.objects.select_for_update().filter(product_id__in=batch, location=location)
+            .values_list('product_id', 'quantity')
+        )
+    lines = []
+    for product_id, diff in diffs.items():
+        if diff > 0:
+            lines.append(MovementLine(products[product_id], 'IN', diff, location))
+            continue
+        quantity = min(-diff, current.get(product_id, 0))
+        if quantity:
+            lines.append(MovementLine(products[product_id], 'OUT', quantity, location))
+
+    movements = []
+    notes = f'Inventaire {count.reference}'
+    for batch in _batches(lines, APPLY_BATCH):
+        movements += apply_movements(batch, user, reference=count.reference, notes=notes)
+    count.movement_count = len(movements)
+    count.save(update_fields=['movement_count'])
+    return movements
+
+
+@transaction.atomic
+def cancel_count(count, user):
+    """Abandon count without touching the stock"""
+    _finish(count, user, 'CANCELLED')
@@ -0,0 +1,144 @@
+"""CSV exports, shared by the download views and the background job runner"""
+
+from functools import partial
+
+from django.db.models import F
+
+from core_app.columnar import ColumnarExport
+from core_app.exporters import CsvExport, user_display, user_fields
+from products_app import search
+from . import archive
+from .analytics import LOW_COVER_DAYS
+from .models import ProductMetrics, StockLevel, StockMovement
+
+
+def _search(queryset, query):
+    """Every row whose product matches query, with the product search (see products_app.search)"""
+    matches = search.search_queryset(queryset.only('product_id'), query, product_field='product_id', limit=None)
+    return queryset.filter(product_id__in=[match.product_id for match in matches])
+
+
+def _status(stock_levels, status):
+    if status == 'low':
+        return stock_levels.filter(current_stock__lte=F('minimum_stock'))
+    if status == 'out':
+        return stock_levels.filter(current_stock=0)
+    return stock_levels
+
+
+def filter_abc_class(queryset, abc_class, prefix='product__metrics__'):
+    """Filter on the ABC class of the inventory metrics"""
+    return queryset.filter(**{f'{prefix}abc_class': abc_class})
+
+
+def filter_analysis(queryset, analysis, prefix='product__metrics__'):
+    """Filter on the inventory metrics: dead stock, or stock running out soon"""
+    if analysis == 'dead':
+        return queryset.filter(**{f'{prefix}is_dead_stock': True})
+    if analysis == 'cover':
+        return queryset.filter(**{f'{prefix}days_of_cover__lte': LOW_COVER_DAYS})
+    return queryset
+
+
+def _stock_status(current_stock, minimum_stock):
+    """Same labels as StockLevel.stock_status"""
+    if current_stock == 0:
+        return 'Rupture de stock'
+    if current_stock <= minimum_stock:
+        return 'Stock faible'
+    return 'En stock'
+
+
+STOCK_EXPORT = CsvExport(
+    filename='stock_levels',
+    header=['Product', 'SKU', 'Current Stock', 'Minimum Stock', 'Maximum Stock', 'Status'],
+    get_queryset=StockLevel.objects.all,
+    fields=('product__name', 'product__sku', 'current_stock', 'minimum_stock', 'maximum_stock'),
+    format_row=lambda name, sku, current, minimum, maximum: [
+        name, sku, current, minimum, maximum, _stock_status(current, minimum),
+    ],
+    # Search last, so the product search is restricted to the filtered rows
+    filters={'status': _status, 'abc': filter_abc_class, 'analysis': filter_analysis, 'search': _search},
+)
+
+
+def _optional(value, digits):
+    return '' if value is None else round(value, digits)
+
+
+METRICS_EXPORT = CsvExport(
+    filename='inventory_metrics',
+    header=[
+        'Product', 'SKU', 'ABC Class', 'Units Sold', 'Revenue', 'Average Stock', 'Turnover',
+        'Days of Cover', 'Last Out', 'Dead Stock', 'Period (days)', 'Computed At',
+    ],
+    get_queryset=ProductMetrics.objects.all,
+    fields=(
+        'product__name', 'product__sku', 'abc_class', 'units_sold', 'revenue', 'average_stock', 'turnover',
+        'days_of_cover', 'last_out_at', 'is_dead_stock', 'period_days', 'computed_at',
+    ),
+    format_row=lambda name, sku, abc, units, revenue, average, turnover, cover, last_out, dead, days, computed: [
+        name, sku, abc, units, revenue, round(average, 1), _optional(turnover, 2), _optional(cover, 1),
+        last_out.strftime('%Y-%m-%d') if last_out else '', 'Oui' if dead else 'Non', days,
+        computed.strftime('%Y-%m-%d %H:%M'),
+    ],
+    filters={
+        'abc': partial(filter_abc_class, prefix=''),
+        'analysis': partial(filter_analysis, prefix=''),
+        'search': _search,
+    },
+)
+
+MOVEMENT_TYPES = dict(StockMovement.MOVEMENT_TYPES)
+
+
+def _movement_row(created_at, product, movement_type, quantity, reference, first_name, last_name, username, notes):
+    return [
+        created_at.strftime('%Y-%m-%d %H:%M'),
+        product,
+        MOVEMENT_TYPES.get(movement_type, movement_type),
+        quantity,
+        reference or '',
+        user_display(first_name, last_name, username),
+        notes or '',
+    ]
+
+
+MOVEMENTS_EXPORT = CsvExport(
+    filename='stock_movements',
+    header=['Date', 'Product', 'Type', 'Quantity', 'Reference', 'Created By', 'Notes'],
+    get_queryset=StockMovement.objects.all,
+    fields=(
+        'created_at', 'product__name', 'movement_type', 'quantity', 'reference',
+        *user_fields('created_by'), 'notes',
+    ),
+    format_row=_movement_row,
+    date_field='created_at',
+    filters={'product': 'product_id', 'type': 'movement_type'},
+    # Archived months are older than every row left in the table
+    archive=archive.export_rows,
+)
+
+MOVEMENTS_COLUMNAR_EXPORT = ColumnarExport(
+    filename='stock_movements',
+    get_queryset=lambda: StockMovement.objects.order_by('id'),
+    columns=(
+        ('movement_id', 'id'),
+        ('created_at', 'created_at'),
+        ('product_id', 'product_id'),
+        ('sku', 'product__sku'),
+        ('product', 'product__name'),
+        ('category_id', 'product__category_id'),
+        ('category', 'product__category__name'),
+        ('movement_type', 'movement_type'),
+        ('quantity', 'quantity'),
+        ('location', 'location__code'),
+        ('to_location', 'to_location__code'),
+        ('reference', 'reference'),
+        ('created_by', 'created_by__username'),
+    ),
+    date_field='created_at',
+    filters=MOVEMENTS_EXPORT.filters,
+    archive=partial(archive.export_rows, descending=False),
+    archive_first=True,
+)
@@ -0,0 +1,244 @@
+"""
+Demand forecasting and reorder points.
+
+forecast() fits the weekly demand of every product sold over the last
+`weeks` weeks (completed sales, read from the daily sales rollups) and
+turns it into a reorder point and an order-up-to level. apply_levels()
+writes them back to StockLevel as minimum_stock and maximum_stock, which
+stock_alerts and the low-stock counters then use. Products without any
+sale in the period keep the levels typed in.
+
+Products are split into shards of consecutive ids, each forecast by a
+worker of a process pool (in this process with workers=1). A shard reads
+its sales with one query and holds them as one Arrow array per week
+covering all of its products, so each step of the fit below is one
+pyarrow.compute call over the whole shard rather than a loop over
+products:
+
+- a moving average of the last MA_WEEKS weeks and simple exponential
+  smoothing (SES_ALPHA) are both backtested one week ahead; each product
+  keeps the method with the lower mean absolute error, and the standard
+  deviation of that method's errors
+- for products sold a year ago or earlier, the forecast is scaled by a
+  seasonal index: the demand of the coming weeks one year ago relative to
+  that year's average, bounded to [1 / SEASONAL_BOUND, SEASONAL_BOUND]
+
+With d the forecast daily demand, s its standard deviation, L the lead
+time and R the review period in days, and z the normal quantile of the
+service level:
+
+    reorder point = d * L + z * s * sqrt(L)
+    order-up-to level = reorder point + d * R
+"""
+
+import math
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from functools import reduce
+from statistics import NormalDist
+from typing import NamedTuple
+
+import django
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core_app import fragments
+from products_app import catalog
+from sales_app.models import ProductDailySalesRollup
+from . import alerts, counters
+from .models import StockLevel
+from .services import publish_levels
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+DEFAULT_WEEKS = 104
+MA_WEEKS = 8
+SES_ALPHA = 0.3
+SEASON_WEEKS = 52
+SEASONAL_BOUND = 2.0
+SHARD_SIZE = 20000
+WRITE_BATCH = 1000
+
+
+class Shard(NamedTuple):
+    """Work item of one worker: the products with ids in [first_id, last_id]"""
+    first_id: int
+    last_id: int
+    weeks: int
+    today: object
+    lead_time: int
+    review_days: int
+    z: float
+
+
+def _weekly_demand(shard):
+    """(product ids, [units sold per product in each week, oldest week first])"""
+    start = shard.today - timedelta(days=7 * shard.weeks - 1)
+    rows = (
+        ProductDailySalesRollup.objects
+        .filter(product_id__gte=shard.first_id, product_id__lte=shard.last_id, date__gte=start, date__lte=shard.today)
+        .values_list('product_id', 'date', 'units')
+    )
+    product_ids, weeks, units = [], [], []
+    for product_id, date, sold in rows.iterator(chunk_size=5000):
+        product_ids.append(product_id)
+        weeks.append(shard.weeks - 1 - (shard.today - date).days // 7)
+        units.append(sold)
+    table = pa.table({
+        'product_id': pa.array(product_ids, pa.int64()),
+        'week': pa.array(weeks, pa.int64()),
+        'units': pa.array(units, pa.float64()),
+    }).group_by(['product_id', 'week']).aggregate([('units', 'sum')])
+
+    products = pc.unique(table['product_id'])
+    products = pc.take(products, pc.array_sort_indices(products))
+    series = []
+    for week in range(shard.weeks):
+        sold = table.filter(pc.equal(table['week'], week))
+        # Position of each product among the week's rows (null: nothing sold)
+        positions = pc.index_in(products, value_set=sold['product_id'].combine_chunks())
+        series.append(pc.fill_null(pc.take(sold['units_sum'].combine_chunks(), positions), 0.0))
+    return products, series
+
+
+def _total(arrays):
+    return reduce(pc.add, arrays)
+
+
+def _fit(series, horizon):
+    """(weekly demand forecast, standard deviation of the weekly demand) of each product"""
+    zero = pc.multiply(series[0], 0.0)
+    level, window = series[0], series[0]
+    ses_abs = ses_squares = ma_abs = ma_squares = zero
+    for week in range(1, len(series)):
+        sold = series[week]
+        error = pc.subtract(sold, level)
+        ses_abs, ses_squares = pc.add(ses_abs, pc.abs(error)), pc.add(ses_squares, pc.multiply(error, error))
+        level = pc.add(level, pc.multiply(error, SES_ALPHA))
+
+        error = pc.subtract(sold, pc.divide(window, float(min(week, MA_WEEKS))))
+        ma_abs, ma_squares = pc.add(ma_abs, pc.abs(error)), pc.add(ma_squares, pc.multiply(error, error))
+        window = pc.add(window, sold)
+        if week >= MA_WEEKS:
+            window = pc.subtract(window, series[week - MA_WEEKS])
+
+    use_ma = pc.less(ma_abs, ses_abs)
+    demand = pc.if_else(use_ma, pc.divide(window, float(min(len(series), MA_WEEKS))), level)
+    deviation = pc.sqrt(pc.divide(pc.if_else(use_ma, ma_squares, ses_squares), float(len(series) - 1)))
+
+    if len(series) >= SEASON_WEEKS:
+        year = series[-SEASON_WEEKS:]
+        year_average = pc.divide(_total(year), float(SEASON_WEEKS))
+        ahead = pc.divide(_total(series[-SEASON_WEEKS + 1:][:horizon]), float(horizon))
+        index = pc.if_else(pc.greater(year_average, 0.0), pc.divide(ahead, year_average), 1.0)
+        index = pc.max_element_wise(pc.min_element_wise(index, SEASONAL_BOUND), 1 / SEASONAL_BOUND)
+        # Products first sold less than a year ago have nothing to compare with
+        full_year = pc.greater(_total(series[:len(series) - SEASON_WEEKS + 1]), 0.0)
+        index = pc.if_else(full_year, index, 1.0)
+        demand = pc.multiply(demand, index)
+    return demand, deviation
+
+
+def _forecast_shard(shard):
+    """[(product_id, reorder point, order-up-to level)] for the products of shard"""
+    products, series = _weekly_demand(shard)
+    if not len(products):
+        return []
+    horizon = min(max(math.ceil((shard.lead_time + shard.review_days) / 7), 1), SEASON_WEEKS)
+    weekly, weekly_deviation = _fit(series, horizon)
+
+    daily = pc.divide(weekly, 7.0)
+    deviation = pc.divide(weekly_deviation, math.sqrt(7))
+    reorder_point = pc.add(
+        pc.multiply(daily, float(shard.lead_time)),
+        pc.multiply(deviation, shard.z * math.sqrt(shard.lead_time)),
+    )
+    minimum = pc.cast(pc.ceil(reorder_point), pa.int64())
+    maximum = pc.cast(pc.ceil(pc.add(reorder_point, pc.multiply(daily, float(shard.review_days)))), pa.int64())
+    maximum = pc.max_element_wise(maximum, pc.add(minimum, 1))
+    return list(zip(products.to_pylist(), minimum.to_pylist(), maximum.to_pylist()))
+
+
+def _shards(product_ids, size):
+    for start in range(0, len(product_ids), size):
+        batch = product_ids[start:start + size]
+        yield batch[0], batch[-1]
+
+
+def forecast(weeks=DEFAULT_WEEKS, lead_time=None, review_days=None, service_level=None, workers=1, today=None):
+    """{product_id: (reorder point, order-up-to level)} of every product sold in the last weeks weeks.
+
+    lead_time, review_days and service_level default to the STOCK_LEAD_TIME_DAYS,
+    STOCK_REVIEW_DAYS and STOCK_SERVICE_LEVEL settings.
+    """
+    if weeks < 2:
+        raise ValueError("Au moins deux semaines d'historique sont nécessaires")
+    today = today or timezone.localdate()
+    lead_time = settings.STOCK_LEAD_TIME_DAYS if lead_time is None else lead_time
+    review_days = settings.STOCK_REVIEW_DAYS if review_days is None else review_days
+    service_level = settings.STOCK_SERVICE_LEVEL if service_level is None else service_level
+    if not 0 < service_level < 1:
+        raise ValueError('Le niveau de service doit être compris entre 0 et 1 (exclus)')
+    z = NormalDist().inv_cdf(service_level)
+
+    product_ids = list(
+        ProductDailySalesRollup.objects
+        .filter(date__gte=today - timedelta(days=7 * weeks - 1), date__lte=today)
+        .order_by('product_id').values_list('product_id', flat=True).distinct()
+    )
+    if not product_ids:
+        return {}
+    size = min(SHARD_SIZE, math.ceil(len(product_ids) / workers))
+    shards = [
+        Shard(first_id, last_id, weeks, today, lead_time, review_days, z)
+        for first_id, last_id in _shards(product_ids, size)
+    ]
+
+    if workers == 1 or len(shards) == 1:
+        results = map(_forecast_shard, shards)
+    else:
+        # Forked workers must open their own connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+            results = list(pool.map(_forecast_shard, shards))
+    return {product_id: (minimum, maximum) for rows in results for product_id, minimum, maximum in rows}
+
+
+def apply_levels(levels):
+    """Write {product_id: (minimum, maximum)} to the stock levels; returns the number changed"""
+    product_ids = sorted(levels)
+    changed, crossings, delta = [], [], counters.EMPTY
+    with transaction.atomic():
+        for start in range(0, len(product_ids), WRITE_BATCH):
+            batch = product_ids[start:start + WRITE_BATCH]
+            # Lock the rows before reading them, as stock_app.services does
+            StockLevel.objects.filter(product_id__in=batch).update(minimum_stock=F('minimum_stock'))
+            rows = (
+                StockLevel.objects.select_for_update().filter(product_id__in=batch)
+                .values_list('pk', 'product_id', 'current_stock', 'minimum_stock', 'maximum_stock', 'product__price')
+            )
+            updates = []
+            for pk, product_id, current, old_minimum, old_maximum, price in rows:
+                minimum, maximum = levels[product_id]
+                if (minimum, maximum) == (old_minimum, old_maximum):
+                    continue
+                level = StockLevel(
+                    pk=pk, product_id=product_id, current_stock=current,
+                    minimum_stock=minimum, maximum_stock=maximum,
+                )
+                updates.append(level)
+                delta += counters.level_state(current, minimum, price) - counters.level_state(current, old_minimum, price)
+                crossings.append((product_id, (current, old_minimum), (current, minimum)))
+                changed.append(level)
+            StockLevel.objects.bulk_update(updates, ['minimum_stock', 'maximum_stock'])
+        counters.record(delta)
+        alerts.record(crossings)
+        if changed:
+            # bulk_update() sends no signals
+            catalog.invalidate_all(StockLevel)
+            fragments.bump('stock')
+            publish_levels(changed)
+    return len(changed)
@@ -1,27 +1,49 @@
 from django import forms
-from .models import StockMovement, StockLevel
-from products_app.models import Product
+from .models import Location, StockMovement, StockLevel
+from products_app.models import Category, Product, Supplier
 
 
 class StockMovementForm(forms.ModelForm):
     class Meta:
         model = StockMovement
-        fields = ['product', 'movement_type', 'quantity', 'reference', 'notes']
+        fields = ['product', 'movement_type', 'quantity', 'location', 'to_location', 'reference', 'notes']
         labels = {
             'product': 'Produit',
             'movement_type': 'Type de mouvement',
             'quantity': 'Quantité',
+            'location': 'Emplacement',
+            'to_location': 'Vers l\'emplacement (transfert)',
             'reference': 'Référence',
             'notes': 'Notes',
         }
         widgets = {
             'product': forms.Select(attrs={'class': 'form-control'}),
             'movement_type': forms.Select(attrs={'class': 'form-control'}),
+            'location': forms.Select(attrs={'class': 'form-control'}),
+            'to_location': forms.Select(attrs={'class': 'form-control'}),
             'quantity': forms.NumberInput(attrs={'class': 'form-control', 'min': '1'}),
             'reference': forms.TextInput(attrs={'class': 'form-control'}),
             'notes': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        locations = Location.objects.filter(is_active=True)
+        # The empty choice is the default location
+        self.fields['location'].queryset = locations.filter(is_default=False)
+        self.fields['location'].empty_label = 'Dépôt principal'
+        self.fields['to_location'].queryset = locations
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('movement_type') == 'TRANSFER':
+            source = cleaned_data.get('location') or Location.default()
+            if cleaned_data.get('to_location') in (None, source):
+                self.add_error('to_location', 'Choisissez un emplacement de destination différent')
+        else:
+            cleaned_data['to_location'] = None
+        return cleaned_data
+
 
 class StockLevelForm(forms.ModelForm):
     class Meta:
@@ -35,3 +57,122 @@ class StockLevelForm(forms.ModelForm):
             'minimum_stock': forms.NumberInput(attrs={'class': 'form-control', 'min': '0'}),
             'maximum_stock': forms.NumberInput(attrs={'class': 'form-control', 'min': '1'}),
         }
+
+
+class BulkMovementForm(forms.Form):
+    movement_type = forms.ChoiceField(
+        choices=StockMovement.MOVEMENT_TYPES,
+        initial='IN',
+        label='Type de mouvement',
+        help_text='Utilisé pour les lignes sans type',
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    location = forms.ModelChoiceField(
+        queryset=Location.objects.filter(is_active=True, is_default=False),
+        required=False,
+        label='Emplacement',
+        empty_label='Dépôt principal',
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    reference = forms.CharField(
+        max_length=100,
+        required=False,
+        label='Référence',
+        help_text='Commune à toutes les lignes (générée si vide)',
+        widget=forms.TextInput(attrs={'class': 'form-control'}),
+    )
+    notes = forms.CharField(
+        required=False,
+        label='Notes',
+        widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 2}),
+    )
+    lines = forms.CharField(
+        required=False,
+        label='Lignes',
+        help_text='Une ligne par produit : SKU quantité [type]',
+        widget=forms.Textarea(attrs={'class': 'form-control font-monospace', 'rows': 12}),
+    )
+    csv_file = forms.FileField(
+        required=False,
+        label='Ou fichier CSV',
+        help_text='Colonnes SKU, Quantity et Type (optionnelle)',
+        widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.csv'}),
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('lines', '').strip() and not cleaned_data.get('csv_file'):
+            raise forms.ValidationError('Saisissez des lignes ou choisissez un fichier CSV')
+        return cleaned_data
+
+
+class StockCountForm(forms.Form):
+    location = forms.ModelChoiceField(
+        queryset=Location.objects.filter(is_active=True, is_default=False),
+        required=False,
+        label='Emplacement',
+        empty_label='Dépôt principal',
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    category = forms.ModelChoiceField(
+        queryset=Category.objects.all(),
+        required=False,
+        label='Catégorie',
+        empty_label='Tous les produits',
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    reference = forms.CharField(
+        max_length=100,
+        required=False,
+        label='Référence',
+        help_text='Reprise sur les mouvements de régularisation (générée si vide)',
+        widget=forms.TextInput(attrs={'class': 'form-control'}),
+    )
+    notes = forms.CharField(
+        required=False,
+        label='Notes',
+        widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 2}),
+    )
+
+
+class CountEntryForm(forms.Form):
+    lines = forms.CharField(
+        label='Comptages',
+        help_text='Une ligne par comptage : SKU [quantité], 1 si la quantité est omise',
+        widget=forms.Textarea(attrs={'class': 'form-control font-monospace', 'rows': 10}),
+    )
+
+
+class PurchaseOrderGenerateForm(forms.Form):
+    group_by = forms.ChoiceField(
+        choices=[('supplier', 'Par fournisseur'), ('category', 'Par catégorie')],
+        label='Regrouper',
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    supplier = forms.ModelChoiceField(
+        queryset=Supplier.objects.all(),
+        required=False,
+        label='Fournisseur',
+        empty_label='Tous les fournisseurs',
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    category = forms.ModelChoiceField(
+        queryset=Category.objects.all(),
+        required=False,
+        label='Catégorie',
+        empty_label='Toutes les catégories',
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    location = forms.ModelChoiceField(
+        queryset=Location.objects.filter(is_active=True, is_default=False),
+        required=False,
+        label='Emplacement de réception',
+        empty_label='Dépôt principal',
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    notes = forms.CharField(
+        required=False,
+        label='Notes',
+        widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 2}),
+    )
+
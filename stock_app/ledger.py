@@ -0,0 +1,185 @@
+"""
+Point-in-time stock from the movement ledger.
+
+StockMovement rows are never updated, so the stock of a product at any time
+is the replay of its movements up to then (resulting_stock() applied in
+created_at, id order). StockSnapshot rows store that replay at period
+boundaries (see the take_stock_snapshots command): stock_at() starts from
+the latest snapshot before the requested time and only replays the
+movements after it, so its cost is bounded by the snapshot interval rather
+than by the age of the ledger.
+
+The replay runs per (product, location), so that an ADJUSTMENT sets the
+stock of its own location and a TRANSFER moves stock between two; product
+totals are the sums. Movements and snapshots without a location belong to
+the default location.
+
+Movements moved to the archive (stock_app.archive) are read back from it
+when a replay starts before the end of the archived months.
+
+reconcile() replays up to now and compares the result with StockLevel.
+"""
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import archive
+from .models import Location, StockLevel, StockMovement, StockSnapshot
+from .services import apply_to_locations
+
+ID_BATCH = 500
+# Columns of a movement as replayed, see _replay()
+FIELDS = ('product_id', 'location_id', 'to_location_id', 'movement_type', 'quantity')
+
+
+def _batches(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), ID_BATCH):
+        yield ids[start:start + ID_BATCH]
+
+
+def _latest_snapshots(at, product_ids=None):
+    """{product_id: (taken_at, {location_id: quantity})} of the latest snapshots at or before at"""
+    default = Location.default().pk
+    snapshots = StockSnapshot.objects.filter(taken_at__lte=at)
+    if product_ids is not None:
+        snapshots = snapshots.filter(product_id__in=product_ids)
+    expected = snapshots.order_by().values('product_id').distinct().count()
+    # Snapshots are taken for every product at once, so the newest date or
+    # two cover all products: look them up date by date, newest first
+    found = {}
+    for taken_at in snapshots.order_by('-taken_at').values_list('taken_at', flat=True).distinct():
+        if len(found) == expected:
+            break
+        for product_id, location_id, quantity in snapshots.filter(taken_at=taken_at).values_list(
+                'product_id', 'location_id', 'quantity'):
+            if found.setdefault(product_id, (taken_at, {}))[0] == taken_at:
+                found[product_id][1][location_id or default] = quantity
+    return found
+
+
+def _replay(stock, movements, default):
+    """Apply movements (FIELDS tuples, in ledger order) to stock ({(product_id, location_id): quantity}) in place"""
+    for product_id, location_id, to_location_id, movement_type, quantity in movements:
+        apply_to_locations(stock, product_id, location_id or default, to_location_id, movement_type, quantity)
+
+
+def location_levels_at(at, product_ids=None):
+    """{(product_id, location_id): stock} at time at, for product_ids (default: every product with history).
+
+    Locations a product never had stock at are left out (their stock was 0).
+    """
+    default = Location.default().pk
+    if product_ids is not None:
+        product_ids = list(product_ids)
+    snapshots = _latest_snapshots(at, product_ids)
+    stock = {
+        (product_id, location_id): quantity
+        for product_id, (_, quantities) in snapshots.items()
+        for location_id, quantity in quantities.items()
+    }
+    movements = StockMovement.objects.filter(created_at__lte=at).order_by('created_at', 'id')
+
+    by_start = defaultdict(list)
+    for product_id, (taken_at, _) in snapshots.items():
+        by_start[taken_at].append(product_id)
+    if product_ids is None:
+        # One range query per snapshot date; movements of products with an
+        # older or no snapshot are replayed by their own query below
+        starts = {product_id: taken_at for product_id, (taken_at, _) in snapshots.items()}
+        for taken_at, ids in by_start.items():
+            _replay(stock, archive.ledger_rows(taken_at, at, ids), default)
+            rows = movements.filter(created_at__gt=taken_at).values_list(*FIELDS)
+            _replay(stock, (row for row in rows if starts.get(row[0]) == taken_at), default)
+        _replay(stock, (row for row in archive.ledger_rows(None, at) if row[0] not in starts), default)
+        unsnapshotted = movements.exclude(product_id__in=StockSnapshot.objects.filter(
+            taken_at__lte=at).values('product_id'))
+        _replay(stock, unsnapshotted.values_list(*FIELDS), default)
+        return stock
+
+    for taken_at, ids in by_start.items():
+        _replay(stock, archive.ledger_rows(taken_at, at, ids), default)
+        for batch in _batches(ids):
+            _replay(stock, movements.filter(product_id__in=batch, created_at__gt=taken_at).values_list(*FIELDS), default)
+    unsnapshotted = [product_id for product_id in product_ids if product_id not in snapshots]
+    _replay(stock, archive.ledger_rows(None, at, unsnapshotted), default)
+    for batch in _batches(unsnapshotted):
+        _replay(stock, movements.filter(product_id__in=batch).values_list(*FIELDS), default)
+    return stock
+
+
+def stock_levels_at(at, product_ids=None, location=None):
+    """{product_id: stock} at time at, for product_ids (default: every product with history).
+
+    The stock is the total over all locations, or the stock at location if
+    given. Products without any movement up to at are left out (their stock
+    was 0).
+    """
+    levels = {}
+    for (product_id, location_id), quantity in location_levels_at(at, product_ids).items():
+        if location is None or location_id == location.pk:
+            levels[product_id] = levels.get(product_id, 0) + quantity
+    return levels
+
+
+def stock_at(product, at, location=None):
+    """Stock of product (or a product id) at time at, over all locations or at location"""
+    product_id = getattr(product, 'pk', product)
+    return stock_levels_at(at, [product_id], location).get(product_id, 0)
+
+
+@transaction.atomic
+def take_snapshots(at=None):
+    """Store the stock of every product and location at at (default: the start of today).
+
+    Use a time in the past: a movement still in flight when the snapshot is
+    taken would otherwise be left out of it. Returns the number of rows
+    written; existing snapshots for at are kept.
+    """
+    at = at or timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+    levels = location_levels_at(at)
+    created = StockSnapshot.objects.bulk_create(
+        [
+            StockSnapshot(product_id=product_id, location_id=location_id, taken_at=at, quantity=quantity)
+            for (product_id, location_id), quantity in levels.items()
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    return len(created)
+
+
+def prune(keep_days=90, now=None):
+    """Delete snapshots older than keep_days, except those taken at the start of a month"""
+    cutoff = (now or timezone.now()) - timedelta(days=keep_days)
+    stale = [
+        taken_at
+        for taken_at in StockSnapshot.objects.filter(taken_at__lt=cutoff).order_by().values_list('taken_at', flat=True).distinct()
+        if timezone.localtime(taken_at).day != 1
+    ]
+    deleted = 0
+    for batch in _batches(stale):
+        deleted += StockSnapshot.objects.filter(taken_at__in=batch).delete()[0]
+    return deleted
+
+
+def reconcile():
+    """{product_id: (current_stock, ledger stock)} for every product where they differ.
+
+    Runs in one transaction, but movements committed while it runs may still
+    show as drift: check again before acting on a single result.
+    """
+    with transaction.atomic():
+        now = timezone.now()
+        recorded = dict(StockLevel.objects.values_list('product_id', 'current_stock'))
+        replayed = stock_levels_at(now)
+    drift = {}
+    for product_id in recorded.keys() | replayed.keys():
+        current, expected = recorded.get(product_id, 0), replayed.get(product_id, 0)
+        if current != expected:
+            drift[product_id] = (current, expected)
+    return drift
+
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from stock_app import archive
+
+
+class Command(BaseCommand):
+    help = 'Move stock movements older than the retention horizon to monthly archive files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=settings.STOCK_MOVEMENT_ARCHIVE_MONTHS,
+            help='Whole months of movements to keep in the database (default: STOCK_MOVEMENT_ARCHIVE_MONTHS)',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = archive.cutoff(options['months'])
+        self.stdout.write(f'Archiving movements before {cutoff:%Y-%m-%d}...')
+        
+        archived = archive.archive_movements(options['months'])
+        for month in archived:
+            self.stdout.write(f'  • {month.month:%Y-%m}: {month.row_count} movement(s) -> {month.file.name}')
+        
+        self.stdout.write(self.style.SUCCESS(f'✓ {len(archived)} month(s) archived'))
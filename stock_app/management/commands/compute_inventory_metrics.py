@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from stock_app import analytics
+
+
+class Command(BaseCommand):
+    help = 'Recompute the inventory metrics (ABC class, turnover, days of cover, dead stock) of every product'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=analytics.DEFAULT_DAYS,
+            help=f'Length of the analysed period in days (default: {analytics.DEFAULT_DAYS})',
+        )
+        parser.add_argument(
+            '--dead-days',
+            type=int,
+            default=analytics.DEAD_STOCK_DAYS,
+            help=f'Days without any outgoing movement after which stock is dead (default: {analytics.DEAD_STOCK_DAYS})',
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 1 or options['dead_days'] < 1:
+            raise CommandError('--days and --dead-days must be positive')
+        self.stdout.write(f'Computing inventory metrics over the last {options["days"]} day(s)...')
+        count = analytics.compute(options['days'], options['dead_days'])
+        self.stdout.write(self.style.SUCCESS(f'✓ Metrics computed for {count} product(s)'))
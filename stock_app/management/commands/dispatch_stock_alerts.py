@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from stock_app import alerts
+
+
+class Command(BaseCommand):
+    help = 'Send the pending low-stock alerts by email and webhook (background worker)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Send the alerts that are due now, then exit'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls'
+        )
+        parser.add_argument(
+            '--debounce',
+            type=float,
+            help='Seconds without a new change before a product is sent (default: STOCK_ALERT_DEBOUNCE_SECONDS)'
+        )
+        parser.add_argument(
+            '--keep-days',
+            type=int,
+            default=30,
+            help='Delete the alerts sent more than this many days ago'
+        )
+
+    def handle(self, *args, **options):
+        pruned = alerts.prune(options['keep_days'])
+        self.stdout.write(f'Alert dispatcher started ({pruned} ancienne(s) alerte(s) supprimée(s))')
+
+        while True:
+            try:
+                notifications = alerts.dispatch(debounce=options['debounce'])
+            except Exception as e:
+                # Released by dispatch(), retried after the backoff
+                self.stdout.write(self.style.ERROR(f'  ✗ {e}'))
+                notifications = []
+            else:
+                if notifications:
+                    self.stdout.write(self.style.SUCCESS(f'  ✓ {len(notifications)} alerte(s) envoyée(s)'))
+                    for notification in notifications:
+                        self.stdout.write(f'    • {notification}')
+            if options['once']:
+                break
+            close_old_connections()
+            time.sleep(options['poll_interval'])
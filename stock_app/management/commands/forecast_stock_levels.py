@@ -0,0 +1,48 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from stock_app import forecasting
+
+
+class Command(BaseCommand):
+    help = 'Forecast product demand and set minimum (reorder point) and maximum (order-up-to) stock levels'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--weeks',
+            type=int,
+            default=forecasting.DEFAULT_WEEKS,
+            help=f'Weeks of sales history to fit (default: {forecasting.DEFAULT_WEEKS})',
+        )
+        parser.add_argument('--lead-time', type=int, help='Supplier lead time in days (default: STOCK_LEAD_TIME_DAYS)')
+        parser.add_argument('--review-days', type=int, help='Days between two orders (default: STOCK_REVIEW_DAYS)')
+        parser.add_argument('--service-level', type=float, help='Probability of not running out, e.g. 0.95 (default: STOCK_SERVICE_LEVEL)')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Worker processes, each forecasting a shard of the products (default: one per CPU)',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Compute the levels without saving them')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers must be positive')
+        self.stdout.write(f'Forecasting demand over the last {options["weeks"]} week(s) with {options["workers"]} worker(s)...')
+        try:
+            levels = forecasting.forecast(
+                weeks=options['weeks'],
+                lead_time=options['lead_time'],
+                review_days=options['review_days'],
+                service_level=options['service_level'],
+                workers=options['workers'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(f'  • {len(levels)} product(s) forecast')
+        
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run: nothing saved'))
+            return
+        changed = forecasting.apply_levels(levels)
+        self.stdout.write(self.style.SUCCESS(f'✓ Stock levels updated for {changed} product(s)'))
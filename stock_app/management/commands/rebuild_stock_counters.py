@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from stock_app import counters
+
+
+class Command(BaseCommand):
+    help = 'Verify the running inventory totals against a full recompute and rebuild them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report drift, do not rewrite the totals (exit code 1 on drift)',
+        )
+
+    def handle(self, *args, **options):
+        drift = counters.verify()
+        
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('✓ Inventory totals match a full recompute'))
+            return
+        
+        self.stdout.write(self.style.WARNING(f'{len(drift)} counter(s) drifted:'))
+        for name, (stored, expected) in drift.items():
+            self.stdout.write(f'  • {name}: stored={stored} expected={expected}')
+        
+        if options['check']:
+            raise CommandError('Inventory totals are out of date')
+        
+        counters.rebuild()
+        self.stdout.write(self.style.SUCCESS('✓ Inventory totals rebuilt'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from products_app.models import Product
+from stock_app import ledger
+
+
+class Command(BaseCommand):
+    help = 'Compare every stock level with the replay of the movement ledger and report drift'
+
+    def handle(self, *args, **options):
+        drift = ledger.reconcile()
+        
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('✓ Stock levels match the movement ledger'))
+            return
+        
+        skus = dict(Product.objects.filter(pk__in=list(drift)).values_list('pk', 'sku'))
+        self.stdout.write(self.style.WARNING(f'{len(drift)} product(s) drifted:'))
+        for product_id, (current, expected) in sorted(drift.items()):
+            self.stdout.write(f'  • {skus.get(product_id, product_id)}: stock={current} ledger={expected}')
+        
+        raise CommandError('Stock levels do not match the movement ledger')
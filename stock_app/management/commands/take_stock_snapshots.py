@@ -0,0 +1,32 @@
+from datetime import date, datetime, time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from stock_app import ledger
+
+
+class Command(BaseCommand):
+    help = 'Store the stock of every product at the start of a day, replayed from the movement ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            type=date.fromisoformat,
+            help='Day whose opening stock to store (YYYY-MM-DD, default: today)',
+        )
+        parser.add_argument(
+            '--keep-days',
+            type=int,
+            default=90,
+            help='Delete daily snapshots older than this, keeping the first of each month (default: 90)',
+        )
+
+    def handle(self, *args, **options):
+        day = options['date'] or timezone.localdate()
+        at = timezone.make_aware(datetime.combine(day, time.min))
+        created = ledger.take_snapshots(at)
+        self.stdout.write(self.style.SUCCESS(f'✓ {created} snapshot(s) stored for {at:%Y-%m-%d %H:%M}'))
+        
+        pruned = ledger.prune(options['keep_days'])
+        if pruned:
+            self.stdout.write(f'  • {pruned} old snapshot(s) deleted')
@@ -0,0 +1,106 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:16
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('products_app', '0002_alter_category_options_alter_product_options_and_more'),
+        ('stock_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryTotals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_products', models.IntegerField(default=0, verbose_name='Produits')),
+                ('active_products', models.IntegerField(default=0, verbose_name='Produits actifs')),
+                ('total_units', models.BigIntegerField(default=0, verbose_name='Unités en stock')),
+                ('total_stock_value', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Valeur du stock')),
+                ('low_stock_count', models.IntegerField(default=0, verbose_name='Stock faible')),
+                ('out_of_stock_count', models.IntegerField(default=0, verbose_name='Rupture de stock')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Dernière mise à jour')),
+            ],
+            options={
+                'verbose_name': "Totaux d'inventaire",
+                'verbose_name_plural': "Totaux d'inventaire",
+            },
+        ),
+        # The operations below only bring the migration state in line with the
+        # French verbose_names and Meta options the models already had, which
+        # 0001_initial was generated without; they do not change the schema.
+        migrations.AlterModelOptions(
+            name='stocklevel',
+            options={'ordering': ['product__name'], 'verbose_name': 'Niveau de stock', 'verbose_name_plural': 'Niveaux de stock'},
+        ),
+        migrations.AlterModelOptions(
+            name='stockmovement',
+            options={'ordering': ['-created_at'], 'verbose_name': 'Mouvement de stock', 'verbose_name_plural': 'Mouvements de stock'},
+        ),
+        migrations.AlterField(
+            model_name='stocklevel',
+            name='current_stock',
+            field=models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Stock actuel'),
+        ),
+        migrations.AlterField(
+            model_name='stocklevel',
+            name='last_updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Dernière mise à jour'),
+        ),
+        migrations.AlterField(
+            model_name='stocklevel',
+            name='maximum_stock',
+            field=models.IntegerField(default=1000, validators=[django.core.validators.MinValueValidator(1)], verbose_name='Stock maximum'),
+        ),
+        migrations.AlterField(
+            model_name='stocklevel',
+            name='minimum_stock',
+            field=models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Stock minimum'),
+        ),
+        migrations.AlterField(
+            model_name='stocklevel',
+            name='product',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stock_level', to='products_app.product', verbose_name='Produit'),
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Date de création'),
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='created_by',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Créé par'),
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='movement_type',
+            field=models.CharField(choices=[('IN', 'Entrée de stock'), ('OUT', 'Sortie de stock'), ('ADJUSTMENT', 'Ajustement'), ('TRANSFER', 'Transfert')], max_length=20, verbose_name='Type de mouvement'),
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='notes',
+            field=models.TextField(blank=True, verbose_name='Notes'),
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='products_app.product', verbose_name='Produit'),
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='quantity',
+            field=models.IntegerField(validators=[django.core.validators.MinValueValidator(1)], verbose_name='Quantité'),
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='reference',
+            field=models.CharField(blank=True, max_length=100, verbose_name='Référence'),
+        ),
+    ]
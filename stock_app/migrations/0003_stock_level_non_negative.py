@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock_app', '0002_inventory_totals'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='stocklevel',
+            constraint=models.CheckConstraint(check=models.Q(('current_stock__gte', 0)), name='stock_level_current_stock_non_negative'),
+        ),
+    ]
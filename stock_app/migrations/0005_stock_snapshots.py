@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products_app', '0004_product_search_index'),
+        ('stock_app', '0004_movement_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField(verbose_name='Date')),
+                ('quantity', models.IntegerField(verbose_name='Quantité')),
+            ],
+            options={
+                'verbose_name': 'Photo de stock',
+                'verbose_name_plural': 'Photos de stock',
+                'ordering': ['-taken_at', 'product'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['product', 'created_at', 'id'], name='movement_product_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='stocksnapshot',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='products_app.product', verbose_name='Produit'),
+        ),
+        migrations.AddIndex(
+            model_name='stocksnapshot',
+            index=models.Index(fields=['taken_at'], name='stock_snapshot_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='stocksnapshot',
+            constraint=models.UniqueConstraint(fields=('product', 'taken_at'), name='stock_snapshot_unique'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock_app', '0005_stock_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMovementMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True, verbose_name='Mois')),
+                ('file', models.FileField(upload_to='archives/stock_movements/', verbose_name='Fichier')),
+                ('row_count', models.IntegerField(default=0, verbose_name='Mouvements')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name="Date d'archivage")),
+            ],
+            options={
+                'verbose_name': 'Mois de mouvements archivé',
+                'verbose_name_plural': 'Mois de mouvements archivés',
+                'ordering': ['-month'],
+            },
+        ),
+    ]
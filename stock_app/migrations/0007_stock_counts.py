@@ -0,0 +1,76 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:28
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products_app', '0004_product_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('stock_app', '0006_archived_movement_months'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reference', models.CharField(max_length=100, verbose_name='Référence')),
+                ('status', models.CharField(choices=[('OPEN', 'En cours'), ('CLOSED', 'Clôturé'), ('CANCELLED', 'Annulé')], default='OPEN', max_length=20, verbose_name='Statut')),
+                ('notes', models.TextField(blank=True, verbose_name='Notes')),
+                ('line_count', models.IntegerField(default=0, verbose_name='Produits')),
+                ('movement_count', models.IntegerField(default=0, verbose_name='Mouvements')),
+                ('opened_at', models.DateTimeField(auto_now_add=True, verbose_name="Date d'ouverture")),
+                ('last_count_at', models.DateTimeField(blank=True, null=True, verbose_name='Dernier comptage')),
+                ('closed_at', models.DateTimeField(blank=True, null=True, verbose_name='Date de clôture')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_counts', to='products_app.category', verbose_name='Catégorie')),
+                ('closed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Clôturé par')),
+                ('opened_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Ouvert par')),
+            ],
+            options={
+                'verbose_name': 'Inventaire',
+                'verbose_name_plural': 'Inventaires',
+                'ordering': ['-opened_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockCountLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expected_stock', models.IntegerField(verbose_name='Stock attendu')),
+                ('count', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='stock_app.stockcount', verbose_name='Inventaire')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products_app.product', verbose_name='Produit')),
+            ],
+            options={
+                'verbose_name': "Ligne d'inventaire",
+                'verbose_name_plural': "Lignes d'inventaire",
+            },
+        ),
+        migrations.CreateModel(
+            name='StockCountEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(validators=[django.core.validators.MinValueValidator(0)], verbose_name='Quantité comptée')),
+                ('counted_at', models.DateTimeField(auto_now_add=True, verbose_name='Date du comptage')),
+                ('count', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='stock_app.stockcount', verbose_name='Inventaire')),
+                ('counted_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Compté par')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products_app.product', verbose_name='Produit')),
+            ],
+            options={
+                'verbose_name': 'Comptage',
+                'verbose_name_plural': 'Comptages',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='stockcountline',
+            constraint=models.UniqueConstraint(fields=('count', 'product'), name='stock_count_line_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='stockcountentry',
+            index=models.Index(fields=['count', 'product'], name='stock_count_entry_idx'),
+        ),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:34
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def default_location(apps, schema_editor):
+    """Create the default location, holding all the existing stock"""
+    Location = apps.get_model('stock_app', 'Location')
+    LocationStock = apps.get_model('stock_app', 'LocationStock')
+    StockLevel = apps.get_model('stock_app', 'StockLevel')
+    location = Location.objects.create(code='PRINCIPAL', name='Dépôt principal', is_default=True)
+    LocationStock.objects.bulk_create(
+        (
+            LocationStock(product_id=product_id, location=location, quantity=quantity)
+            for product_id, quantity in StockLevel.objects.values_list('product_id', 'current_stock').iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products_app', '0004_product_search_index'),
+        ('stock_app', '0007_stock_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Nom')),
+                ('code', models.CharField(max_length=20, unique=True, verbose_name='Code')),
+                ('address', models.TextField(blank=True, verbose_name='Adresse')),
+                ('is_default', models.BooleanField(default=False, verbose_name='Dépôt principal')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Actif')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+            ],
+            options={
+                'verbose_name': 'Emplacement',
+                'verbose_name_plural': 'Emplacements',
+                'ordering': ['-is_default', 'name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LocationStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Quantité')),
+                ('last_updated', models.DateTimeField(auto_now=True, verbose_name='Dernière mise à jour')),
+            ],
+            options={
+                'verbose_name': 'Stock par emplacement',
+                'verbose_name_plural': 'Stocks par emplacement',
+                'ordering': ['location', 'product__name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='locationstock',
+            name='location',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stocks', to='stock_app.location', verbose_name='Emplacement'),
+        ),
+        migrations.AddField(
+            model_name='locationstock',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='location_stocks', to='products_app.product', verbose_name='Produit'),
+        ),
+        migrations.AddConstraint(
+            model_name='location',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_default', True)), fields=('is_default',), name='location_single_default'),
+        ),
+        migrations.AddField(
+            model_name='stockcount',
+            name='location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='stock_counts', to='stock_app.location', verbose_name='Emplacement'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movements', to='stock_app.location', verbose_name='Emplacement'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='to_location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='incoming_movements', to='stock_app.location', verbose_name="Vers l'emplacement"),
+        ),
+        migrations.AddField(
+            model_name='stocksnapshot',
+            name='location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='stock_app.location', verbose_name='Emplacement'),
+        ),
+        migrations.AddConstraint(
+            model_name='locationstock',
+            constraint=models.UniqueConstraint(fields=('product', 'location'), name='location_stock_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='locationstock',
+            constraint=models.CheckConstraint(check=models.Q(('quantity__gte', 0)), name='location_stock_non_negative'),
+        ),
+        migrations.RemoveConstraint(
+            model_name='stocksnapshot',
+            name='stock_snapshot_unique',
+        ),
+        migrations.AddConstraint(
+            model_name='stocksnapshot',
+            constraint=models.UniqueConstraint(fields=('product', 'location', 'taken_at'), name='stock_snapshot_unique'),
+        ),
+        migrations.RunPython(default_location, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products_app', '0004_product_search_index'),
+        ('stock_app', '0008_locations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('abc_class', models.CharField(choices=[('A', 'A'), ('B', 'B'), ('C', 'C')], max_length=1, verbose_name='Classe ABC')),
+                ('units_sold', models.IntegerField(default=0, verbose_name='Unités vendues')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name="Chiffre d'affaires")),
+                ('average_stock', models.FloatField(default=0, verbose_name='Stock moyen')),
+                ('turnover', models.FloatField(blank=True, null=True, verbose_name='Rotation')),
+                ('days_of_cover', models.FloatField(blank=True, null=True, verbose_name='Jours de couverture')),
+                ('last_out_at', models.DateTimeField(blank=True, null=True, verbose_name='Dernière sortie')),
+                ('is_dead_stock', models.BooleanField(default=False, verbose_name='Stock dormant')),
+                ('period_days', models.IntegerField(verbose_name='Période (jours)')),
+                ('computed_at', models.DateTimeField(verbose_name='Calculé le')),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='metrics', to='products_app.product', verbose_name='Produit')),
+            ],
+            options={
+                'verbose_name': 'Indicateurs produit',
+                'verbose_name_plural': 'Indicateurs produits',
+                'ordering': ['abc_class', '-revenue'],
+                'indexes': [models.Index(fields=['abc_class'], name='product_metrics_abc_idx'), models.Index(fields=['is_dead_stock'], name='product_metrics_dead_idx'), models.Index(fields=['days_of_cover'], name='product_metrics_cover_idx')],
+            },
+        ),
+    ]
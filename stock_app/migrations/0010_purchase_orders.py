@@ -0,0 +1,64 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:47
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products_app', '0005_suppliers'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('stock_app', '0009_product_metrics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PurchaseOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reference', models.CharField(max_length=100, verbose_name='Référence')),
+                ('status', models.CharField(choices=[('DRAFT', 'Brouillon'), ('ORDERED', 'Commandée'), ('RECEIVED', 'Reçue'), ('CANCELLED', 'Annulée')], default='DRAFT', max_length=20, verbose_name='Statut')),
+                ('notes', models.TextField(blank=True, verbose_name='Notes')),
+                ('line_count', models.IntegerField(default=0, verbose_name='Lignes')),
+                ('total_cost', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Montant')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('received_at', models.DateTimeField(blank=True, null=True, verbose_name='Date de réception')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='purchase_orders', to='products_app.category', verbose_name='Catégorie')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Créée par')),
+                ('location', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='purchase_orders', to='stock_app.location', verbose_name='Emplacement de réception')),
+                ('received_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Reçue par')),
+                ('supplier', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='purchase_orders', to='products_app.supplier', verbose_name='Fournisseur')),
+            ],
+            options={
+                'verbose_name': 'Commande fournisseur',
+                'verbose_name_plural': 'Commandes fournisseurs',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PurchaseOrderLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(validators=[django.core.validators.MinValueValidator(1)], verbose_name='Quantité')),
+                ('unit_cost', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Coût unitaire')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='stock_app.purchaseorder', verbose_name='Commande')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='purchase_lines', to='products_app.product', verbose_name='Produit')),
+            ],
+            options={
+                'verbose_name': 'Ligne de commande fournisseur',
+                'verbose_name_plural': 'Lignes de commande fournisseur',
+                'ordering': ['order', 'product__name'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='purchaseorderline',
+            constraint=models.UniqueConstraint(fields=('order', 'product'), name='purchase_order_line_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['status'], name='purchase_order_status_idx'),
+        ),
+    ]
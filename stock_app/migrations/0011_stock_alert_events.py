@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products_app', '0005_suppliers'),
+        ('stock_app', '0010_purchase_orders'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockAlertEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('previous_status', models.CharField(choices=[('OK', 'En stock'), ('LOW', 'Stock faible'), ('OUT', 'Rupture de stock')], max_length=3, verbose_name='Statut précédent')),
+                ('status', models.CharField(choices=[('OK', 'En stock'), ('LOW', 'Stock faible'), ('OUT', 'Rupture de stock')], max_length=3, verbose_name='Statut')),
+                ('current_stock', models.IntegerField(verbose_name='Stock actuel')),
+                ('minimum_stock', models.IntegerField(verbose_name='Stock minimum')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date')),
+                ('dispatch_id', models.CharField(blank=True, max_length=32, verbose_name='Envoi')),
+                ('dispatched_at', models.DateTimeField(blank=True, null=True, verbose_name="Date d'envoi")),
+                ('attempts', models.IntegerField(default=0, verbose_name='Tentatives')),
+                ('last_error', models.TextField(blank=True, verbose_name='Dernière erreur')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alerts', to='products_app.product', verbose_name='Produit')),
+            ],
+            options={
+                'verbose_name': 'Alerte de stock',
+                'verbose_name_plural': 'Alertes de stock',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(condition=models.Q(('dispatched_at__isnull', True)), fields=['product', 'created_at'], name='stock_alert_pending_idx'), models.Index(fields=['dispatch_id'], name='stock_alert_dispatch_idx')],
+            },
+        ),
+    ]
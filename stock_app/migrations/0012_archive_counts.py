@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock_app', '0011_stock_alert_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedmovementmonth',
+            name='counts',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Mouvements par produit et type'),
+        ),
+    ]
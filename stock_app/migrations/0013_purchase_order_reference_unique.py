@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:23
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def deduplicate_references(apps, schema_editor):
+    """Orders generated in the same second could share a reference: suffix them with their id"""
+    PurchaseOrder = apps.get_model('stock_app', 'PurchaseOrder')
+    duplicates = (
+        PurchaseOrder.objects.values('reference').annotate(count=Count('id')).filter(count__gt=1)
+        .values_list('reference', flat=True)
+    )
+    orders = list(PurchaseOrder.objects.filter(reference__in=list(duplicates)))
+    for order in orders:
+        order.reference = f'{order.reference}-{order.pk}'
+    PurchaseOrder.objects.bulk_update(orders, ['reference'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock_app', '0012_archive_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate_references, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='purchaseorder',
+            name='reference',
+            field=models.CharField(max_length=100, unique=True, verbose_name='Référence'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock_app', '0013_purchase_order_reference_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockalertevent',
+            name='delivered_channels',
+            field=models.JSONField(blank=True, default=list, verbose_name='Canaux livrés'),
+        ),
+        migrations.AddField(
+            model_name='stockalertevent',
+            name='retry_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Nouvel essai'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:40
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def seed_in_stock_count(apps, schema_editor):
+    """Count the products above their minimum into the existing totals row"""
+    InventoryTotals = apps.get_model('stock_app', 'InventoryTotals')
+    StockLevel = apps.get_model('stock_app', 'StockLevel')
+    InventoryTotals.objects.update(
+        in_stock_count=StockLevel.objects.filter(current_stock__gt=F('minimum_stock')).count(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock_app', '0014_stock_alert_retries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventorytotals',
+            name='in_stock_count',
+            field=models.IntegerField(default=0, verbose_name='En stock'),
+        ),
+        migrations.RunPython(seed_in_stock_count, migrations.RunPython.noop),
+    ]
@@ -3,6 +3,40 @@ from django.core.validators import MinValueValidator
 from products_app.models import Product
 
 
+class Location(models.Model):
+    """A depot holding stock; exactly one is the default location.
+
+    Movements without a location (sales, and every movement recorded before
+    locations existed) belong to the default location.
+    """
+    name = models.CharField(max_length=100, verbose_name="Nom")
+    code = models.CharField(max_length=20, unique=True, verbose_name="Code")
+    address = models.TextField(blank=True, verbose_name="Adresse")
+    is_default = models.BooleanField(default=False, verbose_name="Dépôt principal")
+    is_active = models.BooleanField(default=True, verbose_name="Actif")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
+
+    class Meta:
+        verbose_name = "Emplacement"
+        verbose_name_plural = "Emplacements"
+        ordering = ['-is_default', 'name']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['is_default'], condition=models.Q(is_default=True), name='location_single_default',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.code})"
+
+    @classmethod
+    def default(cls):
+        location, _ = cls.objects.get_or_create(
+            is_default=True, defaults={'code': 'PRINCIPAL', 'name': 'Dépôt principal'},
+        )
+        return location
+
+
 class StockMovement(models.Model):
     MOVEMENT_TYPES = [
         ('IN', 'Entrée de stock'),
@@ -16,6 +50,14 @@ class StockMovement(models.Model):
     quantity = models.IntegerField(validators=[MinValueValidator(1)], verbose_name="Quantité")
     reference = models.CharField(max_length=100, blank=True, verbose_name="Référence")  # Invoice number, PO number, etc.
     notes = models.TextField(blank=True, verbose_name="Notes")
+    # Source of a transfer; None is the default location
+    location = models.ForeignKey(
+        Location, on_delete=models.PROTECT, null=True, blank=True, related_name='movements', verbose_name="Emplacement",
+    )
+    to_location = models.ForeignKey(
+        Location, on_delete=models.PROTECT, null=True, blank=True, related_name='incoming_movements',
+        verbose_name="Vers l'emplacement",
+    )
     created_by = models.ForeignKey('auth.User', on_delete=models.CASCADE, verbose_name="Créé par")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
     
@@ -23,12 +65,27 @@ class StockMovement(models.Model):
         verbose_name = "Mouvement de stock"
         verbose_name_plural = "Mouvements de stock"
         ordering = ['-created_at']
+        indexes = [
+            # Movements list, keyset-paginated on (-created_at, -id), unfiltered
+            # or filtered by type. Filtering by product is served by the
+            # product foreign key index.
+            models.Index(fields=['created_at', 'id'], name='movement_date_idx'),
+            models.Index(fields=['movement_type', 'created_at', 'id'], name='movement_type_date_idx'),
+            # Replay of one product's movements since a snapshot (stock_app.ledger)
+            models.Index(fields=['product', 'created_at', 'id'], name='movement_product_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.product.name} - {self.get_movement_type_display()} ({self.quantity})"
 
 
 class StockLevel(models.Model):
+    """Stock of a product across all locations.
+
+    current_stock is the sum of the product's LocationStock rows, kept up to
+    date by stock_app.services so the stock lists and dashboards never have
+    to add them up.
+    """
     product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='stock_level', verbose_name="Produit")
     current_stock = models.IntegerField(default=0, validators=[MinValueValidator(0)], verbose_name="Stock actuel")
     minimum_stock = models.IntegerField(default=0, validators=[MinValueValidator(0)], verbose_name="Stock minimum")
@@ -39,6 +96,12 @@ class StockLevel(models.Model):
         verbose_name = "Niveau de stock"
         verbose_name_plural = "Niveaux de stock"
         ordering = ['product__name']
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(current_stock__gte=0),
+                name='stock_level_current_stock_non_negative',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.product.name} - {self.current_stock} unités"
@@ -58,4 +121,337 @@ class StockLevel(models.Model):
         elif self.is_low_stock:
             return 'Stock faible'
         else:
-            return 'En stock'
\ No newline at end of file
+            return 'En stock'
+
+
+class LocationStock(models.Model):
+    """Stock of a product at one location"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='location_stocks', verbose_name="Produit")
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='stocks', verbose_name="Emplacement")
+    quantity = models.IntegerField(default=0, validators=[MinValueValidator(0)], verbose_name="Quantité")
+    last_updated = models.DateTimeField(auto_now=True, verbose_name="Dernière mise à jour")
+
+    class Meta:
+        verbose_name = "Stock par emplacement"
+        verbose_name_plural = "Stocks par emplacement"
+        ordering = ['location', 'product__name']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'location'], name='location_stock_unique'),
+            models.CheckConstraint(check=models.Q(quantity__gte=0), name='location_stock_non_negative'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.location_id} - {self.quantity}"
+
+
+class InventoryTotals(models.Model):
+    """Running totals for the whole inventory, kept in a single row.
+
+    Updated in the same transaction as every stock mutation so the dashboards
+    can read them without scanning StockLevel. See stock_app.counters.
+    """
+    total_products = models.IntegerField(default=0, verbose_name="Produits")
+    active_products = models.IntegerField(default=0, verbose_name="Produits actifs")
+    total_units = models.BigIntegerField(default=0, verbose_name="Unités en stock")
+    total_stock_value = models.DecimalField(max_digits=20, decimal_places=2, default=0, verbose_name="Valeur du stock")
+    low_stock_count = models.IntegerField(default=0, verbose_name="Stock faible")
+    out_of_stock_count = models.IntegerField(default=0, verbose_name="Rupture de stock")
+    in_stock_count = models.IntegerField(default=0, verbose_name="En stock")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Dernière mise à jour")
+
+    class Meta:
+        verbose_name = "Totaux d'inventaire"
+        verbose_name_plural = "Totaux d'inventaire"
+
+    def __str__(self):
+        return f"Inventaire - {self.total_units} unités ({self.total_stock_value})"
+
+
+class StockSnapshot(models.Model):
+    """Stock of a product at taken_at, as replayed from the movement ledger.
+
+    Includes every movement created at or before taken_at. Point-in-time
+    queries start from the latest snapshot and only replay the movements
+    after it, see stock_app.ledger.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='snapshots', verbose_name="Produit")
+    # None for snapshots taken before locations existed: the default location
+    location = models.ForeignKey(
+        Location, on_delete=models.CASCADE, null=True, blank=True, related_name='+', verbose_name="Emplacement",
+    )
+    taken_at = models.DateTimeField(verbose_name="Date")
+    quantity = models.IntegerField(verbose_name="Quantité")
+
+    class Meta:
+        verbose_name = "Photo de stock"
+        verbose_name_plural = "Photos de stock"
+        ordering = ['-taken_at', 'product']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'location', 'taken_at'], name='stock_snapshot_unique'),
+        ]
+        indexes = [
+            # Pruning and listing snapshots by date, for every product
+            models.Index(fields=['taken_at'], name='stock_snapshot_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} - {self.quantity} ({self.taken_at:%Y-%m-%d %H:%M})"
+
+
+class ArchivedMovementMonth(models.Model):
+    """One calendar month of stock movements moved out of StockMovement.
+
+    The movements are in file (gzipped JSON lines, newest first); a
+    StockSnapshot taken at the end of the month keeps the balances. counts
+    holds the number of movements by '<product id>:<movement type>'. See
+    stock_app.archive.
+    """
+    month = models.DateField(unique=True, verbose_name="Mois")
+    file = models.FileField(upload_to='archives/stock_movements/', verbose_name="Fichier")
+    row_count = models.IntegerField(default=0, verbose_name="Mouvements")
+    counts = models.JSONField(default=dict, blank=True, verbose_name="Mouvements par produit et type")
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name="Date d'archivage")
+
+    class Meta:
+        verbose_name = "Mois de mouvements archivé"
+        verbose_name_plural = "Mois de mouvements archivés"
+        ordering = ['-month']
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} - {self.row_count} mouvements"
+
+
+class StockCount(models.Model):
+    """A physical stock count (cycle count) session at one location.
+
+    Opening it freezes the stock of every product in scope in StockCountLine;
+    counts are then appended as StockCountEntry rows, by any number of
+    clients at once. Closing it posts the difference between the counted and
+    the frozen quantities as IN / OUT movements. See stock_app.counting.
+    """
+    STATUS_CHOICES = [
+        ('OPEN', 'En cours'),
+        ('CLOSED', 'Clôturé'),
+        ('CANCELLED', 'Annulé'),
+    ]
+
+    reference = models.CharField(max_length=100, verbose_name="Référence")
+    category = models.ForeignKey(
+        'products_app.Category', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='stock_counts', verbose_name="Catégorie",
+    )
+    location = models.ForeignKey(
+        Location, on_delete=models.PROTECT, null=True, blank=True, related_name='stock_counts',
+        verbose_name="Emplacement",
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='OPEN', verbose_name="Statut")
+    notes = models.TextField(blank=True, verbose_name="Notes")
+    line_count = models.IntegerField(default=0, verbose_name="Produits")
+    movement_count = models.IntegerField(default=0, verbose_name="Mouvements")
+    opened_by = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='+', verbose_name="Ouvert par")
+    opened_at = models.DateTimeField(auto_now_add=True, verbose_name="Date d'ouverture")
+    last_count_at = models.DateTimeField(null=True, blank=True, verbose_name="Dernier comptage")
+    closed_by = models.ForeignKey(
+        'auth.User', on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name="Clôturé par",
+    )
+    closed_at = models.DateTimeField(null=True, blank=True, verbose_name="Date de clôture")
+
+    class Meta:
+        verbose_name = "Inventaire"
+        verbose_name_plural = "Inventaires"
+        ordering = ['-opened_at']
+
+    def __str__(self):
+        return f"{self.reference} - {self.get_status_display()}"
+
+
+class StockCountLine(models.Model):
+    """Stock of a product at the count's location when the session was opened"""
+    count = models.ForeignKey(StockCount, on_delete=models.CASCADE, related_name='lines', verbose_name="Inventaire")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+', verbose_name="Produit")
+    expected_stock = models.IntegerField(verbose_name="Stock attendu")
+
+    class Meta:
+        verbose_name = "Ligne d'inventaire"
+        verbose_name_plural = "Lignes d'inventaire"
+        constraints = [
+            models.UniqueConstraint(fields=['count', 'product'], name='stock_count_line_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} - {self.expected_stock}"
+
+
+class StockCountEntry(models.Model):
+    """Quantity of a product counted by one client; entries for a product add up"""
+    count = models.ForeignKey(StockCount, on_delete=models.CASCADE, related_name='entries', verbose_name="Inventaire")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+', verbose_name="Produit")
+    quantity = models.IntegerField(validators=[MinValueValidator(0)], verbose_name="Quantité comptée")
+    counted_by = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='+', verbose_name="Compté par")
+    counted_at = models.DateTimeField(auto_now_add=True, verbose_name="Date du comptage")
+
+    class Meta:
+        verbose_name = "Comptage"
+        verbose_name_plural = "Comptages"
+        indexes = [
+            # Per-product totals when the session is closed
+            models.Index(fields=['count', 'product'], name='stock_count_entry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} - {self.quantity}"
+
+
+class ProductMetrics(models.Model):
+    """Inventory analytics of a product over the last period_days days.
+
+    Recomputed for every product at once by stock_app.analytics (see the
+    compute_inventory_metrics command); never edited row by row.
+    """
+    ABC_CLASSES = [
+        ('A', 'A'),
+        ('B', 'B'),
+        ('C', 'C'),
+    ]
+
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='metrics', verbose_name="Produit")
+    abc_class = models.CharField(max_length=1, choices=ABC_CLASSES, verbose_name="Classe ABC")
+    units_sold = models.IntegerField(default=0, verbose_name="Unités vendues")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Chiffre d'affaires")
+    average_stock = models.FloatField(default=0, verbose_name="Stock moyen")
+    turnover = models.FloatField(null=True, blank=True, verbose_name="Rotation")
+    days_of_cover = models.FloatField(null=True, blank=True, verbose_name="Jours de couverture")
+    last_out_at = models.DateTimeField(null=True, blank=True, verbose_name="Dernière sortie")
+    is_dead_stock = models.BooleanField(default=False, verbose_name="Stock dormant")
+    period_days = models.IntegerField(verbose_name="Période (jours)")
+    computed_at = models.DateTimeField(verbose_name="Calculé le")
+
+    class Meta:
+        verbose_name = "Indicateurs produit"
+        verbose_name_plural = "Indicateurs produits"
+        ordering = ['abc_class', '-revenue']
+        indexes = [
+            # Stock list filters
+            models.Index(fields=['abc_class'], name='product_metrics_abc_idx'),
+            models.Index(fields=['is_dead_stock'], name='product_metrics_dead_idx'),
+            models.Index(fields=['days_of_cover'], name='product_metrics_cover_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} - {self.abc_class}"
+
+
+class PurchaseOrder(models.Model):
+    """An order to a supplier, usually generated from the stock alerts.
+
+    Drafts are created by stock_app.purchasing for the products below their
+    minimum stock, one per supplier (or category). Receiving the order posts
+    one IN movement per line. See stock_app.purchasing.
+    """
+    STATUS_CHOICES = [
+        ('DRAFT', 'Brouillon'),
+        ('ORDERED', 'Commandée'),
+        ('RECEIVED', 'Reçue'),
+        ('CANCELLED', 'Annulée'),
+    ]
+
+    reference = models.CharField(max_length=100, unique=True, verbose_name="Référence")
+    supplier = models.ForeignKey(
+        'products_app.Supplier', on_delete=models.PROTECT, null=True, blank=True,
+        related_name='purchase_orders', verbose_name="Fournisseur",
+    )
+    category = models.ForeignKey(
+        'products_app.Category', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='purchase_orders', verbose_name="Catégorie",
+    )
+    location = models.ForeignKey(
+        Location, on_delete=models.PROTECT, null=True, blank=True, related_name='purchase_orders',
+        verbose_name="Emplacement de réception",
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='DRAFT', verbose_name="Statut")
+    notes = models.TextField(blank=True, verbose_name="Notes")
+    line_count = models.IntegerField(default=0, verbose_name="Lignes")
+    total_cost = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Montant")
+    created_by = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='+', verbose_name="Créée par")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
+    received_by = models.ForeignKey(
+        'auth.User', on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name="Reçue par",
+    )
+    received_at = models.DateTimeField(null=True, blank=True, verbose_name="Date de réception")
+
+    class Meta:
+        verbose_name = "Commande fournisseur"
+        verbose_name_plural = "Commandes fournisseurs"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status'], name='purchase_order_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.reference} - {self.get_status_display()}"
+
+    @property
+    def is_open(self):
+        return self.status in ('DRAFT', 'ORDERED')
+
+
+class PurchaseOrderLine(models.Model):
+    """Quantity of one product ordered"""
+    order = models.ForeignKey(PurchaseOrder, on_delete=models.CASCADE, related_name='lines', verbose_name="Commande")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='purchase_lines', verbose_name="Produit")
+    quantity = models.IntegerField(validators=[MinValueValidator(1)], verbose_name="Quantité")
+    unit_cost = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Coût unitaire")
+
+    class Meta:
+        verbose_name = "Ligne de commande fournisseur"
+        verbose_name_plural = "Lignes de commande fournisseur"
+        ordering = ['order', 'product__name']
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'product'], name='purchase_order_line_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} x {self.quantity}"
+
+
+class StockAlertEvent(models.Model):
+    """Outbox of stock status changes (in stock / low / out of stock).
+
+    Written by the code that changes a stock level or its minimum, in the same
+    transaction, and delivered by the dispatch_stock_alerts command. See
+    stock_app.alerts.
+    """
+    STATUS_CHOICES = [
+        ('OK', 'En stock'),
+        ('LOW', 'Stock faible'),
+        ('OUT', 'Rupture de stock'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_alerts', verbose_name="Produit")
+    previous_status = models.CharField(max_length=3, choices=STATUS_CHOICES, verbose_name="Statut précédent")
+    status = models.CharField(max_length=3, choices=STATUS_CHOICES, verbose_name="Statut")
+    current_stock = models.IntegerField(verbose_name="Stock actuel")
+    minimum_stock = models.IntegerField(verbose_name="Stock minimum")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Date")
+    dispatch_id = models.CharField(max_length=32, blank=True, verbose_name="Envoi")
+    dispatched_at = models.DateTimeField(null=True, blank=True, verbose_name="Date d'envoi")
+    attempts = models.IntegerField(default=0, verbose_name="Tentatives")
+    last_error = models.TextField(blank=True, verbose_name="Dernière erreur")
+    retry_at = models.DateTimeField(null=True, blank=True, verbose_name="Nouvel essai")
+    delivered_channels = models.JSONField(default=list, blank=True, verbose_name="Canaux livrés")
+
+    class Meta:
+        verbose_name = "Alerte de stock"
+        verbose_name_plural = "Alertes de stock"
+        ordering = ['-created_at']
+        indexes = [
+            # The dispatcher only reads the events not sent yet
+            models.Index(
+                fields=['product', 'created_at'], name='stock_alert_pending_idx',
+                condition=models.Q(dispatched_at__isnull=True),
+            ),
+            models.Index(fields=['dispatch_id'], name='stock_alert_dispatch_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name}: {self.get_previous_status_display()} -> {self.get_status_display()}"
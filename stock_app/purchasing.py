@@ -0,0 +1,188 @@
+"""
+Replenishment: purchase orders generated from the stock alerts.
+
+suggestions() finds what to order for the whole catalog in one query: the
+units already on open orders come from a subquery, and the quantity to
+order (up to maximum_stock, net of the stock and of what is on order) is
+computed by the database in the same statement, for every product at once.
+A product is suggested while its stock plus what is on order stays at or
+below its minimum stock, so generating orders twice does not order twice.
+
+generate_orders() turns the suggestions into one DRAFT PurchaseOrder per
+supplier (or per category), with one bulk insert of the orders and one of
+the lines; an order's reference is made from its id, so it is unique.
+Concurrent runs are serialized on the stock levels they may order, so
+they do not order the same products twice. A draft whose lines are all
+removed is deleted. receive_order() posts the lines as IN movements through
+apply_movements(), in one transaction, at the order's location.
+"""
+
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Location, PurchaseOrder, PurchaseOrderLine, StockLevel
+from .services import MovementLine, apply_movements
+
+# group_by -> field of StockLevel the orders are split on
+GROUPS = {
+    'supplier': 'product__supplier_id',
+    'category': 'product__category_id',
+}
+OPEN_STATUSES = ('DRAFT', 'ORDERED')
+LINE_BATCH = 1000
+APPLY_BATCH = 5000
+
+
+class OrderClosed(ValueError):
+    pass
+
+
+def on_order():
+    """Expression: units of the StockLevel's product on open purchase orders"""
+    return Coalesce(
+        Subquery(
+            PurchaseOrderLine.objects.filter(product_id=OuterRef('product_id'), order__status__in=OPEN_STATUSES)
+            .order_by().values('product_id').annotate(total=Sum('quantity')).values('total'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def suggestions(category=None, supplier=None):
+    """StockLevels of the active products to reorder, annotated with on_order and quantity"""
+    levels = StockLevel.objects.filter(product__is_active=True)
+    if category is not None:
+        levels = levels.filter(product__category=category)
+    if supplier is not None:
+        levels = levels.filter(product__supplier=supplier)
+    return (
+        levels.annotate(on_order=on_order())
+        .filter(current_stock__lte=F('minimum_stock') - F('on_order'))
+        .annotate(quantity=F('maximum_stock') - F('current_stock') - F('on_order'))
+        .filter(quantity__gt=0)
+    )
+
+
+def _lock_candidates(category=None, supplier=None):
+    """Take the write locks of the stock levels generate_orders() may order.
+
+    A no-op UPDATE, as in services._lock_stock_levels: a concurrent run for
+    the same products waits here until this one commits, then reads the
+    suggestions with its lines on order.
+    """
+    levels = StockLevel.objects.filter(product__is_active=True, current_stock__lte=F('minimum_stock'))
+    if category is not None:
+        levels = levels.filter(product__category=category)
+    if supplier is not None:
+        levels = levels.filter(product__supplier=supplier)
+    levels.update(last_updated=F('last_updated'))
+
+
+@transaction.atomic
+def generate_orders(user, group_by='supplier', category=None, supplier=None, location=None, notes=''):
+    """Create the DRAFT orders of the current suggestions, one per group; returns the orders"""
+    group_field = GROUPS[group_by]
+    _lock_candidates(category, supplier)
+    lines = defaultdict(list)
+    rows = suggestions(category, supplier).values_list('product_id', group_field, 'quantity', 'product__cost_price')
+    for product_id, group_id, quantity, unit_cost in rows.iterator(chunk_size=2000):
+        lines[group_id].append(PurchaseOrderLine(product_id=product_id, quantity=quantity, unit_cost=unit_cost))
+    if not lines:
+        return []
+
+    day = f'{timezone.localdate():%Y%m%d}'
+    location = location or Location.default()
+    groups = sorted(lines, key=lambda group_id: (group_id is None, group_id))
+    orders = PurchaseOrder.objects.bulk_create([
+        PurchaseOrder(
+            # Placeholder until the id is known
+            reference=f'CF-{uuid.uuid4().hex}',
+            **{f'{group_by}_id': group_id},
+            location=location,
+            notes=notes,
+            line_count=len(lines[group_id]),
+            total_cost=sum((line.quantity * line.unit_cost for line in lines[group_id]), Decimal('0.00')),
+            created_by=user,
+        )
+        for group_id in groups
+    ])
+    for order, group_id in zip(orders, groups):
+        order.reference = f'CF-{day}-{order.pk}'
+        for line in lines[group_id]:
+            line.order = order
+    PurchaseOrder.objects.bulk_update(orders, ['reference'])
+    PurchaseOrderLine.objects.bulk_create(
+        [line for group_id in groups for line in lines[group_id]], batch_size=LINE_BATCH,
+    )
+    return orders
+
+
+def _transition(order, statuses, status, **fields):
+    """Move order from one of statuses to status; raises OrderClosed if it was not in them"""
+    if not PurchaseOrder.objects.filter(pk=order.pk, status__in=statuses).update(status=status, **fields):
+        raise OrderClosed(f"La commande {order.reference} n'est plus modifiable")
+    order.status = status
+    for name, value in fields.items():
+        setattr(order, name, value)
+
+
+def _refresh_totals(order):
+    totals = order.lines.aggregate(
+        count=Count('id'),
+        cost=Sum(ExpressionWrapper(F('quantity') * F('unit_cost'), output_field=DecimalField(max_digits=14, decimal_places=2))),
+    )
+    order.line_count = totals['count'] or 0
+    order.total_cost = totals['cost'] or Decimal('0.00')
+    order.save(update_fields=['line_count', 'total_cost'])
+
+
+@transaction.atomic
+def update_quantities(order, quantities):
+    """Change the quantities of a DRAFT order's lines ({line_id: quantity}); 0 removes the line.
+
+    Returns the number of lines left; a draft left without lines is deleted.
+    """
+    # Also takes the write lock before the lines are read (see services._lock_stock_levels)
+    _transition(order, ('DRAFT',), 'DRAFT')
+    lines = {line.pk: line for line in order.lines.filter(pk__in=list(quantities))}
+    changed = [line for line_id, line in lines.items() if quantities[line_id] > 0]
+    for line in changed:
+        line.quantity = quantities[line.pk]
+    PurchaseOrderLine.objects.bulk_update(changed, ['quantity'], batch_size=LINE_BATCH)
+    order.lines.filter(pk__in=[line_id for line_id in lines if quantities[line_id] <= 0]).delete()
+    _refresh_totals(order)
+    if not order.line_count:
+        order.delete()
+    return order.line_count
+
+
+def mark_ordered(order):
+    """The draft was sent to the supplier"""
+    _transition(order, ('DRAFT',), 'ORDERED')
+
+
+def cancel_order(order):
+    _transition(order, OPEN_STATUSES, 'CANCELLED')
+
+
+@transaction.atomic
+def receive_order(order, user):
+    """Post every line of order as an IN movement; returns the movements"""
+    _transition(order, OPEN_STATUSES, 'RECEIVED', received_by=user, received_at=timezone.now())
+    location = order.location or Location.default()
+    lines = [
+        MovementLine(line.product, 'IN', line.quantity, location)
+        for line in order.lines.select_related('product').iterator(chunk_size=2000)
+    ]
+    movements = []
+    notes = f'Réception commande {order.reference}'
+    for start in range(0, len(lines), APPLY_BATCH):
+        movements += apply_movements(lines[start:start + APPLY_BATCH], user, reference=order.reference, notes=notes)
+    return movements
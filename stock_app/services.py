@@ -0,0 +1,318 @@
+"""
+Stock mutation service.
+
+apply_movements() is the only code that changes stock: it locks the affected
+stock levels, validates and applies the changes to the per-location stock
+(LocationStock) and to the product totals (StockLevel), records the
+StockMovements, updates the running totals and queues the low-stock alerts
+(see stock_app.alerts) in one transaction; the new levels are pushed to the
+live pages once it commits.
+create_stock_levels() opens new levels with their initial stock the same way,
+and set_thresholds() changes the minimum and maximum of a locked level.
+
+Movements apply to a location, the default one when none is given. A
+TRANSFER debits its location and credits to_location, leaving the product
+total unchanged.
+"""
+
+from typing import NamedTuple
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from core_app import fragments, live
+from products_app import catalog
+from . import alerts, counters
+from .models import Location, LocationStock, StockLevel, StockMovement
+
+
+class InsufficientStock(ValueError):
+    def __init__(self, product, available, requested, location=None):
+        self.product = product
+        self.available = available
+        self.requested = requested
+        self.location = location
+        where = f' ({location.name})' if location is not None and not location.is_default else ''
+        super().__init__(
+            f'Stock insuffisant pour {product.name}{where}. '
+            f'Disponible: {available}, Demandé: {requested}'
+        )
+
+
+def resulting_stock(current_stock, movement_type, quantity):
+    """Stock level after applying a movement of the given type"""
+    if movement_type == 'IN':
+        return current_stock + quantity
+    if movement_type == 'OUT':
+        return current_stock - quantity
+    if movement_type == 'ADJUSTMENT':
+        return quantity
+    return current_stock
+
+
+def apply_to_locations(stock, product_id, location_id, to_location_id, movement_type, quantity):
+    """Apply a movement to stock ({(product_id, location_id): quantity}) in place.
+
+    Returns the new stock of the movement's location. A TRANSFER without a
+    destination (recorded before locations existed) changes nothing.
+    """
+    key = (product_id, location_id)
+    current = stock.get(key, 0)
+    if movement_type == 'TRANSFER':
+        if to_location_id is None:
+            return current
+        to_key = (product_id, to_location_id)
+        stock[to_key] = stock.get(to_key, 0) + quantity
+        stock[key] = current - quantity
+    else:
+        stock[key] = resulting_stock(current, movement_type, quantity)
+    return stock[key]
+
+
+class MovementLine(NamedTuple):
+    product: object
+    movement_type: str
+    quantity: int
+    # Locations, None for the default one; to_location is the destination of a TRANSFER
+    location: object = None
+    to_location: object = None
+
+
+def _lock_stock_levels(products):
+    """Fetch the stock levels of products, locked until the end of the transaction.
+
+    Returns {product_id: (stock_level, created)}; missing levels are created.
+    The rows are touched with an UPDATE before being read: on PostgreSQL this
+    takes the row locks, and on SQLite (where select_for_update() is a no-op)
+    it takes the database write lock up front, so a concurrent writer waits
+    instead of failing on a read-to-write lock upgrade.
+    """
+    product_ids = [product.pk for product in products]
+    now = timezone.now()
+    StockLevel.objects.filter(product_id__in=product_ids).update(last_updated=now)
+    levels = {
+        level.product_id: (level, False)
+        for level in StockLevel.objects.select_for_update().filter(product_id__in=product_ids)
+    }
+    missing = [StockLevel(product=product) for product in products if product.pk not in levels]
+    for level in StockLevel.objects.bulk_create(missing):
+        levels[level.product_id] = (level, True)
+    return levels
+
+
+def _location_stocks(keys, levels, default):
+    """{(product_id, location_id): LocationStock} for keys; missing rows are unsaved.
+
+    Called with the stock levels of the products locked, which serializes
+    every change to their location rows. A missing default-location row
+    (stock level created outside this module) starts with the part of the
+    total not held elsewhere.
+    """
+    product_ids = {product_id for product_id, _ in keys}
+    rows = {
+        (row.product_id, row.location_id): row
+        for row in LocationStock.objects.filter(
+            product_id__in=product_ids, location_id__in={location_id for _, location_id in keys},
+        )
+    }
+    missing = [key for key in keys if key not in rows]
+    elsewhere = {}
+    if any(location_id == default.pk and not levels[product_id][1] for product_id, location_id in missing):
+        elsewhere = dict(
+            LocationStock.objects.filter(product_id__in=product_ids).exclude(location=default)
+            .order_by().values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total')
+        )
+    for product_id, location_id in missing:
+        quantity = 0
+        if location_id == default.pk and not levels[product_id][1]:
+            quantity = max(levels[product_id][0].current_stock - elsewhere.get(product_id, 0), 0)
+        rows[product_id, location_id] = LocationStock(product_id=product_id, location_id=location_id, quantity=quantity)
+    return rows
+
+
+def publish_levels(levels):
+    """Push the new stock of levels to the live stock pages (see core_app.live)"""
+    if levels:
+        live.publish('stock', {'levels': [
+            {
+                'product_id': level.product_id,
+                'current_stock': level.current_stock,
+                'minimum_stock': level.minimum_stock,
+                'status': alerts.status(level.current_stock, level.minimum_stock),
+            }
+            for level in levels
+        ]})
+
+
+@transaction.atomic
+def apply_movements(lines, user, reference='', notes=''):
+    """Record a batch of stock movements and apply them to the stock levels.
+
+    All affected stock levels are locked and fetched in one query and every
+    line is validated against its location before anything is written, so
+    the number of queries does not depend on the number of lines. Raises
+    InsufficientStock (a ValueError) for the first line that would make a
+    stock negative, in which case nothing is written.
+    """
+    lines = list(lines)
+    if not lines:
+        return []
+
+    for line in lines:
+        if line.movement_type == 'TRANSFER' and (line.to_location is None or line.to_location == line.location):
+            raise ValueError('Un transfert nécessite un emplacement de destination différent')
+
+    products = {line.product.pk: line.product for line in lines}
+    levels = _lock_stock_levels(list(products.values()))
+    # Read after the lock: on SQLite a read first would turn the lock into an upgrade
+    default = Location.default()
+    locations = {default.pk: default}
+    for line in lines:
+        for location in (line.location, line.to_location):
+            if location is not None:
+                locations[location.pk] = location
+
+    def location_id(location):
+        return default.pk if location is None else location.pk
+    keys = set()
+    for line in lines:
+        keys.add((line.product.pk, location_id(line.location)))
+        if line.movement_type == 'TRANSFER':
+            keys.add((line.product.pk, location_id(line.to_location)))
+    rows = _location_stocks(keys, levels, default)
+
+    # Validate every line against the locked levels before writing
+    stock = {key: row.quantity for key, row in rows.items()}
+    for line in lines:
+        source = location_id(line.location)
+        available = stock[line.product.pk, source]
+        new_stock = apply_to_locations(
+            stock, line.product.pk, source,
+            location_id(line.to_location) if line.to_location is not None else None,
+            line.movement_type, line.quantity,
+        )
+        if new_stock < 0:
+            raise InsufficientStock(line.product, available, line.quantity, locations[source])
+
+    now = timezone.now()
+    changed_rows, new_rows = [], []
+    product_delta = dict.fromkeys(products, 0)
+    for key, row in rows.items():
+        if stock[key] == row.quantity and row.pk is not None:
+            continue
+        product_delta[key[0]] += stock[key] - row.quantity
+        row.quantity = stock[key]
+        row.last_updated = now
+        (changed_rows if row.pk is not None else new_rows).append(row)
+    if changed_rows:
+        LocationStock.objects.bulk_update(changed_rows, ['quantity', 'last_updated'])
+    if new_rows:
+        LocationStock.objects.bulk_create(new_rows)
+
+    changed, crossings = [], []
+    delta = counters.EMPTY
+    for product_id, (level, created) in levels.items():
+        price = products[product_id].price
+        before = counters.EMPTY if created else counters.level_state(
+            level.current_stock, level.minimum_stock, price
+        )
+        if product_delta[product_id] and not created:
+            crossings.append((
+                product_id,
+                (level.current_stock, level.minimum_stock),
+                (level.current_stock + product_delta[product_id], level.minimum_stock),
+            ))
+        level.current_stock += product_delta[product_id]
+        level.last_updated = now
+        delta += counters.level_state(level.current_stock, level.minimum_stock, price) - before
+        if product_delta[product_id]:
+            changed.append(level)
+    if changed:
+        StockLevel.objects.bulk_update(changed, ['current_stock', 'last_updated'])
+    alerts.record(crossings)
+    # Every locked level got a new last_updated; bulk writes send no signals
+    catalog.invalidate(StockLevel, levels)
+    fragments.bump('stock')
+    publish_levels(changed)
+
+    movements = StockMovement.objects.bulk_create([
+        StockMovement(
+            product=line.product,
+            movement_type=line.movement_type,
+            quantity=line.quantity,
+            location=locations[location_id(line.location)],
+            to_location=line.to_location,
+            reference=reference,
+            notes=notes,
+            created_by=user,
+        )
+        for line in lines
+    ])
+    counters.record(delta)
+    return movements
+
+
+@transaction.atomic
+def create_stock_levels(levels, user, reference='', notes=''):
+    """Create stock levels for products that have none, with their opening stock.
+
+    levels are unsaved StockLevel instances with product set; the opening
+    stock is held at the default location and, when non-zero, recorded in the
+    ledger as an ADJUSTMENT. This avoids
+    the lock/update round trip of apply_movements() for rows that cannot
+    exist yet, e.g. products created by a bulk import.
+    """
+    levels = StockLevel.objects.bulk_create(levels)
+    catalog.invalidate(StockLevel, [level.product_id for level in levels])
+    fragments.bump('stock')
+    default = Location.default()
+    LocationStock.objects.bulk_create([
+        LocationStock(product=level.product, location=default, quantity=level.current_stock)
+        for level in levels
+    ])
+    StockMovement.objects.bulk_create([
+        StockMovement(
+            product=level.product,
+            movement_type='ADJUSTMENT',
+            quantity=level.current_stock,
+            location=default,
+            reference=reference,
+            notes=notes,
+            created_by=user,
+        )
+        for level in levels if level.current_stock
+    ])
+    delta = counters.EMPTY
+    for level in levels:
+        delta += counters.level_state(level.current_stock, level.minimum_stock, level.product.price)
+    counters.record(delta)
+    return levels
+
+
+@transaction.atomic
+def set_thresholds(product, minimum_stock, maximum_stock):
+    """Change the minimum and maximum stock of product; returns its StockLevel.
+
+    The level is locked and read again first, so the totals and the alerts
+    are computed from the current stock, and only the thresholds are written.
+    """
+    level, _ = _lock_stock_levels([product])[product.pk]
+    old_minimum = level.minimum_stock
+    before = counters.level_state(level.current_stock, old_minimum, product.price)
+    level.minimum_stock, level.maximum_stock = minimum_stock, maximum_stock
+    level.save(update_fields=['minimum_stock', 'maximum_stock', 'last_updated'])
+    counters.record(counters.level_state(level.current_stock, minimum_stock, product.price) - before)
+    alerts.record([(product.pk, (level.current_stock, old_minimum), (level.current_stock, minimum_stock))])
+    return level
+
+
+def apply_movement(product, movement_type, quantity, user, reference='', notes='', location=None, to_location=None):
+    """Record a single stock movement, see apply_movements()"""
+    movements = apply_movements(
+        [MovementLine(product, movement_type, quantity, location, to_location)],
+        user,
+        reference=reference,
+        notes=notes,
+    )
+    return movements[0]
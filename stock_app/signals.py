@@ -0,0 +1,82 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core_app import fragments
+from products_app import catalog
+from products_app.models import Product
+from . import counters
+from .models import Location, LocationStock, StockLevel, StockMovement
+from .services import publish_levels
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_state(sender, instance, raw=False, **kwargs):
+    """Keep the stored price/status so post_save can update the totals"""
+    instance._counter_previous = None
+    if instance.pk and not raw:
+        instance._counter_previous = (
+            Product.objects.filter(pk=instance.pk).values('price', 'is_active').first()
+        )
+
+
+@receiver(post_save, sender=Product)
+def update_totals_for_product(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_counter_previous', None)
+    if created or previous is None:
+        counters.record(counters.product_state(instance.is_active))
+        return
+
+    delta = counters.product_state(instance.is_active) - counters.product_state(previous['is_active'])
+    if previous['price'] != instance.price:
+        level = StockLevel.objects.filter(product=instance).values('current_stock', 'minimum_stock').first()
+        if level:
+            delta += (
+                counters.level_state(level['current_stock'], level['minimum_stock'], instance.price)
+                - counters.level_state(level['current_stock'], level['minimum_stock'], previous['price'])
+            )
+    counters.record(delta)
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_totals(sender, instance, **kwargs):
+    counters.record(-counters.product_state(instance.is_active))
+
+
+@receiver(post_save, sender=StockLevel)
+@receiver(post_delete, sender=StockLevel)
+def invalidate_cached_stock_level(sender, instance, **kwargs):
+    catalog.invalidate(StockLevel, [instance.product_id])
+    fragments.bump('stock')
+
+
+@receiver(post_save, sender=StockLevel)
+def publish_stock_level(sender, instance, raw=False, **kwargs):
+    if not raw:
+        publish_levels([instance])
+
+
+@receiver(post_save, sender=StockLevel)
+def place_new_stock_level(sender, instance, created, raw=False, **kwargs):
+    """A stock level created directly holds its stock at the default location"""
+    if created and not raw:
+        LocationStock.objects.get_or_create(
+            product_id=instance.product_id,
+            location=Location.default(),
+            defaults={'quantity': instance.current_stock},
+        )
+
+
+# No post_delete receiver: it would make every delete of movements load and
+# signal each row; the paths deleting movements bump 'stock' themselves
+@receiver(post_save, sender=StockMovement)
+def invalidate_stock_fragments(sender, instance, **kwargs):
+    fragments.bump('stock')
+
+
+@receiver(post_delete, sender=StockLevel)
+def remove_stock_level_from_totals(sender, instance, **kwargs):
+    price = Product.objects.filter(pk=instance.product_id).values_list('price', flat=True).first()
+    if price is not None:
+        counters.record(-counters.level_state(instance.current_stock, instance.minimum_stock, price))
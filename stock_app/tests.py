@@ -1,3 +1,993 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from tempfile import TemporaryDirectory
+from unittest import mock
+import os
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core import mail
+from django.core.management.base import CommandError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+from django.http import StreamingHttpResponse
+from django.test import TestCase, TransactionTestCase, override_settings
+import json
+import threading
+from django.urls import reverse
+from django.utils import timezone
+
+from products_app.models import Category, Product, Supplier
+from sales_app.models import Customer, ProductDailySalesRollup, Sale, SaleItem
+from core_app import fragments
+from core_app.pagination import CursorPaginator
+from . import alerts, analytics, archive, counters, counting, forecasting, ledger, purchasing
+from .exports import METRICS_EXPORT, STOCK_EXPORT
+from .forms import StockLevelForm
+from .models import (
+    ArchivedMovementMonth, Location, LocationStock, ProductMetrics, PurchaseOrder, PurchaseOrderLine, StockAlertEvent,
+    StockCount, StockLevel, StockMovement, StockSnapshot,
+)
+from .services import InsufficientStock, apply_movement
+
+
+def make_product(sku, price='10.00', category=None):
+    category = category or Category.objects.get_or_create(name='Divers')[0]
+    return Product.objects.create(
+        name=f'Produit {sku}', sku=sku, category=category,
+        price=Decimal(price), cost_price=Decimal('1.00'),
+    )
+
+
+class InventoryCountersTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('staff', password='secret')
+        self.client.force_login(self.user)
+        self.product = make_product('CNT-1')
+
+    def assertNoDrift(self):
+        self.assertEqual(counters.verify(), {})
+
+    def add_movement(self, movement_type, quantity, product=None):
+        return self.client.post(reverse('stock_app:add_movement'), {
+            'product': (product or self.product).pk,
+            'movement_type': movement_type,
+            'quantity': quantity,
+        })
+
+    def test_movements_keep_totals_in_sync(self):
+        self.add_movement('IN', 5)
+        totals = counters.current()
+        self.assertEqual(totals.total_units, 5)
+        self.assertEqual(totals.total_stock_value, Decimal('50.00'))
+        self.assertEqual(totals.low_stock_count, 0)
+
+        self.add_movement('OUT', 5)
+        self.assertEqual(counters.current().out_of_stock_count, 1)
+        self.add_movement('OUT', 1)  # refused, stock is empty
+        self.assertNoDrift()
+
+    def test_price_and_threshold_edits(self):
+        self.add_movement('IN', 3)
+        level = StockLevel.objects.get(product=self.product)
+
+        self.product.price = Decimal('12.50')
+        self.product.save()
+        self.assertEqual(counters.current().total_stock_value, Decimal('37.50'))
+
+        self.client.post(reverse('stock_app:update_stock_level', args=[level.pk]), {
+            'minimum_stock': 5, 'maximum_stock': 100,
+        })
+        self.assertEqual(counters.current().low_stock_count, 1)
+        self.assertNoDrift()
+
+        self.product.delete()
+        self.assertNoDrift()
+
+    def test_sale_completion_and_cancellation(self):
+        self.add_movement('IN', 10)
+        sale = Sale.objects.create(customer=Customer.objects.create(name='Client'), created_by=self.user)
+        SaleItem.objects.create(sale=sale, product=self.product, quantity=4, unit_price=self.product.price)
+
+        sale.complete_sale(self.user)
+        self.assertEqual(counters.current().total_units, 6)
+        sale.cancel_sale(self.user)
+        self.assertEqual(counters.current().total_units, 10)
+        self.assertNoDrift()
+
+    def test_rebuild_command_repairs_drift(self):
+        StockLevel.objects.create(product=self.product, current_stock=7)
+        self.assertIn('total_units', counters.verify())
+
+        call_command('rebuild_stock_counters', stdout=StringIO())
+        self.assertNoDrift()
+
+
+class StockLedgerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('staff', password='secret')
+        self.product = make_product('LED-1')
+        self.other = make_product('LED-2')
+        self.start = timezone.now() - timedelta(days=10)
+
+    def move(self, day, movement_type, quantity, product=None):
+        movement = apply_movement(product or self.product, movement_type, quantity, self.user)
+        StockMovement.objects.filter(pk=movement.pk).update(created_at=self.start + timedelta(days=day))
+
+    def history(self):
+        self.move(0, 'IN', 10)
+        self.move(1, 'OUT', 4)
+        self.move(2, 'IN', 5, product=self.other)
+        self.move(3, 'ADJUSTMENT', 8)
+        self.move(5, 'OUT', 3)
+
+    def test_stock_at_replays_the_ledger(self):
+        self.history()
+        expected = {-1: 0, 0: 10, 1: 6, 2: 6, 3: 8, 4: 8, 5: 5, 9: 5}
+        for day, stock in expected.items():
+            self.assertEqual(ledger.stock_at(self.product, self.start + timedelta(days=day, hours=1)), stock)
+        self.assertEqual(ledger.stock_at(self.other, self.start + timedelta(days=2)), 5)
+
+    def test_snapshots_bound_the_replay(self):
+        self.history()
+        at = self.start + timedelta(days=4)
+        self.assertEqual(ledger.take_snapshots(at), 2)
+        self.assertEqual(StockSnapshot.objects.get(product=self.product, taken_at=at).quantity, 8)
+
+        # Only the movements after the snapshot are read
+        StockMovement.objects.filter(created_at__lte=at).delete()
+        self.assertEqual(ledger.stock_at(self.product, self.start + timedelta(days=6)), 5)
+        self.assertEqual(ledger.stock_levels_at(self.start + timedelta(days=6)), {self.product.pk: 5, self.other.pk: 5})
+
+    def test_prune_keeps_month_starts(self):
+        now = timezone.now()
+        first = timezone.make_aware(timezone.datetime(now.year - 1, 1, 1))
+        for taken_at in (first, first + timedelta(days=1), now):
+            StockSnapshot.objects.create(product=self.product, taken_at=taken_at, quantity=1)
+
+        self.assertEqual(ledger.prune(keep_days=90), 1)
+        self.assertEqual(StockSnapshot.objects.count(), 2)
+
+    def test_reconcile_command_reports_drift(self):
+        self.history()
+        call_command('reconcile_stock', stdout=StringIO())
+
+        StockLevel.objects.filter(product=self.other).update(current_stock=7)
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('reconcile_stock', stdout=out)
+        self.assertIn('LED-2: stock=7 ledger=5', out.getvalue())
+
+    def test_stock_at_endpoint(self):
+        self.history()
+        self.client.force_login(self.user)
+        day = timezone.localtime(self.start + timedelta(days=1)).date()
+        response = self.client.get(reverse('stock_app:stock_at'), {'at': day.isoformat(), 'product': self.product.pk})
+        self.assertEqual(response.json()['stock'], [
+            {'product_id': self.product.pk, 'product_name': 'Produit LED-1', 'sku': 'LED-1', 'stock': 6},
+        ])
+        self.assertEqual(self.client.get(reverse('stock_app:stock_at'), {'at': 'hier'}).status_code, 400)
+
+
+class StockArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('staff', password='secret')
+        self.client.force_login(self.user)
+        media_root = TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.media_root = media_root.name
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.product = make_product('ARC-1')
+        self.now = timezone.now()
+        for days_ago, movement_type, quantity in ((95, 'IN', 10), (94, 'OUT', 1), (65, 'OUT', 3), (0, 'IN', 1)):
+            movement = apply_movement(self.product, movement_type, quantity, self.user, reference=f'R{days_ago}')
+            StockMovement.objects.filter(pk=movement.pk).update(created_at=self.now - timedelta(days=days_ago))
+        self.archived = archive.archive_movements(months=1, now=self.now)
+
+    def test_old_months_leave_the_table_with_their_balances(self):
+        self.assertEqual(sum(month.row_count for month in self.archived), 3)
+        self.assertEqual(list(StockMovement.objects.values_list('reference', flat=True)), ['R0'])
+
+        self.assertEqual(ledger.reconcile(), {})
+        self.assertEqual(ledger.stock_at(self.product, self.now), 7)
+        # Before the last snapshot, the archived movements are replayed
+        self.assertEqual(ledger.stock_at(self.product, self.now - timedelta(days=94, hours=-1)), 9)
+        self.assertEqual(ledger.stock_at(self.product, self.now - timedelta(days=70)), 9)
+
+    def test_replay_without_a_snapshot_reads_every_archived_month(self):
+        StockSnapshot.objects.all().delete()
+        self.assertEqual(ledger.stock_at(self.product, self.now), 7)
+        self.assertEqual(ledger.stock_at(self.product, self.now - timedelta(days=70)), 9)
+
+    def test_movements_list_reads_the_archive_for_old_ranges(self):
+        url = reverse('stock_app:movements')
+        response = self.client.get(url)
+        self.assertEqual([m.reference for m in response.context['movements']], ['R0'])
+
+        date_from = timezone.localdate(self.now - timedelta(days=100)).isoformat()
+        response = self.client.get(url, {'date_from': date_from})
+        self.assertEqual([m.reference for m in response.context['movements']], ['R0', 'R65', 'R94', 'R95'])
+        self.assertContains(response, 'Archivé', count=3)
+
+        response = self.client.get(url, {'date_from': date_from, 'type': 'OUT'})
+        self.assertEqual([m.reference for m in response.context['movements']], ['R65', 'R94'])
+
+    def test_pages_run_from_the_table_into_the_archive(self):
+        tail = archive.MovementArchive(self.now - timedelta(days=100), None)
+        paginator = CursorPaginator(StockMovement.objects.all(), ('-created_at', '-id'), per_page=1, tail=tail)
+        page, seen = paginator.page(), []
+        while True:
+            seen.append(page[0].reference)
+            if not page.has_next():
+                break
+            page = paginator.page(page.next_cursor)
+        self.assertEqual(seen, ['R0', 'R65', 'R94', 'R95'])
+
+        page = paginator.page(page.previous_cursor)
+        self.assertEqual(page[0].reference, 'R94')
+        self.assertEqual(paginator.page('last')[0].reference, 'R95')
+
+    def test_rows_before_a_key_are_the_nearest_ones(self):
+        tail = archive.MovementArchive()
+        oldest = tail.rows(None, False, 1)[0]
+        self.assertEqual(oldest.reference, 'R95')
+        rows = tail.rows((oldest.created_at, oldest.id), False, 2)
+        self.assertEqual([row.reference for row in rows], ['R94', 'R65'])
+
+    def test_export_includes_archived_rows_in_range(self):
+        date_from = timezone.localdate(self.now - timedelta(days=100)).isoformat()
+        response = self.client.get(reverse('stock_app:export_movements'), {'date_from': date_from})
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(content.count('\n'), 5)  # header + 4 movements
+        self.assertIn('R95', content)
+
+        response = self.client.get(reverse('stock_app:export_movements'))
+        self.assertNotIn('R95', b''.join(response.streaming_content).decode())
+
+    def test_count_reads_the_manifests(self):
+        with mock.patch.object(archive, '_stream', side_effect=AssertionError('file read')):
+            self.assertEqual(archive.MovementArchive().count(), 3)
+            self.assertEqual(archive.MovementArchive(movement_type='OUT').count(), 2)
+            self.assertEqual(archive.MovementArchive(product_id=str(self.product.pk)).count(), 3)
+        # A range starting inside a month reads that month
+        self.assertEqual(archive.MovementArchive(self.now - timedelta(days=65, hours=1)).count(), 1)
+
+    def test_failed_archival_keeps_the_rows_and_removes_the_file(self):
+        movement = apply_movement(self.product, 'IN', 2, self.user, reference='R400')
+        StockMovement.objects.filter(pk=movement.pk).update(created_at=self.now - timedelta(days=400))
+        month = timezone.localdate(self.now - timedelta(days=400)).replace(day=1)
+        files = set(os.listdir(os.path.join(self.media_root, 'archives', 'stock_movements')))
+
+        with mock.patch.object(archive.fragments, 'bump', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                archive.archive_month(month)
+        self.assertFalse(ArchivedMovementMonth.objects.filter(month=month).exists())
+        self.assertTrue(StockMovement.objects.filter(pk=movement.pk).exists())
+        self.assertEqual(set(os.listdir(os.path.join(self.media_root, 'archives', 'stock_movements'))), files)
+
+    def test_month_cannot_be_archived_twice(self):
+        with self.assertRaises(ValueError):
+            archive.archive_month(self.archived[0].month)
+        self.assertEqual(ArchivedMovementMonth.objects.count(), len(self.archived))
+
+
+class StockLocationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('staff', password='secret')
+        self.client.force_login(self.user)
+        self.main = Location.default()
+        self.depot = Location.objects.create(code='NORD', name='Dépôt Nord')
+        self.product = make_product('LOC-1')
+        apply_movement(self.product, 'IN', 10, self.user)
+
+    def placed(self):
+        return dict(LocationStock.objects.filter(product=self.product).values_list('location__code', 'quantity'))
+
+    def total(self):
+        return StockLevel.objects.get(product=self.product).current_stock
+
+    def test_transfer_moves_stock_between_locations(self):
+        apply_movement(self.product, 'TRANSFER', 4, self.user, to_location=self.depot)
+        self.assertEqual(self.placed(), {'PRINCIPAL': 6, 'NORD': 4})
+        self.assertEqual(self.total(), 10)
+
+        with self.assertRaises(InsufficientStock) as raised:
+            apply_movement(self.product, 'TRANSFER', 5, self.user, location=self.depot, to_location=self.main)
+        self.assertIn('(Dépôt Nord)', str(raised.exception))
+        # The total would allow it, the default location does not
+        with self.assertRaises(InsufficientStock):
+            apply_movement(self.product, 'OUT', 7, self.user)
+        with self.assertRaises(ValueError):
+            apply_movement(self.product, 'TRANSFER', 1, self.user)
+
+        self.assertEqual(self.placed(), {'PRINCIPAL': 6, 'NORD': 4})
+        self.assertEqual(counters.verify(), {})
+        self.assertEqual(ledger.reconcile(), {})
+
+    def test_ledger_replays_each_location(self):
+        apply_movement(self.product, 'TRANSFER', 4, self.user, to_location=self.depot)
+        ledger.take_snapshots(timezone.now())
+        # Sets the depot only: the total becomes 6 + 1
+        apply_movement(self.product, 'ADJUSTMENT', 1, self.user, location=self.depot)
+        self.assertEqual(self.total(), 7)
+
+        now = timezone.now()
+        self.assertEqual(ledger.stock_at(self.product, now), 7)
+        self.assertEqual(ledger.stock_at(self.product, now, self.depot), 1)
+        self.assertEqual(ledger.reconcile(), {})
+        response = self.client.get(reverse('stock_app:stock_at'), {'at': now.isoformat(), 'location': 'NORD'})
+        self.assertEqual(response.json()['stock'][0]['stock'], 1)
+
+    def test_movement_form_and_location_pages(self):
+        url = reverse('stock_app:add_movement')
+        data = {'product': self.product.pk, 'movement_type': 'TRANSFER', 'quantity': 3}
+        response = self.client.post(url, data)
+        self.assertIn('to_location', response.context['form'].errors)
+        self.assertRedirects(self.client.post(url, {**data, 'to_location': self.depot.pk}), reverse('stock_app:movements'))
+
+        self.assertContains(self.client.get(reverse('stock_app:movements')), 'NORD')
+        locations = {location.code: location.units for location in self.client.get(reverse('stock_app:locations')).context['locations']}
+        self.assertEqual(locations, {'PRINCIPAL': 7, 'NORD': 3})
+        self.assertContains(self.client.get(reverse('stock_app:location_detail', args=[self.depot.pk])), 'LOC-1')
+
+    def test_stock_level_created_directly_is_held_at_the_default_location(self):
+        other = make_product('LOC-2')
+        StockLevel.objects.create(product=other, current_stock=5)
+        apply_movement(other, 'OUT', 2, self.user)
+        self.assertEqual(LocationStock.objects.get(product=other, location=self.main).quantity, 3)
+
+
+class InventoryAnalyticsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('staff', password='secret')
+        self.client.force_login(self.user)
+        self.products = [make_product(f'ABC-{i}') for i in range(4)]
+        for product, received in zip(self.products, (20, 4, 2, 5)):
+            apply_movement(product, 'IN', received, self.user)
+        apply_movement(self.products[0], 'OUT', 10, self.user)
+        today = timezone.localdate()
+        for product, units, revenue in zip(self.products, (10, 3, 1), ('800.00', '150.00', '50.00')):
+            ProductDailySalesRollup.objects.create(date=today, product=product, units=units, revenue=Decimal(revenue))
+        # Never sold, and old enough to count as dead stock
+        Product.objects.filter(pk=self.products[3].pk).update(created_at=timezone.now() - timedelta(days=200))
+
+    def metrics(self):
+        return {m.product.sku: m for m in ProductMetrics.objects.select_related('product')}
+
+    def test_compute_classifies_every_product(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(analytics.compute(), 4)
+        metrics = self.metrics()
+        self.assertEqual({sku: m.abc_class for sku, m in metrics.items()}, {'ABC-0': 'A', 'ABC-1': 'B', 'ABC-2': 'C', 'ABC-3': 'C'})
+        # Nothing was in stock a year ago: the average stock is half the current one
+        self.assertEqual(metrics['ABC-0'].average_stock, 5.0)
+        self.assertEqual(metrics['ABC-0'].turnover, 2.0)
+        self.assertAlmostEqual(metrics['ABC-0'].days_of_cover, 365.0)
+        self.assertIsNotNone(metrics['ABC-0'].last_out_at)
+        self.assertIsNone(metrics['ABC-3'].days_of_cover)
+        self.assertEqual([sku for sku, m in metrics.items() if m.is_dead_stock], ['ABC-3'])
+        self.assertEqual(metrics['ABC-1'].revenue, Decimal('150.00'))
+
+        # The queries do not depend on the number of products
+        more = [make_product(f'MORE-{i}') for i in range(20)]
+        query_count = len(queries)
+        for product in more:
+            apply_movement(product, 'IN', 1, self.user)
+        with CaptureQueriesContext(connection) as queries:
+            analytics.compute()
+        self.assertEqual(len(queries), query_count)
+        self.assertEqual(ProductMetrics.objects.count(), 24)
+
+    def test_metrics_are_shown_filtered_and_exported(self):
+        call_command('compute_inventory_metrics', '--days', '30', stdout=StringIO())
+
+        response = self.client.get(reverse('stock_app:stock_list'), {'analysis': 'dead'})
+        self.assertEqual([level.product.sku for level in response.context['stock_levels']], ['ABC-3'])
+        response = self.client.get(reverse('stock_app:stock_list'), {'abc': 'A'})
+        self.assertEqual([level.product.sku for level in response.context['stock_levels']], ['ABC-0'])
+        self.assertEqual(sorted(row[1] for row in STOCK_EXPORT.iter_rows({'abc': 'C'})), ['ABC-2', 'ABC-3'])
+
+        response = self.client.get(reverse('products_app:product_detail', args=[self.products[1].pk]))
+        self.assertEqual(response.context['metrics'].abc_class, 'B')
+        self.assertEqual(response.context['metrics'].period_days, 30)
+        # 4 in stock, 3 sold in 30 days: 40 days of cover
+        rows = list(METRICS_EXPORT.iter_rows({'search': 'ABC-1'}))
+        self.assertEqual(rows[0][2:8], ['B', 3, Decimal('150.00'), 2.0, 1.5, 40.0])
+
+
+class StockForecastTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('staff', password='secret')
+        # Run the fragment bumps: later ones in the test transaction would join them
+        with self.captureOnCommitCallbacks(execute=True):
+            self.steady, self.unsold = make_product('FC-1'), make_product('FC-2')
+            apply_movement(self.steady, 'IN', 5, self.user)
+            apply_movement(self.unsold, 'IN', 5, self.user)
+        today = timezone.localdate()
+        # 7 units a week for 20 weeks
+        for week in range(20):
+            ProductDailySalesRollup.objects.create(
+                date=today - timedelta(days=7 * week), product=self.steady, units=7, revenue=Decimal('70.00'),
+            )
+
+    def test_levels_follow_the_demand(self):
+        levels = forecasting.forecast(weeks=20, lead_time=7, review_days=14, service_level=0.95)
+        # No variability: one week of demand over the lead time, two more over the review period
+        self.assertEqual(levels, {self.steady.pk: (7, 21)})
+
+        before = fragments.versions(['stock'])
+        with mock.patch('core_app.live._deliver') as deliver, self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(forecasting.apply_levels(levels), 1)
+        self.assertNotEqual(fragments.versions(['stock']), before)
+        channel, data = deliver.call_args.args
+        self.assertEqual(channel, 'stock')
+        self.assertEqual(json.loads(data)['levels'], [
+            {'product_id': self.steady.pk, 'current_stock': 5, 'minimum_stock': 7, 'status': 'LOW'},
+        ])
+        self.assertEqual(forecasting.apply_levels(levels), 0)
+        level = StockLevel.objects.get(product=self.steady)
+        self.assertEqual((level.minimum_stock, level.maximum_stock), (7, 21))
+        self.assertEqual(StockLevel.objects.get(product=self.unsold).minimum_stock, 0)
+        # 5 in stock, under the new reorder point
+        self.assertEqual(counters.current().low_stock_count, 1)
+        self.assertEqual(counters.verify(), {})
+
+    def test_irregular_demand_raises_the_reorder_point(self):
+        irregular = make_product('FC-3')
+        today = timezone.localdate()
+        for week in range(20):
+            ProductDailySalesRollup.objects.create(
+                date=today - timedelta(days=7 * week), product=irregular, units=14 if week % 2 else 1, revenue=Decimal('10.00'),
+            )
+        levels = forecasting.forecast(weeks=20, lead_time=7, review_days=7, service_level=0.95)
+        self.assertGreater(levels[irregular.pk][0], 8)
+        self.assertLess(levels[irregular.pk][0], levels[irregular.pk][1])
+
+        out = StringIO()
+        call_command('forecast_stock_levels', '--weeks', '20', '--workers', '1', '--dry-run', stdout=out)
+        self.assertIn('2 product(s) forecast', out.getvalue())
+        self.assertEqual(StockLevel.objects.get(product=self.steady).minimum_stock, 0)
+
+
+class SeasonalIndexTests(TestCase):
+    @staticmethod
+    def _demand(*products, horizon=1):
+        series = [forecasting.pa.array(week, forecasting.pa.float64()) for week in zip(*products)]
+        return forecasting._fit(series, horizon)[0].to_pylist()
+
+    def test_index_reads_the_coming_weeks_one_year_ago(self):
+        weeks = [1.0] * 60
+        weeks[-forecasting.SEASON_WEEKS + 1] = 3.0
+        # The next week sold three times the average a year ago: bounded to twice the demand
+        self.assertAlmostEqual(self._demand(weeks)[0], forecasting.SEASONAL_BOUND, places=6)
+
+    def test_products_sold_for_less_than_a_year_have_no_index(self):
+        recent = [0.0] * 40 + [7.0] * 20
+        # Without the index the forecast stays at the recent demand, not half of it
+        self.assertAlmostEqual(self._demand(recent)[0], 7.0, places=1)
+
+
+class ParallelStockForecastTests(TransactionTestCase):
+    def test_worker_processes_match_a_single_process(self):
+        today = timezone.localdate()
+        for index in range(4):
+            product = make_product(f'PFC-{index}')
+            for week in range(30):
+                ProductDailySalesRollup.objects.create(
+                    date=today - timedelta(days=7 * week), product=product, units=(week * (index + 1)) % 9,
+                    revenue=Decimal('1.00'),
+                )
+        expected = forecasting.forecast(weeks=30, workers=1)
+        self.assertEqual(len(expected), 4)
+        self.assertEqual(forecasting.forecast(weeks=30, workers=2), expected)
+
+
+class PurchaseOrderTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', password='secret')
+        self.client.force_login(self.user)
+        self.supplier = Supplier.objects.create(name='Legrand')
+        self.low, self.enough, self.orphan = make_product('PO-1'), make_product('PO-2'), make_product('PO-3')
+        Product.objects.filter(pk__in=[self.low.pk, self.enough.pk]).update(supplier=self.supplier)
+        for product, stock in ((self.low, 2), (self.enough, 10)):
+            apply_movement(product, 'IN', stock, self.user)
+        StockLevel.objects.create(product=self.orphan)
+        StockLevel.objects.update(minimum_stock=5, maximum_stock=20)
+        counters.rebuild()
+
+    def test_suggestions_are_one_query_and_skip_what_is_on_order(self):
+        with self.assertNumQueries(1):
+            suggested = dict(purchasing.suggestions().values_list('product__sku', 'quantity'))
+        self.assertEqual(suggested, {'PO-1': 18, 'PO-3': 20})
+
+        orders = purchasing.generate_orders(self.user)
+        self.assertEqual([(order.supplier_id, order.line_count) for order in orders], [(self.supplier.pk, 1), (None, 1)])
+        self.assertEqual(orders[0].total_cost, Decimal('18.00'))
+        self.assertEqual(purchasing.generate_orders(self.user), [])
+
+        self.assertEqual([order.reference for order in orders], [
+            f'CF-{timezone.localdate():%Y%m%d}-{order.pk}' for order in orders
+        ])
+
+        # Every line of the draft removed: it is deleted, and PO-3 is no longer covered
+        self.assertEqual(purchasing.update_quantities(orders[1], {orders[1].lines.get().pk: 0}), 0)
+        self.assertFalse(PurchaseOrder.objects.filter(pk=orders[1].pk).exists())
+        self.assertEqual(dict(purchasing.suggestions().values_list('product__sku', 'quantity')), {'PO-3': 20})
+
+        by_category = purchasing.generate_orders(self.user, group_by='category')
+        self.assertEqual([order.category.name for order in by_category], ['Divers'])
+
+    def test_receiving_posts_in_movements_once(self):
+        order = purchasing.generate_orders(self.user, supplier=self.supplier)[0]
+        line = order.lines.get()
+        purchasing.update_quantities(order, {line.pk: 8})
+        purchasing.mark_ordered(order)
+        with self.assertRaises(purchasing.OrderClosed):
+            purchasing.update_quantities(order, {line.pk: 9})
+
+        movements = purchasing.receive_order(order, self.user)
+        self.assertEqual([(m.movement_type, m.quantity, m.reference) for m in movements], [('IN', 8, order.reference)])
+        self.assertEqual(StockLevel.objects.get(product=self.low).current_stock, 10)
+        with self.assertRaises(purchasing.OrderClosed):
+            purchasing.receive_order(order, self.user)
+        with self.assertRaises(purchasing.OrderClosed):
+            purchasing.cancel_order(order)
+        self.assertEqual(counters.verify(), {})
+
+    def test_views(self):
+        url = reverse('stock_app:purchase_orders')
+        self.assertEqual(self.client.get(url).context['suggestion_count'], 2)
+        self.assertRedirects(self.client.post(url, {'group_by': 'supplier'}), url)
+        order = PurchaseOrder.objects.get(supplier=self.supplier)
+
+        detail = reverse('stock_app:purchase_order_detail', args=[order.pk])
+        self.assertContains(self.client.get(detail), 'PO-1')
+        other = PurchaseOrder.objects.get(supplier=None)
+        response = self.client.post(
+            reverse('stock_app:purchase_order_detail', args=[other.pk]), {f'quantity_{other.lines.get().pk}': '0'},
+        )
+        self.assertRedirects(response, url)
+        self.assertFalse(PurchaseOrder.objects.filter(pk=other.pk).exists())
+        self.assertContains(self.client.get(reverse('stock_app:alerts')), '18')
+        self.client.post(reverse('stock_app:purchase_order_action', args=[order.pk]), {'action': 'receive'})
+        self.assertEqual(PurchaseOrder.objects.get(pk=order.pk).status, 'RECEIVED')
+        self.assertEqual(StockLevel.objects.get(product=self.low).current_stock, 20)
+
+
+class StockAlertOutboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alerts', password='secret')
+        self.product = make_product('AL-1')
+        apply_movement(self.product, 'IN', 10, self.user)
+        StockLevel.objects.update(minimum_stock=3)
+        self.later = timezone.now() + timedelta(minutes=5)
+
+    def test_only_status_changes_are_recorded(self):
+        self.assertFalse(StockAlertEvent.objects.exists())
+        apply_movement(self.product, 'OUT', 2, self.user)
+        self.assertFalse(StockAlertEvent.objects.exists())
+        apply_movement(self.product, 'OUT', 8, self.user)
+        event = StockAlertEvent.objects.get()
+        self.assertEqual((event.previous_status, event.status, event.current_stock), ('OK', 'OUT', 0))
+
+        with self.assertRaises(InsufficientStock):
+            apply_movement(self.product, 'OUT', 1, self.user)
+        self.assertEqual(StockAlertEvent.objects.count(), 1)
+
+    @override_settings(STOCK_ALERT_EMAILS=['achats@example.com'], STOCK_ALERT_WEBHOOK_URL='')
+    def test_dispatch_is_debounced_and_collapsed(self):
+        apply_movement(self.product, 'OUT', 8, self.user)
+        self.assertEqual(alerts.dispatch(debounce=60), [])
+
+        apply_movement(self.product, 'OUT', 2, self.user)
+        other = make_product('AL-2')
+        apply_movement(other, 'IN', 1, self.user)
+        StockLevel.objects.filter(product=other).update(minimum_stock=3)
+        apply_movement(other, 'OUT', 1, self.user)
+        apply_movement(other, 'IN', 1, self.user)
+
+        with self.assertNumQueries(4):
+            sent = alerts.dispatch(now=self.later)
+        self.assertEqual([(n.product.sku, n.previous_status, n.status) for n in sent], [('AL-1', 'OK', 'OUT')])
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('AL-1', mail.outbox[0].body)
+        self.assertFalse(StockAlertEvent.objects.filter(dispatched_at__isnull=True).exists())
+        self.assertEqual(alerts.dispatch(now=self.later), [])
+        self.assertEqual(alerts.prune(keep_days=0, now=self.later + timedelta(seconds=1)), 4)
+
+    def test_failed_delivery_is_retried(self):
+        apply_movement(self.product, 'OUT', 10, self.user)
+
+        def unreachable(notifications):
+            raise OSError('connexion refusée')
+
+        with self.assertRaises(OSError), self.assertLogs('stock_app.alerts', 'ERROR'):
+            alerts.dispatch(now=self.later, channels=[unreachable])
+        event = StockAlertEvent.objects.get()
+        self.assertEqual((event.dispatched_at, event.attempts, event.last_error), (None, 1, 'connexion refusée'))
+
+        # Not before the retry delay
+        delivered = []
+        self.assertEqual(alerts.dispatch(now=self.later, channels=[delivered.extend]), [])
+        retry = self.later + timedelta(seconds=alerts.retry_delay(1))
+        self.assertEqual(len(alerts.dispatch(now=retry, channels=[delivered.extend])), 1)
+        self.assertEqual([n.as_dict()['status'] for n in delivered], ['OUT'])
+
+    def test_events_waiting_for_a_retry_are_not_claimed_early(self):
+        apply_movement(self.product, 'OUT', 10, self.user)
+
+        def unreachable(notifications):
+            raise OSError('connexion refusée')
+
+        with self.assertRaises(OSError), self.assertLogs('stock_app.alerts', 'ERROR'):
+            alerts.dispatch(now=self.later, channels=[unreachable])
+        apply_movement(self.product, 'IN', 5, self.user)
+
+        delivered = []
+        sent = alerts.dispatch(now=self.later, debounce=0, channels=[delivered.extend])
+        self.assertEqual([(n.previous_status, n.status) for n in sent], [('OUT', 'OK')])
+        failed = StockAlertEvent.objects.get(status='OUT')
+        self.assertEqual((failed.dispatched_at, failed.attempts), (None, 1))
+
+    @override_settings(STOCK_ALERT_MAX_ATTEMPTS=2)
+    def test_only_failed_channels_are_retried_until_given_up(self):
+        apply_movement(self.product, 'OUT', 10, self.user)
+        sent = []
+
+        def delivered(notifications):
+            sent.append(len(notifications))
+
+        def unreachable(notifications):
+            raise OSError('connexion refusée')
+
+        with self.assertRaises(OSError), self.assertLogs('stock_app.alerts', 'ERROR'):
+            alerts.dispatch(now=self.later, channels=[delivered, unreachable])
+        event = StockAlertEvent.objects.get()
+        self.assertEqual(event.delivered_channels, ['delivered'])
+
+        retry = self.later + timedelta(seconds=alerts.retry_delay(1))
+        with self.assertRaises(OSError), self.assertLogs('stock_app.alerts', 'ERROR') as logs:
+            alerts.dispatch(now=retry, channels=[delivered, unreachable])
+        self.assertEqual(sent, [1])
+        self.assertIn('given up', '\n'.join(logs.output))
+        event.refresh_from_db()
+        self.assertEqual((event.attempts, event.dispatched_at), (2, retry))
+        self.assertEqual(alerts.dispatch(now=retry + timedelta(days=1), channels=[delivered, unreachable]), [])
+
+    def test_minimum_changes_are_recorded(self):
+        level = StockLevel.objects.get(product=self.product)
+        self.client.force_login(self.user)
+        self.client.post(
+            reverse('stock_app:update_stock_level', args=[level.pk]),
+            {'minimum_stock': 12, 'maximum_stock': 50},
+        )
+        self.assertEqual(
+            list(StockAlertEvent.objects.values_list('previous_status', 'status')), [('OK', 'LOW')],
+        )
+
+    def test_stock_moved_during_the_form_submit_is_kept(self):
+        level = StockLevel.objects.get(product=self.product)
+        self.client.force_login(self.user)
+        is_valid = StockLevelForm.is_valid
+
+        def sale_in_between(form):
+            # Committed after the view read the level, before it writes
+            apply_movement(self.product, 'OUT', 8, self.user)
+            return is_valid(form)
+
+        with mock.patch.object(StockLevelForm, 'is_valid', autospec=True, side_effect=sale_in_between):
+            self.client.post(
+                reverse('stock_app:update_stock_level', args=[level.pk]),
+                {'minimum_stock': 5, 'maximum_stock': 50},
+            )
+        level.refresh_from_db()
+        self.assertEqual((level.current_stock, level.minimum_stock, level.maximum_stock), (2, 5, 50))
+        # OK -> LOW by the sale, then nothing: 2 was already under the new minimum
+        self.assertEqual(
+            list(StockAlertEvent.objects.values_list('previous_status', 'status')), [('OK', 'LOW')],
+        )
+        self.assertEqual(counters.verify(), {})
+
+
+class BulkMovementTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('staff', password='secret')
+        self.client.force_login(self.user)
+        category = Category.objects.create(name='Gaines')
+        self.products = [make_product(f'BLK-{i}', category=category) for i in range(400)]
+        self.url = reverse('stock_app:bulk_movements')
+
+    def stock(self, sku):
+        return StockLevel.objects.get(product__sku=sku).current_stock
+
+    def post_json(self, data):
+        return self.client.post(self.url, json.dumps(data), content_type='application/json')
+
+    def test_pasted_lines_share_one_reference(self):
+        response = self.client.post(self.url, {
+            'movement_type': 'IN',
+            'reference': 'BL-2026-001',
+            'lines': 'BLK-0 10\nBLK-1;5\n\nBLK-0,3,OUT\n',
+        })
+        self.assertRedirects(response, reverse('stock_app:movements'))
+        self.assertEqual(self.stock('BLK-0'), 7)
+        self.assertEqual(self.stock('BLK-1'), 5)
+        self.assertEqual(StockMovement.objects.filter(reference='BL-2026-001').count(), 3)
+        self.assertEqual(counters.verify(), {})
+
+    def test_every_invalid_line_is_reported_and_nothing_written(self):
+        response = self.client.post(self.url, {
+            'movement_type': 'OUT',
+            'lines': 'BLK-0 1\nBLK-1 2\nBLK-2 0',
+        })
+        self.assertEqual(response.context['errors'], ['Ligne 3: La quantité doit être positive: 0'])
+
+        response = self.client.post(self.url, {'movement_type': 'OUT', 'lines': 'BLK-0 1\nBLK-1 2\nNOPE 1'})
+        self.assertEqual(response.context['errors'], ['Ligne 3: SKU inconnu: NOPE'])
+
+        response = self.client.post(self.url, {'movement_type': 'OUT', 'lines': 'BLK-0 1\nBLK-1 2'})
+        self.assertEqual(len(response.context['errors']), 2)
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_csv_upload(self):
+        upload = SimpleUploadedFile('receipt.csv', b'SKU,Quantity,Type\nBLK-3,4,\nBLK-4,2,ADJUSTMENT\n')
+        self.client.post(self.url, {'movement_type': 'IN', 'csv_file': upload})
+        self.assertEqual((self.stock('BLK-3'), self.stock('BLK-4')), (4, 2))
+
+    def test_json_receipt_cost_does_not_depend_on_line_count(self):
+        def receipt(count, reference):
+            return {
+                'reference': reference,
+                'lines': [{'sku': product.sku, 'quantity': 2} for product in self.products[:count]],
+            }
+
+        # Same shape of work for both: every stock row already exists
+        self.assertEqual(self.post_json(receipt(100, 'OPENING')).status_code, 201)
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.post_json(receipt(2, 'SMALL')).status_code, 201)
+        # Up to the batch size of the backend's bulk queries (999 SQLite parameters)
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self.post_json(receipt(100, 'LARGE')).status_code, 201)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+        response = self.post_json(receipt(400, 'FULL'))
+        self.assertEqual(response.json(), {'reference': 'FULL', 'created': 400})
+        self.assertEqual((self.stock('BLK-0'), self.stock('BLK-399')), (8, 2))
+
+        response = self.post_json({'lines': [{'sku': 'BLK-5', 'quantity': 30, 'movement_type': 'OUT'}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('stock insuffisant', response.json()['errors'][0])
+
+    def test_json_values_of_the_wrong_type_are_line_errors(self):
+        response = self.post_json({'lines': [
+            {'sku': 123, 'quantity': 1},
+            {'sku': 'BLK-1', 'quantity': 1, 'movement_type': ['IN']},
+        ]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'], [
+            'Ligne 1: SKU invalide: 123',
+            "Ligne 2: Type de mouvement invalide: ['IN']",
+        ])
+
+        response = self.post_json({'movement_type': 5, 'lines': [{'sku': 'BLK-1', 'quantity': 1}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'], ['Ligne 1: Type de mouvement invalide: 5'])
+        self.assertFalse(StockMovement.objects.exists())
+
+
+class StockCountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('staff', password='secret')
+        self.client.force_login(self.user)
+        self.category = Category.objects.create(name='Disjoncteurs')
+        self.products = {sku: make_product(sku, category=self.category) for sku in ('CNT-A', 'CNT-B', 'CNT-C')}
+        for sku, quantity in (('CNT-A', 10), ('CNT-B', 5), ('CNT-C', 7)):
+            apply_movement(self.products[sku], 'IN', quantity, self.user)
+        make_product('OTHER-1')
+        response = self.client.post(reverse('stock_app:stock_counts'), {'category': self.category.pk})
+        self.count = StockCount.objects.get()
+        self.assertRedirects(response, reverse('stock_app:stock_count_detail', args=[self.count.pk]))
+        self.url = reverse('stock_app:stock_count_detail', args=[self.count.pk])
+        self.close_url = reverse('stock_app:close_stock_count', args=[self.count.pk])
+
+    def stock(self, sku):
+        return StockLevel.objects.get(product__sku=sku).current_stock
+
+    def post_counts(self, counts):
+        return self.client.post(self.url, json.dumps({'counts': counts}), content_type='application/json')
+
+    def test_close_posts_only_the_differences(self):
+        self.assertEqual(self.count.line_count, 3)
+        # Sold while the count runs: kept, the difference applies on top
+        apply_movement(self.products['CNT-A'], 'OUT', 2, self.user)
+        self.assertEqual(self.post_counts([{'sku': 'CNT-A', 'quantity': 4}, {'sku': 'CNT-B', 'quantity': 5}]).status_code, 201)
+        self.client.post(self.url, {'lines': 'CNT-A 3\nCNT-A\nCNT-A;1'})
+        response = self.client.get(self.url)
+        self.assertEqual((response.context['counted_products'], response.context['difference_count']), (2, 1))
+        self.assertContains(self.client.get(reverse('stock_app:stock_counts')), self.count.reference)
+
+        self.client.post(self.close_url, {'action': 'close'})
+
+        self.count.refresh_from_db()
+        self.assertEqual((self.count.status, self.count.movement_count), ('CLOSED', 1))
+        movement = StockMovement.objects.get(reference=self.count.reference)
+        self.assertEqual((movement.movement_type, movement.quantity), ('OUT', 1))
+        self.assertEqual((self.stock('CNT-A'), self.stock('CNT-B'), self.stock('CNT-C')), (7, 5, 7))
+        self.assertEqual(counters.verify(), {})
+        self.assertEqual(ledger.reconcile(), {})
+
+    def test_uncounted_products_can_be_zeroed(self):
+        self.post_counts([{'sku': 'CNT-A', 'quantity': 12}])
+        counting.close_count(self.count, self.user, uncounted_as_zero=True)
+        self.assertEqual((self.stock('CNT-A'), self.stock('CNT-B'), self.stock('CNT-C')), (12, 0, 0))
+        self.assertEqual(
+            sorted(StockMovement.objects.filter(reference=self.count.reference).values_list('movement_type', 'quantity')),
+            [('IN', 2), ('OUT', 5), ('OUT', 7)],
+        )
+
+    def test_counts_are_checked_and_refused_once_closed(self):
+        response = self.post_counts([{'sku': 'OTHER-1', 'quantity': 1}, {'sku': 'CNT-A', 'quantity': -1}])
+        self.assertEqual(response.json(), {'errors': ['Ligne 2: La quantité ne peut pas être négative: -1']})
+        response = self.post_counts([{'sku': 'OTHER-1', 'quantity': 1}])
+        self.assertEqual(response.json(), {'errors': ['Ligne 1: SKU inconnu ou hors inventaire: OTHER-1']})
+
+        self.client.post(self.close_url, {'action': 'cancel'})
+        self.assertEqual(self.post_counts([{'sku': 'CNT-A'}]).status_code, 400)
+        with self.assertRaises(counting.CountClosed):
+            counting.close_count(self.count, self.user)
+        self.assertFalse(StockMovement.objects.filter(reference=self.count.reference).exists())
+
+
+class ConcurrentStockCountTests(TransactionTestCase):
+    def test_counts_from_several_clients_add_up(self):
+        user = User.objects.create_user('staff')
+        product = make_product('CNT-SCAN')
+        apply_movement(product, 'IN', 5, user)
+        count = counting.open_count(user)
+        failures = []
+
+        def scanner():
+            try:
+                for _ in range(10):
+                    failures.extend(counting.record_counts(count, [counting.CountLine(1, 'CNT-SCAN', 1)], user))
+            except Exception as exc:  # pragma: no cover - reported below
+                failures.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=scanner) for _ in range(4)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(failures, [])
+        counting.close_count(count, user)
+        self.assertEqual(StockLevel.objects.get(product=product).current_stock, 40)
+
+
+class ConcurrentPurchaseOrderTests(TransactionTestCase):
+    def test_concurrent_runs_do_not_order_twice(self):
+        user = User.objects.create_user('buyer')
+        products = [make_product(f'CPO-{index}') for index in range(5)]
+        StockLevel.objects.bulk_create([StockLevel(product=product) for product in products])
+        StockLevel.objects.update(minimum_stock=5, maximum_stock=20)
+        failures = []
+
+        def buyer():
+            try:
+                purchasing.generate_orders(user)
+            except Exception as exc:  # pragma: no cover - reported below
+                failures.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=buyer) for _ in range(4)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(failures, [])
+        ordered = PurchaseOrderLine.objects.values_list('product__sku').annotate(total=Sum('quantity'))
+        self.assertEqual(dict(ordered), {product.sku: 20 for product in products})
+
+
+class StockMutationServiceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('staff')
+        self.product = make_product('SRV-1')
+
+    def test_out_movement_cannot_go_negative(self):
+        apply_movement(self.product, 'IN', 3, self.user)
+        with self.assertRaises(InsufficientStock):
+            apply_movement(self.product, 'OUT', 4, self.user)
+
+        self.assertEqual(StockLevel.objects.get(product=self.product).current_stock, 3)
+        self.assertEqual(StockMovement.objects.filter(product=self.product).count(), 1)
+
+
+class StockExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('staff', password='secret', first_name='Ali')
+        self.client.force_login(self.user)
+        self.product = make_product('EXP-1')
+        apply_movement(self.product, 'IN', 10, self.user, reference='BL-1')
+        apply_movement(self.product, 'OUT', 3, self.user, reference='BL-2')
+        old = apply_movement(make_product('EXP-2'), 'IN', 5, self.user, reference='BL-0')
+        StockMovement.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=30))
+
+    def export(self, **params):
+        response = self.client.get(reverse('stock_app:export_movements'), params)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return b''.join(response.streaming_content).decode('utf-8').splitlines()
+
+    def test_movements_export_streams_filtered_rows(self):
+        today = timezone.localdate().isoformat()
+
+        lines = self.export(date_from=today, product=self.product.pk)
+
+        self.assertEqual(lines[0], 'Date,Product,Type,Quantity,Reference,Created By,Notes')
+        self.assertEqual(len(lines), 3)
+        self.assertIn('Sortie de stock,3,BL-2,Ali,', lines[1])
+        self.assertEqual(len(self.export(type='IN')), 3)
+
+    def test_invalid_date_is_rejected(self):
+        response = self.client.get(reverse('stock_app:export_movements'), {'date_to': '2024-13-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_stock_export_matches_model_status(self):
+        with self.assertNumQueries(1):
+            rows = list(STOCK_EXPORT.iter_rows({'status': 'low'}))
+        self.assertEqual(rows, [])
+        level = StockLevel.objects.get(product=self.product)
+        self.assertEqual(list(STOCK_EXPORT.iter_rows({'search': 'EXP-1'}))[0][-1], level.stock_status)
+
+
+class ConcurrentStockMutationTests(TransactionTestCase):
+    """Hammer one stock level from several threads and check nothing is lost"""
+    threads = 8
+    movements_per_thread = 25
+
+    def test_concurrent_movements_do_not_drift(self):
+        user = User.objects.create_user('staff')
+        product = make_product('STRESS-1')
+        apply_movement(product, 'IN', 100, user)
+        failures = []
+
+        def worker(index):
+            try:
+                for _ in range(self.movements_per_thread):
+                    try:
+                        # Even threads receive 2 units, odd threads try to ship 3
+                        if index % 2:
+                            apply_movement(product, 'OUT', 3, user)
+                        else:
+                            apply_movement(product, 'IN', 2, user)
+                    except InsufficientStock:
+                        pass
+            except Exception as exc:  # pragma: no cover - reported below
+                failures.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(failures, [])
+        movements = StockMovement.objects.filter(product=product)
+        received = sum(m.quantity for m in movements if m.movement_type == 'IN')
+        shipped = sum(m.quantity for m in movements if m.movement_type == 'OUT')
+        stock = StockLevel.objects.get(product=product).current_stock
+        self.assertEqual(stock, received - shipped)
+        self.assertGreaterEqual(stock, 0)
+        self.assertEqual(counters.verify(), {})
@@ -8,9 +8,20 @@ urlpatterns = [
     path('list/', views.stock_list, name='stock_list'),
     path('movements/', views.stock_movements, name='movements'),
     path('movements/add/', views.add_stock_movement, name='add_movement'),
+    path('movements/bulk/', views.bulk_movements, name='bulk_movements'),
+    path('counts/', views.stock_counts, name='stock_counts'),
+    path('counts/<int:pk>/', views.stock_count_detail, name='stock_count_detail'),
+    path('counts/<int:pk>/close/', views.close_stock_count, name='close_stock_count'),
+    path('purchases/', views.purchase_orders, name='purchase_orders'),
+    path('purchases/<int:pk>/', views.purchase_order_detail, name='purchase_order_detail'),
+    path('purchases/<int:pk>/action/', views.purchase_order_action, name='purchase_order_action'),
+    path('locations/', views.locations, name='locations'),
+    path('locations/<int:pk>/', views.location_detail, name='location_detail'),
     path('level/<int:pk>/update/', views.update_stock_level, name='update_stock_level'),
     path('alerts/', views.stock_alerts, name='alerts'),
     path('api/', views.stock_api, name='stock_api'),
+    path('at/', views.stock_at, name='stock_at'),
     path('export/', views.export_stock, name='export_stock'),
+    path('metrics/export/', views.export_metrics, name='export_metrics'),
     path('movements/export/', views.export_movements, name='export_movements'),
 ]
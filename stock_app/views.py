@@ -1,34 +1,52 @@
+import json
+from datetime import datetime, time
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.paginator import Paginator
-from django.db.models import Q, Sum, F
-from django.http import JsonResponse, HttpResponse
-import csv
-from .models import StockMovement, StockLevel
-from .forms import StockMovementForm, StockLevelForm
+from django.db.models import Count, F, Q, Sum
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.db import transaction
+from . import alerts, archive, bulk, counters, counting, ledger, purchasing
+from .models import Location, LocationStock, PurchaseOrder, StockCount, StockMovement, StockLevel
+from .forms import (
+    BulkMovementForm, CountEntryForm, PurchaseOrderGenerateForm, StockCountForm, StockMovementForm, StockLevelForm,
+)
+from .analytics import LOW_COVER_DAYS
+from .exports import (
+    METRICS_EXPORT, MOVEMENTS_COLUMNAR_EXPORT, MOVEMENTS_EXPORT, STOCK_EXPORT, filter_abc_class, filter_analysis,
+)
+from .services import InsufficientStock, apply_movement, set_thresholds
+from products_app import catalog, search
 from products_app.models import Product
+from dashboard_app.metrics import get_inventory_metrics
+from core_app import fragments
+from core_app.columnar import columnar_response, validate_format
+from core_app.exporters import date_range, export_response
+from core_app.pagination import paginate
+from jobs_app.runner import enqueue
 
 
 @login_required
 def stock_dashboard(request):
     # Get stock statistics
-    total_products = Product.objects.count()
-    low_stock_products = StockLevel.objects.filter(current_stock__lte=F('minimum_stock')).count()
-    out_of_stock_products = StockLevel.objects.filter(current_stock=0).count()
+    inventory = get_inventory_metrics()
     
     # Recent movements
     recent_movements = StockMovement.objects.select_related('product', 'created_by')[:10]
     
-    # Low stock alerts
+    # Low stock alerts (lazy, only run when the cached panel is out of date)
     low_stock_items = StockLevel.objects.filter(
         current_stock__lte=F('minimum_stock')
     ).select_related('product')
     
     context = {
-        'total_products': total_products,
-        'low_stock_products': low_stock_products,
-        'out_of_stock_products': out_of_stock_products,
+        'total_products': inventory.total_products,
+        'low_stock_products': inventory.alert_count,
+        'out_of_stock_products': inventory.out_of_stock_count,
+        'in_stock_products': inventory.in_stock_count,
         'recent_movements': recent_movements,
         'low_stock_items': low_stock_items,
     }
@@ -37,15 +55,7 @@ def stock_dashboard(request):
 
 @login_required
 def stock_list(request):
-    stock_levels = StockLevel.objects.select_related('product__category').all()
-    
-    # Search functionality
-    search_query = request.GET.get('search')
-    if search_query:
-        stock_levels = stock_levels.filter(
-            Q(product__name__icontains=search_query) |
-            Q(product__sku__icontains=search_query)
-        )
+    stock_levels = StockLevel.objects.select_related('product__category', 'product__metrics').all()
     
     # Status filter
     status_filter = request.GET.get('status')
@@ -54,22 +64,35 @@ def stock_list(request):
     elif status_filter == 'out':
         stock_levels = stock_levels.filter(current_stock=0)
     
-    # Pagination
-    paginator = Paginator(stock_levels, 20)
-    page_number = request.GET.get('page')
-    stock_levels = paginator.get_page(page_number)
+    # Inventory metrics filters (see stock_app.analytics)
+    abc_filter = request.GET.get('abc')
+    if abc_filter:
+        stock_levels = filter_abc_class(stock_levels, abc_filter)
+    analysis_filter = request.GET.get('analysis')
+    stock_levels = filter_analysis(stock_levels, analysis_filter)
+    
+    search_query = request.GET.get('search')
+    if search_query:
+        # Full-text search on the products: every match, by relevance, one page at a time
+        stock_levels = search.paginate(request, stock_levels, search_query, product_field='product_id')
+    else:
+        # Keyset pagination: the cost of a page does not depend on its depth
+        stock_levels = paginate(request, stock_levels, ordering=('product__name', 'id'))
     
     context = {
         'stock_levels': stock_levels,
         'search_query': search_query,
         'status_filter': status_filter,
+        'abc_filter': abc_filter,
+        'analysis_filter': analysis_filter,
+        'low_cover_days': LOW_COVER_DAYS,
     }
     return render(request, 'stock_app/stock_list.html', context)
 
 
 @login_required
 def stock_movements(request):
-    movements = StockMovement.objects.select_related('product', 'created_by').all()
+    movements = StockMovement.objects.select_related('product', 'created_by', 'location', 'to_location').all()
     
     # Filter by product
     product_filter = request.GET.get('product')
@@ -81,18 +104,30 @@ def stock_movements(request):
     if type_filter:
         movements = movements.filter(movement_type=type_filter)
     
-    # Pagination
-    paginator = Paginator(movements, 20)
-    page_number = request.GET.get('page')
-    movements = paginator.get_page(page_number)
+    # Date range; archived months are read when the range reaches them
+    try:
+        start, end = date_range(request.GET)
+    except ValueError as e:
+        messages.error(request, str(e))
+        start = end = None
+    if start:
+        movements = movements.filter(created_at__gte=start)
+    if end:
+        movements = movements.filter(created_at__lt=end)
+    tail = None
+    if archive.needed(start, end):
+        tail = archive.MovementArchive(start, end, product_filter, type_filter)
     
-    products = Product.objects.all()
+    # Keyset pagination: the cost of a page does not depend on its depth
+    movements = paginate(request, movements, ordering=('-created_at', '-id'), tail=tail)
     
     context = {
         'movements': movements,
-        'products': products,
+        'selected_product': catalog.get_product(product_filter) if product_filter else None,
         'product_filter': product_filter,
         'type_filter': type_filter,
+        'date_from': request.GET.get('date_from') if start else None,
+        'date_to': request.GET.get('date_to') if end else None,
     }
     return render(request, 'stock_app/movements.html', context)
 
@@ -103,38 +138,27 @@ def add_stock_movement(request):
         form = StockMovementForm(request.POST)
         if form.is_valid():
             movement = form.save(commit=False)
-            movement.created_by = request.user
-            
-            # Get or create stock level
-            stock_level, created = StockLevel.objects.get_or_create(
-                product=movement.product
-            )
             
-            # Calculate new stock level
-            if movement.movement_type == 'IN':
-                new_stock = stock_level.current_stock + movement.quantity
-            elif movement.movement_type == 'OUT':
-                new_stock = stock_level.current_stock - movement.quantity
-            elif movement.movement_type == 'ADJUSTMENT':
-                new_stock = movement.quantity
-            else:
-                new_stock = stock_level.current_stock
-            
-            # Prevent negative stock
-            if new_stock < 0:
+            try:
+                apply_movement(
+                    movement.product,
+                    movement.movement_type,
+                    movement.quantity,
+                    request.user,
+                    reference=movement.reference,
+                    notes=movement.notes,
+                    location=movement.location,
+                    to_location=movement.to_location,
+                )
+            except InsufficientStock as e:
                 messages.error(
                     request,
                     f'Opération impossible! Stock insuffisant pour {movement.product.name}. '
-                    f'Stock actuel: {stock_level.current_stock}, '
+                    f'Stock actuel: {e.available}, '
                     f'Tentative de retrait: {movement.quantity}'
                 )
                 return redirect('stock_app:movements')
             
-            # Save movement and update stock
-            movement.save()
-            stock_level.current_stock = new_stock
-            stock_level.save()
-            
             messages.success(request, 'Mouvement de stock enregistré avec succès!')
             return redirect('stock_app:movements')
     else:
@@ -146,13 +170,269 @@ def add_stock_movement(request):
     })
 
 
+@login_required
+def bulk_movements(request):
+    """Post many movements at once: pasted lines or a CSV upload, or a JSON body.
+    
+    The JSON form is {"movement_type"?, "location"?, "reference"?, "notes"?,
+    "lines": [{"sku", "quantity", "movement_type"?}]}, location being a
+    location code; it answers 201 with the number of movements, or 400 with
+    every error found.
+    """
+    if request.method == 'POST' and request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'errors': ['JSON invalide']}, status=400)
+        lines, errors = bulk.parse_json(data)
+        reference = str(data.get('reference') or '')[:100] if isinstance(data, dict) else ''
+        notes = str(data.get('notes') or '') if isinstance(data, dict) else ''
+        location = None
+        if isinstance(data, dict) and data.get('location'):
+            location = Location.objects.filter(code=str(data['location']), is_active=True).first()
+            if location is None:
+                errors.append(f'Emplacement inconnu: {data["location"]}')
+        if not errors:
+            result = bulk.apply_bulk(lines, request.user, reference=reference, notes=notes, location=location)
+            errors = result.errors
+        if errors:
+            return JsonResponse({'errors': errors}, status=400)
+        return JsonResponse({'reference': result.reference, 'created': len(result.movements)}, status=201)
+    
+    errors = []
+    if request.method == 'POST':
+        form = BulkMovementForm(request.POST, request.FILES)
+        if form.is_valid():
+            default_type = form.cleaned_data['movement_type']
+            if form.cleaned_data['csv_file']:
+                lines, errors = bulk.parse_csv(form.cleaned_data['csv_file'], default_type)
+            else:
+                lines, errors = bulk.parse_text(form.cleaned_data['lines'], default_type)
+            if not errors:
+                result = bulk.apply_bulk(
+                    lines,
+                    request.user,
+                    reference=form.cleaned_data['reference'],
+                    notes=form.cleaned_data['notes'],
+                    location=form.cleaned_data['location'],
+                )
+                errors = result.errors
+            if not errors:
+                messages.success(
+                    request,
+                    f'{len(result.movements)} mouvements enregistrés (référence {result.reference})',
+                )
+                return redirect('stock_app:movements')
+    else:
+        form = BulkMovementForm()
+    
+    return render(request, 'stock_app/bulk_movement_form.html', {
+        'form': form,
+        'errors': errors,
+        'title': 'Saisie groupée de mouvements',
+    })
+
+
+@login_required
+def stock_counts(request):
+    """Count sessions, and opening a new one"""
+    if request.method == 'POST':
+        form = StockCountForm(request.POST)
+        if form.is_valid():
+            count = counting.open_count(
+                request.user,
+                category=form.cleaned_data['category'],
+                reference=form.cleaned_data['reference'],
+                notes=form.cleaned_data['notes'],
+                location=form.cleaned_data['location'],
+            )
+            messages.success(request, f'Inventaire {count.reference} ouvert ({count.line_count} produits)')
+            return redirect('stock_app:stock_count_detail', pk=count.pk)
+    else:
+        form = StockCountForm()
+    
+    counts = StockCount.objects.select_related('category', 'location', 'opened_by')
+    counts = paginate(request, counts, ordering=('-opened_at', '-id'))
+    return render(request, 'stock_app/stock_counts.html', {'form': form, 'counts': counts})
+
+
+@login_required
+def stock_count_detail(request, pk):
+    """Progress of a count, and adding counts to it: pasted lines, or a JSON body.
+    
+    The JSON form is {"counts": [{"sku", "quantity"?}]} and can be sent by
+    several clients at once; it answers 201 with the number of counts
+    recorded, or 400 with every error found.
+    """
+    count = get_object_or_404(
+        StockCount.objects.select_related('category', 'location', 'opened_by', 'closed_by'), pk=pk,
+    )
+    
+    if request.method == 'POST' and request.content_type == 'application/json':
+        try:
+            lines, errors = counting.parse_json(json.loads(request.body))
+        except ValueError:
+            return JsonResponse({'errors': ['JSON invalide']}, status=400)
+        if not errors:
+            errors = counting.record_counts(count, lines, request.user)
+        if errors:
+            return JsonResponse({'errors': errors}, status=400)
+        return JsonResponse({'recorded': len(lines)}, status=201)
+    
+    errors = []
+    if request.method == 'POST':
+        form = CountEntryForm(request.POST)
+        if form.is_valid():
+            lines, errors = counting.parse_text(form.cleaned_data['lines'])
+            if not errors:
+                errors = counting.record_counts(count, lines, request.user)
+            if not errors:
+                messages.success(request, f'{len(lines)} comptages enregistrés')
+                return redirect('stock_app:stock_count_detail', pk=count.pk)
+    else:
+        form = CountEntryForm()
+    
+    counted = counting.counted_totals(count)
+    differences = counting.differences(count, counted=counted) if count.status == 'OPEN' else {}
+    largest = sorted(differences.items(), key=lambda item: -abs(item[1]))[:50]
+    products = Product.objects.in_bulk([product_id for product_id, _ in largest])
+    return render(request, 'stock_app/stock_count_detail.html', {
+        'count': count,
+        'form': form,
+        'errors': errors,
+        'counted_products': len(counted),
+        'entry_count': count.entries.count(),
+        'difference_count': len(differences),
+        'differences': [(products[product_id], diff) for product_id, diff in largest],
+    })
+
+
+@login_required
+def close_stock_count(request, pk):
+    """Close a count (posting the differences) or cancel it"""
+    count = get_object_or_404(StockCount, pk=pk)
+    if request.method != 'POST':
+        return redirect('stock_app:stock_count_detail', pk=count.pk)
+    
+    try:
+        if request.POST.get('action') == 'cancel':
+            counting.cancel_count(count, request.user)
+            messages.info(request, f'Inventaire {count.reference} annulé')
+        else:
+            movements = counting.close_count(
+                count, request.user, uncounted_as_zero=bool(request.POST.get('uncounted_as_zero')),
+            )
+            messages.success(
+                request,
+                f'Inventaire {count.reference} clôturé: {len(movements)} mouvements de régularisation',
+            )
+    except (counting.CountClosed, InsufficientStock) as e:
+        messages.error(request, str(e))
+    return redirect('stock_app:stock_count_detail', pk=count.pk)
+
+
+@login_required
+def purchase_orders(request):
+    """Purchase orders, and generating drafts from the stock alerts"""
+    if request.method == 'POST':
+        form = PurchaseOrderGenerateForm(request.POST)
+        if form.is_valid():
+            orders = purchasing.generate_orders(request.user, **form.cleaned_data)
+            if orders:
+                lines = sum(order.line_count for order in orders)
+                messages.success(request, f'{len(orders)} commandes brouillon créées ({lines} lignes)')
+            else:
+                messages.info(request, 'Aucun produit à commander')
+            return redirect('stock_app:purchase_orders')
+    else:
+        form = PurchaseOrderGenerateForm()
+    
+    orders = PurchaseOrder.objects.select_related('supplier', 'category', 'created_by')
+    status_filter = request.GET.get('status')
+    if status_filter:
+        orders = orders.filter(status=status_filter)
+    orders = paginate(request, orders, ordering=('-created_at', '-id'))
+    return render(request, 'stock_app/purchase_orders.html', {
+        'form': form,
+        'orders': orders,
+        'status_filter': status_filter,
+        'status_choices': PurchaseOrder.STATUS_CHOICES,
+        'suggestion_count': purchasing.suggestions().count(),
+    })
+
+
+@login_required
+def purchase_order_detail(request, pk):
+    """Lines of an order; the quantities of a draft can be changed (0 removes the line)"""
+    order = get_object_or_404(
+        PurchaseOrder.objects.select_related('supplier', 'category', 'location', 'created_by', 'received_by'), pk=pk,
+    )
+    if request.method == 'POST':
+        quantities = {}
+        for name, value in request.POST.items():
+            if not name.startswith('quantity_'):
+                continue
+            try:
+                quantities[int(name[len('quantity_'):])] = int(value)
+            except ValueError:
+                messages.error(request, f'Quantité invalide: {value!r}')
+                return redirect(request.get_full_path())
+        try:
+            if not purchasing.update_quantities(order, quantities):
+                messages.info(request, f'Commande {order.reference} supprimée: elle n\'avait plus de lignes')
+                return redirect('stock_app:purchase_orders')
+            messages.success(request, 'Quantités enregistrées')
+        except purchasing.OrderClosed as e:
+            messages.error(request, str(e))
+        return redirect(request.get_full_path())
+    
+    lines = order.lines.select_related('product')
+    search_query = request.GET.get('search')
+    if search_query:
+        lines = lines.filter(Q(product__name__icontains=search_query) | Q(product__sku__icontains=search_query))
+    lines = paginate(request, lines, ordering=('product__name', 'id'))
+    return render(request, 'stock_app/purchase_order_detail.html', {
+        'order': order,
+        'lines': lines,
+        'search_query': search_query,
+    })
+
+
+@login_required
+def purchase_order_action(request, pk):
+    """Mark an order as sent, receive it (posting the IN movements) or cancel it"""
+    order = get_object_or_404(PurchaseOrder, pk=pk)
+    if request.method != 'POST':
+        return redirect('stock_app:purchase_order_detail', pk=order.pk)
+    
+    action = request.POST.get('action')
+    try:
+        if action == 'order':
+            purchasing.mark_ordered(order)
+            messages.success(request, f'Commande {order.reference} marquée comme envoyée')
+        elif action == 'cancel':
+            purchasing.cancel_order(order)
+            messages.info(request, f'Commande {order.reference} annulée')
+        elif action == 'receive':
+            movements = purchasing.receive_order(order, request.user)
+            messages.success(request, f'Commande {order.reference} reçue: {len(movements)} entrées de stock')
+        else:
+            return HttpResponseBadRequest('Action inconnue')
+    except purchasing.OrderClosed as e:
+        messages.error(request, str(e))
+    return redirect('stock_app:purchase_order_detail', pk=order.pk)
+
+
 @login_required
 def update_stock_level(request, pk):
-    stock_level = get_object_or_404(StockLevel, pk=pk)
+    stock_level = get_object_or_404(StockLevel.objects.select_related('product'), pk=pk)
     if request.method == 'POST':
         form = StockLevelForm(request.POST, instance=stock_level)
         if form.is_valid():
-            form.save()
+            # Only the thresholds, on the locked row: the stock may have moved since the form was loaded
+            stock_level = set_thresholds(
+                stock_level.product, form.cleaned_data['minimum_stock'], form.cleaned_data['maximum_stock'],
+            )
             messages.success(request, 'Stock level updated successfully!')
             return redirect('stock_app:stock_list')
     else:
@@ -165,11 +445,40 @@ def update_stock_level(request, pk):
     })
 
 
+@login_required
+def locations(request):
+    """Locations with the units and products they hold"""
+    location_list = Location.objects.annotate(
+        units=Sum('stocks__quantity'),
+        product_count=Count('stocks', filter=Q(stocks__quantity__gt=0)),
+    )
+    return render(request, 'stock_app/locations.html', {'locations': location_list})
+
+
+@login_required
+def location_detail(request, pk):
+    """Stock held at one location"""
+    location = get_object_or_404(Location, pk=pk)
+    stocks = LocationStock.objects.filter(location=location, quantity__gt=0).select_related('product')
+    
+    search_query = request.GET.get('search')
+    if search_query:
+        stocks = stocks.filter(Q(product__name__icontains=search_query) | Q(product__sku__icontains=search_query))
+    
+    # Keyset pagination: the cost of a page does not depend on its depth
+    stocks = paginate(request, stocks, ordering=('product__name', 'id'))
+    return render(request, 'stock_app/location_detail.html', {
+        'location': location,
+        'stocks': stocks,
+        'search_query': search_query,
+    })
+
+
 @login_required
 def stock_alerts(request):
     low_stock_items = StockLevel.objects.filter(
         current_stock__lte=F('minimum_stock')
-    ).select_related('product')
+    ).select_related('product').annotate(on_order=purchasing.on_order())
     
     return render(request, 'stock_app/alerts.html', {'low_stock_items': low_stock_items})
 
@@ -177,63 +486,114 @@ def stock_alerts(request):
 @login_required
 def stock_api(request):
     """API endpoint for stock data"""
-    stock_levels = StockLevel.objects.select_related('product').all()
-    data = []
-    
-    for stock in stock_levels:
-        data.append({
-            'product_name': stock.product.name,
-            'sku': stock.product.sku,
-            'current_stock': stock.current_stock,
-            'minimum_stock': stock.minimum_stock,
-            'status': stock.stock_status,
-        })
+    def build():
+        return [
+            {
+                'product_name': stock.product.name,
+                'sku': stock.product.sku,
+                'current_stock': stock.current_stock,
+                'minimum_stock': stock.minimum_stock,
+                'status': stock.stock_status,
+            }
+            for stock in StockLevel.objects.select_related('product')
+        ]
     
+    # Rebuilt only after a stock or catalog change
+    data = fragments.cached('stock_api', ('stock', 'catalog'), build)
     return JsonResponse(data, safe=False)
 
 
+def _parse_point_in_time(value):
+    """Datetime from ?at=: a date means the end of that day"""
+    value = (value or '').strip()
+    try:
+        day = parse_date(value)
+        moment = datetime.combine(day, time.max) if day else parse_datetime(value)
+    except ValueError:
+        return None
+    if moment is None:
+        return None
+    return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+
+
 @login_required
-def export_stock(request):
-    """Export stock levels to CSV"""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="stock_levels.csv"'
+def stock_at(request):
+    """Stock on hand at ?at= (a date or datetime), replayed from the movement ledger.
+    
+    ?product= restricts the answer to one product id, ?location= to the
+    stock at one location (by code).
+    """
+    at = _parse_point_in_time(request.GET.get('at'))
+    if at is None:
+        return HttpResponseBadRequest('Paramètre at invalide (AAAA-MM-JJ ou AAAA-MM-JJTHH:MM)')
     
-    writer = csv.writer(response)
-    writer.writerow(['Product', 'SKU', 'Current Stock', 'Minimum Stock', 'Maximum Stock', 'Status'])
+    location = None
+    if request.GET.get('location'):
+        location = Location.objects.filter(code=request.GET['location']).first()
+        if location is None:
+            return HttpResponseBadRequest('Paramètre location invalide')
     
-    stock_levels = StockLevel.objects.select_related('product').all()
-    for stock in stock_levels:
-        writer.writerow([
-            stock.product.name,
-            stock.product.sku,
-            stock.current_stock,
-            stock.minimum_stock,
-            stock.maximum_stock,
-            stock.stock_status
-        ])
+    products = Product.objects.order_by('name')
+    product_ids = None
+    if request.GET.get('product'):
+        if not request.GET['product'].isdigit():
+            return HttpResponseBadRequest('Paramètre product invalide')
+        product_ids = [int(request.GET['product'])]
+        products = products.filter(pk__in=product_ids)
+    levels = ledger.stock_levels_at(at, product_ids, location)
+    products = products.values('id', 'name', 'sku')
     
-    return response
+    return JsonResponse({
+        'at': at.isoformat(),
+        'location': location.code if location else None,
+        'stock': [
+            {
+                'product_id': product['id'],
+                'product_name': product['name'],
+                'sku': product['sku'],
+                'stock': levels.get(product['id'], 0),
+            }
+            for product in products
+        ],
+    })
+
+
+@login_required
+def export_stock(request):
+    """Export stock levels to CSV"""
+    params = STOCK_EXPORT.params(request.GET)
+    if request.GET.get('background'):
+        job = enqueue('EXPORT_STOCK', request.user, params=params)
+        messages.info(request, 'Export lancé en arrière-plan')
+        return redirect('jobs_app:job_detail', pk=job.pk)
+    
+    return export_response(STOCK_EXPORT, params)
+
+
+@login_required
+def export_metrics(request):
+    """Export the inventory metrics (ABC class, turnover, days of cover) to CSV"""
+    return export_response(METRICS_EXPORT, METRICS_EXPORT.params(request.GET))
 
 
 @login_required
 def export_movements(request):
-    """Export stock movements to CSV"""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="stock_movements.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Date', 'Product', 'Type', 'Quantity', 'Reference', 'Created By', 'Notes'])
-    
-    movements = StockMovement.objects.select_related('product', 'created_by').all()
-    for movement in movements:
-        writer.writerow([
-            movement.created_at.strftime('%Y-%m-%d %H:%M'),
-            movement.product.name,
-            movement.get_movement_type_display(),
-            movement.quantity,
-            movement.reference or '',
-            movement.created_by.get_full_name() or movement.created_by.username,
-            movement.notes or ''
-        ])
-    
-    return response
\ No newline at end of file
+    """Export stock movements to CSV, or to Parquet / Arrow (?format=parquet|arrow)"""
+    params = MOVEMENTS_EXPORT.params(request.GET)
+    fmt = request.GET.get('format', 'csv')
+    if fmt != 'csv':
+        params = MOVEMENTS_COLUMNAR_EXPORT.params(request.GET)
+    if request.GET.get('background'):
+        if fmt != 'csv':
+            try:
+                validate_format(MOVEMENTS_COLUMNAR_EXPORT, fmt, params)
+            except ValueError as e:
+                return HttpResponseBadRequest(str(e))
+            params['format'] = fmt
+        job = enqueue('EXPORT_MOVEMENTS', request.user, params=params)
+        messages.info(request, 'Export lancé en arrière-plan')
+        return redirect('jobs_app:job_detail', pk=job.pk)
+    
+    if fmt != 'csv':
+        return columnar_response(MOVEMENTS_COLUMNAR_EXPORT, fmt, params)
+    return export_response(MOVEMENTS_EXPORT, params)
\ No newline at end of file